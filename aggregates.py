@@ -0,0 +1,282 @@
+"""
+Fused, mergeable aggregation kernel behind TokenAnalytics.comprehensive_analysis
+"""
+
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from config import *
+from src.pair_store import PairStore
+from src.sketch import QuantileSketch
+
+
+def _column(columns: Mapping[str, Any], name: str) -> np.ndarray:
+    """Fetch a column as a NumPy array (works for PairStores, DataFrames and plain dicts of arrays)"""
+    return np.asarray(columns[name])
+
+
+def _cell(columns: Mapping[str, Any], name: str, row: int) -> Any:
+    """One value of a column; a PairStore decodes just that cell"""
+    if isinstance(columns, PairStore):
+        return _scalar(columns.value(name, row))
+    return _scalar(_column(columns, name)[row])
+
+
+def _argmax_row(values: np.ndarray, mask: np.ndarray) -> Optional[int]:
+    """Index of the largest value among masked rows (first one on ties)"""
+    if not mask.any():
+        return None
+    return int(np.where(mask, values, -np.inf).argmax())
+
+
+def _scalar(value: Any) -> Any:
+    """Unbox NumPy scalars so aggregates stay picklable and JSON friendly"""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class PairAggregates:
+    """Every count, sum and argmax of the analysis report, computed in one pass
+
+    Aggregates built from separate slices of pairs can be combined with
+    ``merge``; ``to_analysis`` renders the report sections. ``to_dict`` gives a
+    JSON-friendly form that carries the holder counts as a ``QuantileSketch``
+    rather than every value: the median stays exact within one process but is
+    approximate (within ``SKETCH_RELATIVE_ACCURACY``) once aggregates from
+    other nodes are merged in.
+    """
+
+    def __init__(self):
+        self.total_pairs = 0
+        self.total_volume = 0.0
+        self.new_tokens_count = 0
+        self.positive_movers = 0
+        self.negative_movers = 0
+        self.price_change_sum = 0.0
+        self.price_change_count = 0
+        self.top_gainer = np.nan
+        self.top_loser = np.nan
+        self.holders_sum = 0.0
+        self.holders_count = 0
+        self.holder_sketch = QuantileSketch()
+        self.holder_change_sum = 0.0
+        self.holder_change_count = 0
+        self.tokens_with_holders = 0
+        self.chain_counts: Dict[str, int] = {}
+        self.pump_signals = 0
+        self.dump_warnings = 0
+        self.growing_holders = 0
+        self.highest_volume: Dict = {}
+        self.most_holders: Dict = {}
+
+    @classmethod
+    def from_columns(cls, columns: Mapping[str, Any], min_volume: float = 0,
+                     new_since_ms: Optional[int] = None) -> 'PairAggregates':
+        """Aggregate the pairs whose 24h volume is at least ``min_volume``
+
+        Pairs created after ``new_since_ms`` are counted as new tokens regardless
+        of their volume.
+        """
+        agg = cls()
+
+        volume = _column(columns, 'volume_h24')
+        if not len(volume):
+            return agg
+        if new_since_ms is not None:
+            agg.new_tokens_count = int(np.count_nonzero(_column(columns, 'pair_created_ms') > new_since_ms))
+        price_change = _column(columns, 'price_change_h24')
+        holders = _column(columns, 'holders').astype(np.float64, copy=False)
+
+        selected = volume >= min_volume
+        agg.total_pairs = int(np.count_nonzero(selected))
+        if not agg.total_pairs:
+            return agg
+        agg.total_volume = float(volume.sum(where=selected & ~np.isnan(volume)))
+
+        rising = selected & (price_change > 0)
+        falling = selected & (price_change < 0)
+        liquid = selected & (volume > MIN_VOLUME_THRESHOLD)
+        with_holders = selected & (holders > 0)
+
+        agg.positive_movers = int(np.count_nonzero(rising))
+        agg.negative_movers = int(np.count_nonzero(falling))
+        pumps, dumps = cls._daily_signals(columns, liquid)
+        agg.pump_signals = int(np.count_nonzero(pumps))
+        agg.dump_warnings = int(np.count_nonzero(dumps))
+        if 'holders_delta' in columns:
+            agg.apply_holder_deltas(_column(columns, 'holders_delta'), selected)
+        else:
+            # Without history, fall back to liquid, rising tokens with a sizeable holder base
+            agg.growing_holders = int(np.count_nonzero(rising & liquid & (holders > MIN_HOLDERS_THRESHOLD)))
+        agg.tokens_with_holders = int(np.count_nonzero(with_holders))
+
+        known_change = selected & ~np.isnan(price_change)
+        agg.price_change_count = int(np.count_nonzero(known_change))
+        if agg.price_change_count:
+            agg.price_change_sum = float(price_change.sum(where=known_change))
+            agg.top_gainer = float(price_change.max(where=known_change, initial=-np.inf))
+            agg.top_loser = float(price_change.min(where=known_change, initial=np.inf))
+
+        known_holders = selected & ~np.isnan(holders)
+        agg.holders_count = int(np.count_nonzero(known_holders))
+        agg.holders_sum = float(holders.sum(where=known_holders))
+        agg.holder_sketch.add(holders[known_holders])
+
+        if isinstance(columns, PairStore):
+            # Interned chain codes make this a bincount instead of hashing every string
+            agg.chain_counts = columns.category_counts('chain_id', selected)
+        else:
+            agg.chain_counts = cls._count_chains(_column(columns, 'chain_id'), selected)
+
+        row = _argmax_row(volume, selected)
+        agg.highest_volume = {
+            'symbol': _cell(columns, 'base_token_symbol', row),
+            'volume': _cell(columns, 'volume_h24', row),
+            'price': _cell(columns, 'price_usd', row),
+            'chain': _cell(columns, 'chain_id', row)
+        }
+
+        row = _argmax_row(holders, with_holders)
+        if row is not None:
+            agg.most_holders = {
+                'symbol': _cell(columns, 'base_token_symbol', row),
+                'holders': _cell(columns, 'holders', row),
+                'price': _cell(columns, 'price_usd', row),
+                'chain': _cell(columns, 'chain_id', row)
+            }
+
+        return agg
+
+    def apply_holder_deltas(self, holders_delta: np.ndarray, selected: np.ndarray):
+        """Set holder growth from real per-pair deltas against the previous cycle
+
+        Pairs without history have a NaN delta. Lets aggregates computed without
+        state (e.g. in a worker process) be completed once the deltas are known.
+        """
+        known_delta = selected & ~np.isnan(holders_delta)
+        self.growing_holders = int(np.count_nonzero(known_delta & (holders_delta > 0)))
+        self.holder_change_count = int(np.count_nonzero(known_delta))
+        self.holder_change_sum = float(holders_delta.sum(where=known_delta))
+
+    @staticmethod
+    def _daily_signals(columns: Mapping[str, Any], liquid: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Pump and dump masks from the 24h price change alone"""
+        price_change = _column(columns, 'price_change_h24')
+        txns = _column(columns, 'txns_h24')
+        return (liquid & (price_change > PUMP_THRESHOLD) & (txns > 100),
+                liquid & (price_change < DUMP_THRESHOLD) & (txns > 50))
+
+    def apply_window_signals(self, columns: Mapping[str, Any], pumping: np.ndarray, dumping: np.ndarray,
+                             selected: np.ndarray):
+        """Add pairs pumping or dumping over a rolling window that the 24h change missed
+
+        ``pumping``/``dumping`` come from the rolling indicators, which need
+        pair history, so like ``apply_holder_deltas`` this completes aggregates
+        built without state.
+        """
+        liquid = selected & (_column(columns, 'volume_h24') > MIN_VOLUME_THRESHOLD)
+        pumps, dumps = self._daily_signals(columns, liquid)
+        self.pump_signals += int(np.count_nonzero(liquid & pumping & ~pumps))
+        self.dump_warnings += int(np.count_nonzero(liquid & dumping & ~dumps))
+
+    @staticmethod
+    def _count_chains(chain: np.ndarray, selected: np.ndarray) -> Dict[str, int]:
+        """Pairs per chain, most common first (ties keep first-seen order)"""
+        codes, names = pd.factorize(chain[selected])
+        codes = codes[codes >= 0]
+        if not len(codes):
+            return {}
+        counts = np.bincount(codes, minlength=len(names))
+        order = np.argsort(-counts, kind='stable')
+        return {names[i]: int(counts[i]) for i in order if counts[i]}
+
+    def merge(self, other: 'PairAggregates') -> 'PairAggregates':
+        """Fold another partial aggregate into this one"""
+        self.total_pairs += other.total_pairs
+        self.total_volume += other.total_volume
+        self.new_tokens_count += other.new_tokens_count
+        self.positive_movers += other.positive_movers
+        self.negative_movers += other.negative_movers
+        self.price_change_sum += other.price_change_sum
+        self.price_change_count += other.price_change_count
+        self.top_gainer = np.fmax(self.top_gainer, other.top_gainer)
+        self.top_loser = np.fmin(self.top_loser, other.top_loser)
+        self.holders_sum += other.holders_sum
+        self.holders_count += other.holders_count
+        self.holder_sketch.merge(other.holder_sketch)
+        self.holder_change_sum += other.holder_change_sum
+        self.holder_change_count += other.holder_change_count
+        self.tokens_with_holders += other.tokens_with_holders
+        self.pump_signals += other.pump_signals
+        self.dump_warnings += other.dump_warnings
+        self.growing_holders += other.growing_holders
+
+        for chain, count in other.chain_counts.items():
+            self.chain_counts[chain] = self.chain_counts.get(chain, 0) + count
+        self.chain_counts = dict(sorted(self.chain_counts.items(), key=lambda item: -item[1]))
+
+        if other.highest_volume and (not self.highest_volume or
+                                     other.highest_volume['volume'] > self.highest_volume['volume']):
+            self.highest_volume = other.highest_volume
+        if other.most_holders and (not self.most_holders or
+                                   other.most_holders['holders'] > self.most_holders['holders']):
+            self.most_holders = other.most_holders
+        return self
+
+    def to_dict(self) -> Dict:
+        data = {name: _scalar(value) for name, value in vars(self).items()}
+        data['holder_sketch'] = self.holder_sketch.to_dict()
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'PairAggregates':
+        agg = cls()
+        for name in vars(agg):
+            if name in data:
+                setattr(agg, name, data[name])
+        agg.holder_sketch = QuantileSketch.from_dict(data['holder_sketch'])
+        return agg
+
+    def to_analysis(self) -> Dict:
+        """Render the report sections in the shape comprehensive_analysis returns"""
+        if not self.total_pairs:
+            return {
+                'total_pairs': 0,
+                'total_volume': 0.0,
+                'new_tokens_count': self.new_tokens_count,
+                'highest_volume': {},
+                'most_holders': {},
+                'price_movements': {},
+                'holder_growth': {},
+                'chain_distribution': {},
+                'pump_signals': 0,
+                'dump_warnings': 0,
+                'growing_holders': 0,
+            }
+
+        return {
+            'total_pairs': self.total_pairs,
+            'total_volume': self.total_volume,
+            'new_tokens_count': self.new_tokens_count,
+            'highest_volume': self.highest_volume,
+            'most_holders': self.most_holders,
+            'price_movements': {
+                'average_change': (self.price_change_sum / self.price_change_count
+                                   if self.price_change_count else np.nan),
+                'positive_movers': self.positive_movers,
+                'negative_movers': self.negative_movers,
+                'top_gainer': _scalar(self.top_gainer),
+                'top_loser': _scalar(self.top_loser)
+            },
+            'holder_growth': {
+                'average_holders': self.holders_sum / self.holders_count if self.holders_count else np.nan,
+                'median_holders': self.holder_sketch.quantile(0.5),
+                'tokens_with_holders': self.tokens_with_holders,
+                'average_holder_change': (self.holder_change_sum / self.holder_change_count
+                                          if self.holder_change_count else np.nan)
+            },
+            'chain_distribution': dict(self.chain_counts),
+            'pump_signals': self.pump_signals,
+            'dump_warnings': self.dump_warnings,
+            'growing_holders': self.growing_holders,
+        }
@@ -0,0 +1,260 @@
+"""
+Per-token alert subscriptions, evaluated against changed pairs through an inverted index
+"""
+
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+import numpy as np
+from config import *
+from src.utils import generate_token_hash
+
+logger = logging.getLogger(__name__)
+
+# Alertable metrics and the pair column each one reads
+ALERT_METRICS = {
+    'price': 'price_usd',
+    'volume': 'volume_h24',
+    'liquidity': 'liquidity_usd',
+}
+
+ALERT_DIRECTIONS = ('above', 'below')
+
+
+def normalize_address(token_address: str) -> str:
+    """EVM addresses are case-insensitive; other chains' (e.g. Solana) are not"""
+    token_address = token_address.strip()
+    return token_address.lower() if token_address.startswith('0x') else token_address
+
+
+class Subscription:
+    """One chat's threshold on one token metric"""
+
+    def __init__(self, sub_id: int, chat_id: str, token_address: str, chain_id: str,
+                 metric: str, direction: str, threshold: float, created_at: Optional[float] = None):
+        self.sub_id = sub_id
+        self.chat_id = str(chat_id)
+        self.token_address = normalize_address(token_address)
+        self.chain_id = chain_id.lower()
+        self.metric = metric
+        self.direction = direction
+        self.threshold = threshold
+        self.created_at = created_at if created_at is not None else time.time()
+        self.token_hash = generate_token_hash(self.token_address, self.chain_id)
+        # Edge-triggered: fire when the condition becomes true, re-arm once it is false again
+        self.triggered = False
+
+    def matches(self, value: float) -> bool:
+        if value != value:  # NaN
+            return False
+        return value > self.threshold if self.direction == 'above' else value < self.threshold
+
+    def to_dict(self) -> Dict:
+        return {
+            'id': self.sub_id,
+            'chat_id': self.chat_id,
+            'token_address': self.token_address,
+            'chain_id': self.chain_id,
+            'metric': self.metric,
+            'direction': self.direction,
+            'threshold': self.threshold,
+            'created_at': self.created_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Subscription':
+        return cls(data['id'], data['chat_id'], data['token_address'], data['chain_id'],
+                   data['metric'], data['direction'], data['threshold'], data.get('created_at'))
+
+    def describe(self) -> str:
+        return (f"#{self.sub_id} {self.metric} {self.direction} {self.threshold:g} "
+                f"for {self.token_address} on {self.chain_id}")
+
+
+class AlertEngine:
+    """Subscriptions indexed by ``generate_token_hash(address, chain)``
+
+    ``evaluate`` looks up only the rows that changed this cycle, so its cost
+    follows the number of changed tokens rather than the number of
+    subscriptions. Adds and removals are appended to a JSONL log that is
+    replayed (and compacted) on startup. A ``read_only`` engine follows a log
+    another process owns: it never writes it, and ``reload`` picks up changes.
+    """
+
+    def __init__(self, path: Optional[str] = SETTINGS.alerts_path, max_per_chat: int = ALERT_MAX_PER_CHAT,
+                 read_only: bool = False):
+        self.path = path
+        self.max_per_chat = max_per_chat
+        self.read_only = read_only
+        self._loaded_mtime: Optional[int] = None
+        self._subscriptions: Dict[int, Subscription] = {}
+        self._by_token: Dict[str, Dict[int, Subscription]] = {}
+        self._by_chat: Dict[str, Set[int]] = {}
+        # (chain, address) pairs with at least one subscription, checked before hashing
+        self._watched: Dict[Tuple[str, str], int] = {}
+        self._next_id = 1
+        if path:
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._subscriptions)
+
+    def add(self, chat_id: str, token_address: str, chain_id: str, metric: str,
+            direction: str, threshold: float) -> Subscription:
+        """Subscribe a chat to a threshold; raises ValueError on invalid input"""
+        if metric not in ALERT_METRICS:
+            raise ValueError(f"Unknown metric '{metric}', expected one of {', '.join(ALERT_METRICS)}")
+        if direction not in ALERT_DIRECTIONS:
+            raise ValueError(f"Unknown direction '{direction}', expected 'above' or 'below'")
+        if len(self._by_chat.get(str(chat_id), ())) >= self.max_per_chat:
+            raise ValueError(f"A chat can have at most {self.max_per_chat} alerts")
+
+        subscription = Subscription(self._next_id, chat_id, token_address, chain_id, metric, direction,
+                                    float(threshold))
+        self._index(subscription)
+        self._append_log({'op': 'add', **subscription.to_dict()})
+        return subscription
+
+    def remove(self, sub_id: int, chat_id: Optional[str] = None) -> bool:
+        """Delete a subscription (only the owning chat's, when ``chat_id`` is given)"""
+        subscription = self._subscriptions.get(sub_id)
+        if subscription is None or (chat_id is not None and subscription.chat_id != str(chat_id)):
+            return False
+        self._unindex(subscription)
+        self._append_log({'op': 'remove', 'id': sub_id})
+        return True
+
+    def get(self, sub_id: int) -> Optional[Subscription]:
+        return self._subscriptions.get(sub_id)
+
+    def for_chat(self, chat_id: str) -> List[Subscription]:
+        return [self._subscriptions[sub_id] for sub_id in sorted(self._by_chat.get(str(chat_id), ()))]
+
+    def for_token(self, token_address: str, chain_id: str) -> List[Subscription]:
+        token_hash = generate_token_hash(normalize_address(token_address), chain_id.lower())
+        return list(self._by_token.get(token_hash, {}).values())
+
+    def evaluate(self, columns: Mapping[str, Any], rows: Iterable[int]) -> List[Tuple[Subscription, Dict]]:
+        """Check subscriptions on the tokens of ``rows`` (the pairs that changed this cycle)
+
+        Returns ``(subscription, values)`` for every alert that fired. When several
+        changed pairs belong to one token, the most liquid pair is used.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if not len(rows) or not self._watched:
+            return []
+
+        chains = np.asarray(columns['chain_id'])[rows].tolist()
+        addresses = np.asarray(columns['base_token_address'])[rows].tolist()
+        liquidity = np.asarray(columns['liquidity_usd'], dtype=np.float64)[rows]
+
+        best: Dict[Tuple[str, str], int] = {}
+        for i, (chain, address) in enumerate(zip(chains, addresses)):
+            if not chain or not address:
+                continue
+            key = (chain.lower(), normalize_address(address))
+            if key not in self._watched:
+                continue
+            current = best.get(key)
+            if current is None or liquidity[i] > liquidity[current]:
+                best[key] = i
+        if not best:
+            return []
+
+        values = {metric: np.asarray(columns[name], dtype=np.float64)[rows] for metric, name in ALERT_METRICS.items()}
+        symbols = np.asarray(columns['base_token_symbol'])[rows]
+
+        fired = []
+        for (chain, address), i in best.items():
+            snapshot = {metric: float(column[i]) for metric, column in values.items()}
+            snapshot['symbol'] = symbols[i]
+            for subscription in self._by_token[generate_token_hash(address, chain)].values():
+                if subscription.matches(snapshot[subscription.metric]):
+                    if not subscription.triggered:
+                        subscription.triggered = True
+                        fired.append((subscription, snapshot))
+                else:
+                    subscription.triggered = False
+        return fired
+
+    def _index(self, subscription: Subscription):
+        self._subscriptions[subscription.sub_id] = subscription
+        self._by_token.setdefault(subscription.token_hash, {})[subscription.sub_id] = subscription
+        self._by_chat.setdefault(subscription.chat_id, set()).add(subscription.sub_id)
+        key = (subscription.chain_id, subscription.token_address)
+        self._watched[key] = self._watched.get(key, 0) + 1
+        self._next_id = max(self._next_id, subscription.sub_id + 1)
+
+    def _unindex(self, subscription: Subscription):
+        del self._subscriptions[subscription.sub_id]
+        token_subs = self._by_token[subscription.token_hash]
+        del token_subs[subscription.sub_id]
+        if not token_subs:
+            del self._by_token[subscription.token_hash]
+        chat_subs = self._by_chat[subscription.chat_id]
+        chat_subs.discard(subscription.sub_id)
+        if not chat_subs:
+            del self._by_chat[subscription.chat_id]
+        key = (subscription.chain_id, subscription.token_address)
+        self._watched[key] -= 1
+        if not self._watched[key]:
+            del self._watched[key]
+
+    def reload(self):
+        """Replay the log again if it changed since it was read, keeping which alerts are triggered"""
+        if not self.path or not os.path.exists(self.path) or os.stat(self.path).st_mtime_ns == self._loaded_mtime:
+            return
+        triggered = {sub_id for sub_id, subscription in self._subscriptions.items() if subscription.triggered}
+        self._subscriptions, self._by_token, self._by_chat, self._watched = {}, {}, {}, {}
+        self._load()
+        for sub_id in triggered & self._subscriptions.keys():
+            self._subscriptions[sub_id].triggered = True
+
+    def _append_log(self, record: Dict):
+        if not self.path or self.read_only:
+            return
+        try:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+        except OSError as e:
+            logger.error(f"Failed to persist alert change: {str(e)}")
+
+    def _load(self):
+        """Replay the subscription log, compacting it when removals dominate"""
+        if not os.path.exists(self.path):
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            return
+
+        records = 0
+        self._loaded_mtime = os.stat(self.path).st_mtime_ns
+        with open(self.path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                    if record['op'] == 'add':
+                        self._index(Subscription.from_dict(record))
+                    elif record['op'] == 'remove' and record['id'] in self._subscriptions:
+                        self._unindex(self._subscriptions[record['id']])
+                    records += 1
+                except (ValueError, KeyError) as e:
+                    logger.warning(f"Skipping malformed alert record: {str(e)}")
+        logger.info(f"Loaded {len(self)} alert subscriptions")
+
+        if records > 2 * len(self) + 1000 and not self.read_only:
+            self._compact()
+
+    def _compact(self):
+        """Rewrite the log with one record per live subscription"""
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f:
+            for subscription in self._subscriptions.values():
+                f.write(json.dumps({'op': 'add', **subscription.to_dict()}) + '\n')
+        os.replace(tmp_path, self.path)
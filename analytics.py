@@ -4,182 +4,192 @@ Advanced analytics engine for token data
 
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Tuple
+from typing import AsyncIterable, Callable, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import json
 import logging
-from datetime import datetime, timedelta
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
 from config import *
+from src.aggregates import PairAggregates
+from src.alerts import AlertEngine, Subscription
+from src.indicators import IndicatorStore, WindowSignals
+from src.ingestion import build_pair_frame
+from src.leaderboard import Leaderboards
+from src.metrics import REGISTRY
+from src.pair_state import PairStateStore
+from src.pair_store import PairStore
+from src.sharding import ShardSummary
 
 logger = logging.getLogger(__name__)
 
+STAGE_SECONDS = REGISTRY.histogram('analysis_stage_seconds',
+                                   'Seconds per analysis stage in one cycle, summed over its batches', ('stage',))
+
+def analyze_payload(body: bytes, min_volume: float, new_since_ms: int,
+                    chain: str = '') -> Tuple[PairStore, PairAggregates, Dict[str, float]]:
+    """Decode, parse and aggregate one chain's raw ``pairs`` response
+    
+    Runs in a worker process and touches no shared state. Taking the raw body
+    means only bytes cross the process boundary, which is far cheaper to
+    pickle than the decoded pair dicts. Stage timings are returned alongside,
+    since metrics recorded in the worker would never reach ``/metrics``.
+    A malformed body is logged and gives an empty partial, so one bad
+    response does not abort the whole cycle.
+    """
+    started = time.perf_counter()
+    try:
+        data = json.loads(body)
+    except ValueError as e:
+        logger.warning(f"Malformed response body for {chain or 'a chain'}: {str(e)}")
+        data = None
+    pairs = (data.get('pairs') if isinstance(data, dict) else None) or []
+    store = PairStore.from_pairs(pairs)
+    parsed = time.perf_counter()
+    aggregates = PairAggregates.from_columns(store, min_volume, new_since_ms=new_since_ms)
+    return store, aggregates, {'parse': parsed - started, 'aggregate': time.perf_counter() - parsed}
+
+
 class TokenAnalytics:
-    def __init__(self):
+    def __init__(self, alert_engine: Optional[AlertEngine] = None, workers: int = 0):
         self.metrics_history = []
+        self.pair_state = PairStateStore()
+        self.indicators = IndicatorStore()
+        self.leaderboards = Leaderboards()
+        self.last_pairs: Optional[PairStore] = None
+        self.alert_engine = alert_engine
+        self.last_alerts: List[Tuple[Subscription, Dict]] = []
+        self.last_summary: Optional[ShardSummary] = None
+        self.last_cycle_seconds = 0.0
+        self.last_stage_seconds: Dict[str, float] = {}
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
         
     def comprehensive_analysis(self, pairs: List[Dict], min_volume: float = 10000) -> Dict:
         """Perform comprehensive analysis on token pairs"""
         if not pairs:
             return {}
-            
-        # Convert to DataFrame for easier analysis
-        df = self._prepare_dataframe(pairs)
-        
-        # Filter by minimum volume
-        df = df[df['volume_h24'] >= min_volume]
-        
-        analysis = {
-            'total_pairs': len(df),
-            'new_tokens_count': len([p for p in pairs if self._is_new_token(p)]),
-            'highest_volume': self._get_highest_volume(df),
-            'most_holders': self._get_most_holders(df),
-            'price_movements': self._analyze_price_movements(df),
-            'holder_growth': self._analyze_holder_growth(df),
-            'chain_distribution': self._get_chain_distribution(df),
-            'pump_signals': self._detect_pump_signals(df),
-            'dump_warnings': self._detect_dump_warnings(df),
-            'growing_holders': self._count_growing_holders(df),
-            'timestamp': datetime.now().isoformat()
-        }
+        return self.analyze_batches([pairs], min_volume)
+    
+    def analyze_batches(self, batches: Iterable[List[Dict]], min_volume: float = 10000,
+                        on_batch: Optional[Callable[[PairStore], None]] = None) -> Dict:
+        """Analyze pairs arriving as a sequence of batches, merging per-batch aggregates
+        
+        Each batch's PairStore is dropped once aggregated (after ``on_batch`` sees
+        it), so memory tracks the batch size rather than the whole cycle.
+        """
+        cycle = _AnalysisCycle(self, min_volume, on_batch)
+        for batch in batches:
+            cycle.add(batch)
+        return cycle.finish()
+    
+    async def analyze_stream(self, batches: AsyncIterable[List[Dict]], min_volume: float = 10000,
+                             on_batch: Optional[Callable[[PairStore], None]] = None) -> Dict:
+        """Async counterpart of ``analyze_batches`` for streamed API responses"""
+        cycle = _AnalysisCycle(self, min_volume, on_batch)
+        async for batch in batches:
+            cycle.add(batch)
+        return cycle.finish()
+    
+    async def analyze_payloads(self, payloads: AsyncIterable[Tuple[str, bytes]], min_volume: float = 10000,
+                               on_batch: Optional[Callable[[PairStore], None]] = None) -> Dict:
+        """Analyze raw per-chain responses in a pool of ``workers`` processes
+        
+        Each chain's body is decoded, parsed and aggregated in a worker, keeping
+        the event loop free; the parent only diffs pair state and merges the
+        partial aggregates, in arrival order.
+        """
+        cycle = _AnalysisCycle(self, min_volume, on_batch)
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        pending = deque()
+        try:
+            async for chain, body in payloads:
+                pending.append(loop.run_in_executor(executor, analyze_payload, body, min_volume,
+                                                    cycle.new_since_ms, chain))
+                # Bound the shards in flight, folding in finished ones as they complete
+                while pending and (len(pending) > 2 * self.workers or pending[0].done()):
+                    cycle.add_partial(*await pending.popleft())
+            while pending:
+                cycle.add_partial(*await pending.popleft())
+        finally:
+            # An aborted cycle leaves no queued shards behind in the pool
+            for future in pending:
+                future.cancel()
+        return cycle.finish()
+    
+    def analyze_shards(self, summaries: List[ShardSummary]) -> Dict:
+        """Merge the cycle summaries of worker nodes into one report
+        
+        The report is rendered exactly as a single process renders its own
+        summary. Alerts fired on the workers are mapped back to this
+        process's subscriptions; ones removed meanwhile are dropped.
+        """
+        if not summaries:
+            return {}
+        started = time.perf_counter()
+        summary = ShardSummary.combine(summaries)
+        analysis = summary.to_analysis()
+        analysis['timestamp'] = datetime.now().isoformat()
+        self._record_metrics(analysis, summary.new_pairs, summary.changed_pairs)
         
+        self.last_pairs = None
+        self.last_alerts = []
+        if self.alert_engine is not None:
+            for sub_id, values in summary.alerts:
+                subscription = self.alert_engine.get(sub_id)
+                if subscription is not None:
+                    self.last_alerts.append((subscription, values))
+        self.last_summary = summary
+        self.last_cycle_seconds = time.perf_counter() - started
+        self.last_stage_seconds = {'merge': self.last_cycle_seconds}
         return analysis
     
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+    
+    def close(self):
+        """Shut down the worker processes"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+    
+    def _record_metrics(self, analysis: Dict, new_pairs: int, changed_pairs: int):
+        """Append a per-cycle summary to the bounded metrics history"""
+        self.metrics_history.append({
+            'timestamp': analysis['timestamp'],
+            'total_pairs': analysis['total_pairs'],
+            'new_pairs': new_pairs,
+            'changed_pairs': changed_pairs,
+            'pump_signals': analysis['pump_signals'],
+            'dump_warnings': analysis['dump_warnings'],
+            'growing_holders': analysis['growing_holders'],
+        })
+        del self.metrics_history[:-METRICS_HISTORY_SIZE]
+    
     def _prepare_dataframe(self, pairs: List[Dict]) -> pd.DataFrame:
         """Convert pairs data to DataFrame"""
-        data = []
-        for pair in pairs:
-            try:
-                row = {
-                    'pair_address': pair.get('pairAddress'),
-                    'base_token_symbol': pair.get('baseToken', {}).get('symbol'),
-                    'base_token_address': pair.get('baseToken', {}).get('address'),
-                    'quote_token_symbol': pair.get('quoteToken', {}).get('symbol'),
-                    'chain_id': pair.get('chainId'),
-                    'dex_id': pair.get('dexId'),
-                    'price_usd': float(pair.get('priceUsd', 0)),
-                    'volume_h24': float(pair.get('volume', {}).get('h24', 0)),
-                    'price_change_h24': float(pair.get('priceChange', {}).get('h24', 0)),
-                    'liquidity_usd': float(pair.get('liquidity', {}).get('usd', 0)),
-                    'fdv': float(pair.get('fdv', 0)),
-                    'market_cap': float(pair.get('marketCap', 0)),
-                    'pair_created_at': pair.get('pairCreatedAt'),
-                    'txns_h24': pair.get('txns', {}).get('h24', {}).get('buys', 0) + 
-                               pair.get('txns', {}).get('h24', {}).get('sells', 0),
-                    'holders': pair.get('holders', 0)
-                }
-                data.append(row)
-            except (ValueError, TypeError) as e:
-                logger.warning(f"Error processing pair: {e}")
-                continue
-                
-        return pd.DataFrame(data)
-    
-    def _is_new_token(self, pair: Dict) -> bool:
-        """Check if token was created in last 24 hours"""
-        created_at = pair.get('pairCreatedAt')
-        if not created_at:
-            return False
-            
-        try:
-            created_time = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-            return datetime.now().astimezone() - created_time < timedelta(hours=24)
-        except:
-            return False
-    
-    def _get_highest_volume(self, df: pd.DataFrame) -> Dict:
-        """Get token with highest volume"""
-        if df.empty:
-            return {}
-            
-        max_volume = df.loc[df['volume_h24'].idxmax()]
-        return {
-            'symbol': max_volume['base_token_symbol'],
-            'volume': max_volume['volume_h24'],
-            'price': max_volume['price_usd'],
-            'chain': max_volume['chain_id']
-        }
-    
-    def _get_most_holders(self, df: pd.DataFrame) -> Dict:
-        """Get token with most holders"""
-        if df.empty or 'holders' not in df.columns:
-            return {}
-            
-        df_with_holders = df[df['holders'] > 0]
-        if df_with_holders.empty:
-            return {}
-            
-        max_holders = df_with_holders.loc[df_with_holders['holders'].idxmax()]
-        return {
-            'symbol': max_holders['base_token_symbol'],
-            'holders': max_holders['holders'],
-            'price': max_holders['price_usd'],
-            'chain': max_holders['chain_id']
-        }
-    
-    def _analyze_price_movements(self, df: pd.DataFrame) -> Dict:
-        """Analyze price movements across tokens"""
-        if df.empty:
-            return {}
-            
-        return {
-            'average_change': df['price_change_h24'].mean(),
-            'positive_movers': len(df[df['price_change_h24'] > 0]),
-            'negative_movers': len(df[df['price_change_h24'] < 0]),
-            'top_gainer': df.loc[df['price_change_h24'].idxmax()]['price_change_h24'] if not df.empty else 0,
-            'top_loser': df.loc[df['price_change_h24'].idxmin()]['price_change_h24'] if not df.empty else 0
-        }
-    
-    def _analyze_holder_growth(self, df: pd.DataFrame) -> Dict:
-        """Analyze holder growth patterns"""
-        # This would typically require historical data
-        # For now, we'll return basic stats
-        if df.empty or 'holders' not in df.columns:
-            return {}
-            
-        return {
-            'average_holders': df['holders'].mean(),
-            'median_holders': df['holders'].median(),
-            'tokens_with_holders': len(df[df['holders'] > 0])
-        }
-    
-    def _get_chain_distribution(self, df: pd.DataFrame) -> Dict:
-        """Get distribution of tokens across chains"""
-        return df['chain_id'].value_counts().to_dict()
-    
-    def _detect_pump_signals(self, df: pd.DataFrame) -> int:
-        """Detect potential pump signals"""
-        if df.empty:
-            return 0
-            
-        pump_conditions = (
-            (df['price_change_h24'] > PUMP_THRESHOLD) &
-            (df['volume_h24'] > MIN_VOLUME_THRESHOLD) &
-            (df['txns_h24'] > 100)  # Minimum transactions
-        )
-        return len(df[pump_conditions])
-    
-    def _detect_dump_warnings(self, df: pd.DataFrame) -> int:
-        """Detect potential dump warnings"""
-        if df.empty:
-            return 0
-            
-        dump_conditions = (
-            (df['price_change_h24'] < DUMP_THRESHOLD) &
-            (df['volume_h24'] > MIN_VOLUME_THRESHOLD) &
-            (df['txns_h24'] > 50)  # Minimum transactions
-        )
-        return len(df[dump_conditions])
-    
-    def _count_growing_holders(self, df: pd.DataFrame) -> int:
-        """Count tokens with growing holder base"""
-        # This is a simplified version - real implementation would need historical data
-        if df.empty:
-            return 0
-        # Assume tokens with high volume and positive price movement have growing holders
-        growing_conditions = (
-            (df['price_change_h24'] > 0) &
-            (df['volume_h24'] > MIN_VOLUME_THRESHOLD) &
-            (df['holders'] > MIN_HOLDERS_THRESHOLD)
-        )
-        return len(df[growing_conditions])
+        return build_pair_frame(pairs)
+    
+    def _prepare_store(self, pairs: List[Dict]) -> PairStore:
+        """Convert pairs data to a compact PairStore"""
+        return PairStore.from_pairs(pairs)
+    
+    @staticmethod
+    def _window_start_ms(hours: float, now: datetime) -> int:
+        """Epoch milliseconds ``hours`` before ``now``"""
+        return int(now.timestamp() * 1000) - int(hours * 3600 * 1000)
+    
+    def filter_created_within(self, df: pd.DataFrame, hours: float = TIME_WINDOW_HOURS,
+                              now: Optional[datetime] = None) -> pd.DataFrame:
+        """Rows of a prepared DataFrame whose pair was created in the last ``hours``"""
+        window_start = self._window_start_ms(hours, now or datetime.now(timezone.utc))
+        return df[df['pair_created_ms'] > window_start]
     
     def generate_insights_report(self, analysis: Dict) -> Dict:
         """Generate human-readable insights from analysis"""
@@ -220,3 +230,124 @@ class TokenAnalytics:
             recommendations.append("Strong holder growth observed in multiple tokens")
             
         return recommendations if recommendations else ["Market conditions appear normal"]
+
+
+class _AnalysisCycle:
+    """Accumulates one monitoring cycle's analysis over any number of pair batches"""
+    
+    def __init__(self, analytics: TokenAnalytics, min_volume: float,
+                 on_batch: Optional[Callable[[PairStore], None]] = None):
+        self.analytics = analytics
+        self.min_volume = min_volume
+        self.on_batch = on_batch
+        self.now = datetime.now(timezone.utc)
+        self.now_ms = int(self.now.timestamp() * 1000)
+        self.new_since_ms = analytics._window_start_ms(TIME_WINDOW_HOURS, self.now)
+        self.aggregates = PairAggregates()
+        self.batches = 0
+        self.new_pairs = 0
+        self.changed_pairs = 0
+        self.store: Optional[PairStore] = None
+        self.alerts: List[Tuple[Subscription, Dict]] = []
+        self.window_signals = WindowSignals(list(analytics.indicators.windows))
+        self.stage_seconds: Dict[str, float] = {}
+        self.busy_seconds = 0.0
+        
+    @contextmanager
+    def _stage(self, name: str):
+        """Time a block on this process, adding to the stage's total"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + elapsed
+            self.busy_seconds += elapsed
+        
+    def add(self, pairs: List[Dict]):
+        """Fold one batch of raw pairs into the cycle"""
+        if not pairs:
+            return
+        with self._stage('parse'):
+            store = self.analytics._prepare_store(pairs)
+        with self._stage('aggregate'):
+            # Every count, sum and argmax in one pass over the columns, restricted to pairs above min_volume
+            aggregates = PairAggregates.from_columns(store, self.min_volume, new_since_ms=self.new_since_ms)
+        self.add_partial(store, aggregates)
+        
+    def add_partial(self, store: PairStore, aggregates: PairAggregates,
+                    worker_seconds: Optional[Dict[str, float]] = None):
+        """Fold one parsed and aggregated shard into the cycle, completing it with pair state
+        
+        ``worker_seconds`` are stage timings from the process that built the
+        shard; they count towards the stage totals but not ``busy_seconds``.
+        """
+        for name, seconds in (worker_seconds or {}).items():
+            self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + seconds
+        
+        with self._stage('pair_state'):
+            # Diff against the previous cycle for real holder, volume and price deltas
+            deltas = self.analytics.pair_state.update(store, self.now_ms)
+            for name, values in deltas.as_columns().items():
+                store[name] = values
+            aggregates.apply_holder_deltas(deltas.holders_delta, store['volume_h24'] >= self.min_volume)
+            self.new_pairs += int(np.count_nonzero(deltas.new))
+            self.changed_pairs += int(np.count_nonzero(deltas.changed))
+        
+        with self._stage('indicators'):
+            # Momentum over short windows flags moves the 24h change has not caught up with yet
+            indicators = self.analytics.indicators.update(deltas.slots, deltas.new, store, self.now_ms)
+            for name, values in indicators.items():
+                store[name] = values
+            selected = store['volume_h24'] >= self.min_volume
+            liquid = selected & (store['volume_h24'] > MIN_VOLUME_THRESHOLD)
+            pumping, dumping = self.window_signals.add(indicators, liquid)
+            aggregates.apply_window_signals(store, pumping, dumping, selected)
+        
+        # Alerts only look at pairs that are new or moved since the previous cycle
+        if self.analytics.alert_engine is not None:
+            with self._stage('alerts'):
+                rows = np.flatnonzero(deltas.modified)
+                self.alerts.extend(self.analytics.alert_engine.evaluate(store, rows))
+        
+        with self._stage('leaderboards'):
+            self.analytics.leaderboards.update(store, deltas, self.min_volume)
+        
+        with self._stage('merge'):
+            self.aggregates.merge(aggregates)
+        
+        if self.on_batch is not None:
+            with self._stage('on_batch'):
+                self.on_batch(store)
+        self.store = store if not self.batches else None
+        self.batches += 1
+        
+    def finish(self) -> Dict:
+        """Render the merged analysis and record the cycle"""
+        if not self.batches:
+            return {}
+        with self._stage('leaderboards'):
+            leaderboards = self.analytics.leaderboards
+            leaderboards.finish_cycle(self.analytics.pair_state, self.now_ms)
+            board_report = leaderboards.to_report(self.analytics.pair_state, LEADERBOARD_SHOWN)
+        with self._stage('pair_state'):
+            # Once per cycle, after the boards have dropped pairs this cycle did not see
+            self.analytics.pair_state.evict(self.now_ms)
+        with self._stage('report'):
+            # Rendered from the same summary a worker node would publish to its coordinator
+            summary = ShardSummary(self.aggregates, self.window_signals, board_report,
+                                   self.new_pairs, self.changed_pairs)
+            analysis = summary.to_analysis()
+            analysis['timestamp'] = self.now.astimezone().replace(tzinfo=None).isoformat()
+            self.analytics._record_metrics(analysis, self.new_pairs, self.changed_pairs)
+        
+        # Only a single-batch cycle has one store covering every pair
+        self.analytics.last_pairs = self.store
+        self.analytics.last_alerts = self.alerts
+        self.analytics.last_summary = summary
+        # Time spent analyzing, excluding waits for the next batch to arrive
+        self.analytics.last_cycle_seconds = self.busy_seconds
+        self.analytics.last_stage_seconds = self.stage_seconds
+        for name, seconds in self.stage_seconds.items():
+            STAGE_SECONDS.observe(seconds, stage=name)
+        return analysis
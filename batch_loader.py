@@ -0,0 +1,104 @@
+"""
+Dataloader-style coalescing of individual lookups into batched upstream calls
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Set, Tuple
+from config import *
+
+logger = logging.getLogger(__name__)
+
+
+class BatchLoader:
+    """Collects ``load(group, key)`` calls made within ``window`` seconds into one ``load_batch(group, keys)``
+
+    Keys are grouped (e.g. by chain) and a group is dispatched when its
+    window ends or it reaches ``max_batch_size`` keys, whichever comes first.
+    ``load_batch`` returns a mapping of key to result; keys it leaves out
+    resolve to None and an exception fails every caller of that batch.
+    Concurrent loads of the same key, whether pending or already in flight,
+    share one result.
+    """
+
+    def __init__(self, load_batch: Callable[[Hashable, List[Hashable]], Awaitable[Dict[Hashable, Any]]],
+                 max_batch_size: int = TOKEN_BATCH_SIZE, window: float = TOKEN_BATCH_WINDOW):
+        self.load_batch = load_batch
+        self.max_batch_size = max_batch_size
+        self.window = window
+        self.load_count = 0
+        self.batch_count = 0
+        self._pending: Dict[Hashable, Dict[Hashable, asyncio.Future]] = {}
+        self._in_flight: Dict[Tuple[Hashable, Hashable], asyncio.Future] = {}
+        self._timers: Dict[Hashable, asyncio.TimerHandle] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def load(self, group: Hashable, key: Hashable) -> Any:
+        self.load_count += 1
+        future = self._in_flight.get((group, key))
+        if future is None:
+            pending = self._pending.setdefault(group, {})
+            future = pending.get(key)
+            if future is None:
+                future = pending[key] = asyncio.get_running_loop().create_future()
+                if len(pending) >= self.max_batch_size:
+                    self._dispatch(group)
+                elif group not in self._timers:
+                    self._timers[group] = asyncio.get_running_loop().call_later(self.window, self._dispatch, group)
+        # Shielded so one caller giving up does not fail the lookup for the others
+        return await asyncio.shield(future)
+
+    def _dispatch(self, group: Hashable):
+        timer = self._timers.pop(group, None)
+        if timer is not None:
+            timer.cancel()
+        pending = self._pending.pop(group, None)
+        if not pending:
+            return
+        for key, future in pending.items():
+            self._in_flight[(group, key)] = future
+        task = asyncio.ensure_future(self._run(group, pending))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, group: Hashable, pending: Dict[Hashable, asyncio.Future]):
+        self.batch_count += 1
+        try:
+            results = await self.load_batch(group, list(pending))
+        except Exception as e:
+            logger.error(f"Batched lookup of {len(pending)} keys failed: {str(e)}")
+            results, error = {}, e
+        else:
+            error = None
+        finally:
+            for key in pending:
+                self._in_flight.pop((group, key), None)
+        for key, future in pending.items():
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(results.get(key))
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'loads': self.load_count,
+            'batches': self.batch_count,
+            'keys_per_batch': self.load_count / self.batch_count if self.batch_count else 0.0,
+        }
+
+    def close(self):
+        """Cancel scheduled and running batches; their callers see CancelledError"""
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        for pending in self._pending.values():
+            for future in pending.values():
+                future.cancel()
+        self._pending.clear()
+        for task in list(self._tasks):
+            task.cancel()
+        for future in self._in_flight.values():
+            future.cancel()
+        self._in_flight.clear()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark: columnar pair ingestion vs the original per-row loop
+
+Usage: python benchmarks/bench_ingestion.py [--sizes 10000 100000 1000000]
+"""
+
+import argparse
+import logging
+import random
+import time
+from typing import Dict, List
+
+import pandas as pd
+
+from src.ingestion import build_pair_frame
+
+logger = logging.getLogger(__name__)
+
+CHAINS = ['ethereum', 'bsc', 'polygon', 'arbitrum', 'optimism', 'solana', 'avalanche']
+
+
+def legacy_prepare_dataframe(pairs: List[Dict]) -> pd.DataFrame:
+    """The per-row implementation TokenAnalytics._prepare_dataframe used to have"""
+    data = []
+    for pair in pairs:
+        try:
+            row = {
+                'pair_address': pair.get('pairAddress'),
+                'base_token_symbol': pair.get('baseToken', {}).get('symbol'),
+                'base_token_address': pair.get('baseToken', {}).get('address'),
+                'quote_token_symbol': pair.get('quoteToken', {}).get('symbol'),
+                'chain_id': pair.get('chainId'),
+                'dex_id': pair.get('dexId'),
+                'price_usd': float(pair.get('priceUsd', 0)),
+                'volume_h24': float(pair.get('volume', {}).get('h24', 0)),
+                'price_change_h24': float(pair.get('priceChange', {}).get('h24', 0)),
+                'liquidity_usd': float(pair.get('liquidity', {}).get('usd', 0)),
+                'fdv': float(pair.get('fdv', 0)),
+                'market_cap': float(pair.get('marketCap', 0)),
+                'pair_created_at': pair.get('pairCreatedAt'),
+                'txns_h24': pair.get('txns', {}).get('h24', {}).get('buys', 0) +
+                           pair.get('txns', {}).get('h24', {}).get('sells', 0),
+                'holders': pair.get('holders', 0)
+            }
+            data.append(row)
+        except (ValueError, TypeError):
+            continue
+
+    return pd.DataFrame(data)
+
+
+def make_pairs(count: int, seed: int = 42) -> List[Dict]:
+    """Generate pairs shaped like sample_data.json, with ~1% malformed prices"""
+    rng = random.Random(seed)
+    pairs = []
+    for i in range(count):
+        price = 'n/a' if rng.random() < 0.01 else f"{rng.lognormvariate(-6, 3):.8f}"
+        pairs.append({
+            'chainId': rng.choice(CHAINS),
+            'dexId': 'uniswap',
+            'pairAddress': f"0x{i:040x}",
+            'baseToken': {'address': f"0x{i * 7:040x}", 'symbol': f"TKN{i}", 'name': f"Token {i}"},
+            'quoteToken': {'symbol': 'WETH'},
+            'priceUsd': price,
+            'volume': {'h24': f"{rng.lognormvariate(9, 2):.2f}"},
+            'priceChange': {'h24': f"{rng.gauss(0, 30):.2f}"},
+            'liquidity': {'usd': f"{rng.lognormvariate(10, 2):.2f}"},
+            'fdv': f"{rng.lognormvariate(13, 2):.0f}",
+            'marketCap': f"{rng.lognormvariate(12, 2):.0f}",
+            'pairCreatedAt': '2023-12-01T10:30:00Z',
+            'txns': {'h24': {'buys': rng.randint(0, 500), 'sells': rng.randint(0, 500)}},
+            'holders': rng.randint(0, 10000),
+        })
+    return pairs
+
+
+def _best_of(func, pairs: List[Dict], repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(pairs)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark pair ingestion')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    pd.testing.assert_frame_equal(legacy_prepare_dataframe(make_pairs(1000)),
+                                  build_pair_frame(make_pairs(1000)).drop(columns='pair_created_ms'))
+
+    print(f"{'pairs':>10}  {'legacy (s)':>11}  {'columnar (s)':>12}  {'speedup':>7}")
+    for size in args.sizes:
+        pairs = make_pairs(size)
+        repeat = 1 if size >= 1_000_000 else args.repeat
+        legacy = _best_of(legacy_prepare_dataframe, pairs, repeat)
+        columnar = _best_of(build_pair_frame, pairs, repeat)
+        print(f"{size:>10,}  {legacy:>11.3f}  {columnar:>12.3f}  {legacy / columnar:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
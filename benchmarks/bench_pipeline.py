@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Benchmark: the analysis pipeline from raw pairs to the Telegram message
+
+Times TokenAnalytics._prepare_dataframe, comprehensive_analysis (first and
+repeat cycle), generate_insights_report and TelegramBot._format_analysis_message
+on synthetic pairs, and writes the results as JSON.
+
+Usage: python benchmarks/bench_pipeline.py [--sizes 1000 10000 100000 1000000]
+                                           [--output bench_results.json]
+                                           [--compare baseline.json --tolerance 0.25]
+"""
+
+import argparse
+import json
+import logging
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.analytics import TokenAnalytics
+from src.telegram_bot import TelegramBot
+from synthetic import generate_pairs
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+
+
+def _best_of(func: Callable[[], object], repeat: int, setup: Optional[Callable[[], None]] = None) -> float:
+    """Fastest of ``repeat`` timed calls; ``setup`` runs untimed before each"""
+    best = float('inf')
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_size(size: int, seed: int, repeat: int) -> List[Dict]:
+    """Time every pipeline stage on ``size`` synthetic pairs"""
+    pairs = generate_pairs(size, seed=seed)
+    bot = TelegramBot('', '')
+    state = {}
+
+    def fresh():
+        state['analytics'] = TokenAnalytics()
+
+    def warm():
+        # A second cycle over the same pairs: every pair is known, none changed
+        state['analytics'] = TokenAnalytics()
+        state['analytics'].comprehensive_analysis(pairs)
+
+    analysis = TokenAnalytics().comprehensive_analysis(pairs)
+    report = TokenAnalytics().generate_insights_report(analysis)
+
+    timings = {
+        'prepare_dataframe': _best_of(lambda: TokenAnalytics()._prepare_dataframe(pairs), repeat),
+        'comprehensive_analysis': _best_of(lambda: state['analytics'].comprehensive_analysis(pairs), repeat, fresh),
+        'comprehensive_analysis_repeat': _best_of(lambda: state['analytics'].comprehensive_analysis(pairs),
+                                                  repeat, warm),
+        'generate_insights_report': _best_of(lambda: TokenAnalytics().generate_insights_report(analysis), repeat),
+        'format_analysis_message': _best_of(lambda: bot._format_analysis_message(report), repeat),
+    }
+    return [
+        {'benchmark': name, 'pairs': size, 'seconds': seconds,
+         'pairs_per_second': size / seconds if seconds else None}
+        for name, seconds in timings.items()
+    ]
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> Dict:
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'commit': _git_commit(),
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+    }
+
+
+def compare(results: List[Dict], baseline_path: str, tolerance: float) -> List[str]:
+    """Benchmarks more than ``tolerance`` slower than the baseline run"""
+    with open(baseline_path) as f:
+        baseline = {(entry['benchmark'], entry['pairs']): entry['seconds'] for entry in json.load(f)['results']}
+
+    regressions = []
+    for entry in results:
+        before = baseline.get((entry['benchmark'], entry['pairs']))
+        if not before:
+            continue
+        ratio = entry['seconds'] / before
+        if ratio > 1 + tolerance:
+            regressions.append(f"{entry['benchmark']} @ {entry['pairs']:,} pairs: "
+                               f"{before:.4f}s -> {entry['seconds']:.4f}s ({ratio:.2f}x)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the analysis pipeline')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='bench_results.json', help='Where to write the JSON results')
+    parser.add_argument('--compare', help='Baseline results file to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed slowdown against the baseline before failing (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    results = []
+    print(f"{'benchmark':<32}  {'pairs':>10}  {'seconds':>10}  {'pairs/s':>12}")
+    for size in args.sizes:
+        repeat = 1 if size >= 1_000_000 else args.repeat
+        for entry in run_size(size, args.seed, repeat):
+            results.append(entry)
+            print(f"{entry['benchmark']:<32}  {size:>10,}  {entry['seconds']:>10.4f}  "
+                  f"{entry['pairs_per_second'] or 0:>12,.0f}")
+
+    with open(args.output, 'w') as f:
+        json.dump({'schema': SCHEMA_VERSION, 'seed': args.seed, 'environment': environment(),
+                   'results': results}, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark: cold-start time of the bot's entry points
+
+Each scenario runs in a fresh interpreter, ``--repeat`` times, and the median
+wall time is reported, so module caches from earlier runs don't hide import
+cost. ``--importtime`` also lists the slowest imports of one scenario, from
+``python -X importtime``.
+
+Usage: python benchmarks/bench_startup.py [--repeat 5] [--importtime bot_setup]
+                                          [--output startup_results.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+# Scenario name -> code run in a fresh interpreter
+SCENARIOS = {
+    'interpreter': 'pass',
+    'import_config': 'import config',
+    'import_main': 'import src.main',
+    'cli_help': ("import sys; sys.argv = ['main.py', '--help']\n"
+                 "import src.main\n"
+                 "try:\n    src.main.main()\nexcept SystemExit:\n    pass"),
+    'bot_setup': 'import src.main; src.main.Web3AnalyticsBot()',
+    'import_analytics': 'import src.analytics',
+}
+
+
+def _environment() -> Dict[str, str]:
+    # Keep setup from touching the alert log and snapshot directory
+    return {**os.environ, 'ALERTS_PATH': '', 'SNAPSHOT_DIR': '', 'METRICS_PORT': '0'}
+
+
+def time_scenario(code: str, repeat: int) -> Dict:
+    """Median and spread of ``repeat`` fresh-interpreter runs of ``code``"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], env=_environment(), check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        samples.append(time.perf_counter() - start)
+    return {'median': statistics.median(samples), 'min': min(samples), 'max': max(samples)}
+
+
+def slowest_imports(code: str, limit: int) -> List[Dict]:
+    """Top-level imports of ``code`` by cumulative import time"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], env=_environment(),
+                            capture_output=True, text=True, check=True)
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Nested imports are indented; report only modules imported directly
+        if name.startswith(' ') and not name.startswith('  '):
+            entries.append({'module': name.strip(), 'seconds': int(cumulative) / 1e6})
+    return sorted(entries, key=lambda entry: entry['seconds'], reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark cold-start time')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--importtime', choices=list(SCENARIOS), help='Also list the slowest imports of a scenario')
+    parser.add_argument('--limit', type=int, default=15, help='Imports listed by --importtime')
+    parser.add_argument('--output', help='Also write the results as JSON')
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'scenario':<20}  {'median':>8}  {'min':>8}  {'max':>8}")
+    for name in args.scenarios:
+        results[name] = time_scenario(SCENARIOS[name], args.repeat)
+        print(f"{name:<20}  {results[name]['median']:>8.3f}  {results[name]['min']:>8.3f}  "
+              f"{results[name]['max']:>8.3f}")
+
+    imports = None
+    if args.importtime:
+        imports = slowest_imports(SCENARIOS[args.importtime], args.limit)
+        print(f"\nSlowest imports of {args.importtime}:")
+        for entry in imports:
+            print(f"  {entry['module']:<40}  {entry['seconds']:>8.3f}s")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'python': sys.version.split()[0], 'repeat': args.repeat,
+                       'results': results, 'slowest_imports': imports}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
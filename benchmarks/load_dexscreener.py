@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Load test: DexScreenerClient against the local DexScreener stub
+
+Starts DexScreenerStub with the requested faults, runs ``--users`` concurrent
+users issuing a mix of search, token, pairs and trending calls for
+``--duration`` seconds, and reports throughput, latency percentiles, failed
+calls, client retries, rate limiter state, token lookup batching and the
+faults the stub injected.
+
+Usage: python benchmarks/load_dexscreener.py [--users 20] [--duration 10] [--rate 200]
+                                             [--latency 0.05 --jitter 0.02]
+                                             [--throttle-rate 0.02 --server-error-rate 0.02]
+                                             [--truncate-rate 0.01] [--output load_results.json]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from src.dexscreener_client import DexScreenerClient
+from src.dexscreener_stub import DexScreenerStub, FaultPlan
+from src.rate_limiter import AdaptiveRateLimiter
+from config import RATE_LIMIT_PER_SECOND, SUPPORTED_CHAINS
+
+logger = logging.getLogger(__name__)
+
+# Share of calls per client method
+CALL_MIX = {
+    'search_pairs': 0.4,
+    'get_token_info': 0.3,
+    'get_recent_pairs': 0.2,
+    'get_trending_tokens': 0.1,
+}
+
+
+async def _call(client: DexScreenerClient, stub: DexScreenerStub, rng: random.Random, kind: str):
+    """One client call with randomized arguments, so most requests miss the client cache"""
+    if kind == 'search_pairs':
+        return await client.search_pairs(f'TKN{rng.randrange(len(stub.pairs))}')
+    if kind == 'get_token_info':
+        pair = rng.choice(stub.pairs)
+        return await client.get_token_info(pair['chainId'], pair['baseToken']['address'])
+    if kind == 'get_recent_pairs':
+        return await client._make_request('pairs', {'chainId': rng.choice(SUPPORTED_CHAINS)})
+    return await client.get_trending_tokens()
+
+
+async def _user(client: DexScreenerClient, stub: DexScreenerStub, seed: int, deadline: float,
+                samples: Dict[str, List[float]], failures: Dict[str, int]):
+    rng = random.Random(seed)
+    kinds, weights = list(CALL_MIX), list(CALL_MIX.values())
+    while time.perf_counter() < deadline:
+        kind = rng.choices(kinds, weights)[0]
+        start = time.perf_counter()
+        result = await _call(client, stub, rng, kind)
+        elapsed = time.perf_counter() - start
+        if result is None:
+            failures[kind] = failures.get(kind, 0) + 1
+        else:
+            samples.setdefault(kind, []).append(elapsed)
+
+
+def _summary(latencies: List[float], duration: float) -> Dict:
+    if not latencies:
+        return {'calls': 0}
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {'calls': len(latencies), 'per_second': len(latencies) / duration,
+            'p50': p50, 'p95': p95, 'p99': p99, 'max': max(latencies)}
+
+
+async def run_load(users: int, duration: float, faults: FaultPlan, seed: int,
+                   rate: float = RATE_LIMIT_PER_SECOND) -> Dict:
+    stub = DexScreenerStub(faults=faults)
+    base_url = await stub.start()
+    client = DexScreenerClient('', base_url=base_url)
+    client.rate_limiter = AdaptiveRateLimiter(rate=rate, burst=max(1, int(rate)))
+    samples: Dict[str, List[float]] = {}
+    failures: Dict[str, int] = {}
+    try:
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(_user(client, stub, seed + i, deadline, samples, failures) for i in range(users)))
+        elapsed = time.perf_counter() - started
+    finally:
+        await client.close()
+        await stub.stop()
+
+    every = [latency for latencies in samples.values() for latency in latencies]
+    return {
+        'users': users,
+        'duration': elapsed,
+        'overall': {**_summary(every, elapsed), 'failed': sum(failures.values())},
+        'calls': {kind: {**_summary(samples.get(kind, []), elapsed), 'failed': failures.get(kind, 0)}
+                  for kind in CALL_MIX},
+        'client_retries': client.retry_count,
+        'rate_limiter': client.rate_limiter.stats(),
+        'token_batching': client.token_loader.stats(),
+        'server': stub.stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test DexScreenerClient against a local stub')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--rate', type=float, default=RATE_LIMIT_PER_SECOND,
+                        help='Client rate limit in requests per second (the production default caps throughput)')
+    parser.add_argument('--latency', type=float, default=0.05, help='Stub response latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.02)
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Share of requests answered 429')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='Retry-After sent with each 429')
+    parser.add_argument('--server-error-rate', type=float, default=0.0, help='Share of requests answered 503')
+    parser.add_argument('--truncate-rate', type=float, default=0.0, help='Share of bodies cut off mid-response')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Also write the results as JSON')
+    args = parser.parse_args()
+
+    # The client logs every injected fault; the summary counts them instead
+    logging.disable(logging.ERROR)
+
+    faults = FaultPlan(latency=args.latency, jitter=args.jitter, throttle_rate=args.throttle_rate,
+                       server_error_rate=args.server_error_rate, truncate_rate=args.truncate_rate,
+                       retry_after=args.retry_after, seed=args.seed)
+    results = asyncio.run(run_load(args.users, args.duration, faults, args.seed, args.rate))
+
+    print(f"{'call':<22}  {'calls':>7}  {'calls/s':>8}  {'p50':>7}  {'p95':>7}  {'p99':>7}  {'failed':>6}")
+    for kind, entry in [*results['calls'].items(), ('overall', results['overall'])]:
+        if not entry['calls']:
+            print(f"{kind:<22}  {0:>7}  {'-':>8}  {'-':>7}  {'-':>7}  {'-':>7}  {entry['failed']:>6}")
+            continue
+        print(f"{kind:<22}  {entry['calls']:>7}  {entry['per_second']:>8.1f}  {entry['p50']:>7.3f}  "
+              f"{entry['p95']:>7.3f}  {entry['p99']:>7.3f}  {entry['failed']:>6}")
+    print(f"client retries: {results['client_retries']}")
+    print(f"rate limiter:   {results['rate_limiter']}")
+    print(f"token batching: {results['token_batching']}")
+    print(f"server:         {results['server']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Seeded generator of synthetic DexScreener pairs, shaped like sample_data.json
+"""
+
+import random
+import string
+import time
+from typing import Dict, List, Optional
+
+# Share of pairs per chain, roughly following DexScreener's new-pair volume
+CHAIN_WEIGHTS = {
+    'solana': 0.30,
+    'bsc': 0.22,
+    'ethereum': 0.18,
+    'arbitrum': 0.10,
+    'polygon': 0.08,
+    'optimism': 0.06,
+    'avalanche': 0.06,
+}
+
+DEXES = {
+    'solana': ['raydium', 'orca', 'meteora'],
+    'bsc': ['pancakeswap', 'biswap'],
+    'ethereum': ['uniswap', 'sushiswap'],
+    'arbitrum': ['uniswap', 'camelot'],
+    'polygon': ['quickswap', 'uniswap'],
+    'optimism': ['velodrome', 'uniswap'],
+    'avalanche': ['traderjoe', 'pangolin'],
+}
+
+QUOTES = {
+    'solana': ['SOL', 'USDC'],
+    'bsc': ['WBNB', 'USDT'],
+    'ethereum': ['WETH', 'USDC'],
+    'arbitrum': ['WETH', 'USDC'],
+    'polygon': ['WMATIC', 'USDC'],
+    'optimism': ['WETH', 'USDC'],
+    'avalanche': ['WAVAX', 'USDC'],
+}
+
+_BASE58 = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+
+# Ways a field can arrive broken, and the share of pairs affected by each
+MALFORMED = [
+    ('price_text', 0.004),       # priceUsd: "n/a"
+    ('missing_volume', 0.003),   # no volume section at all
+    ('null_change', 0.003),      # priceChange.h24: null
+    ('missing_holders', 0.05),   # holders absent (common for new pairs)
+    ('bad_created', 0.002),      # unparseable pairCreatedAt
+]
+
+
+def _address(rng: random.Random, chain: str) -> str:
+    if chain == 'solana':
+        return ''.join(rng.choice(_BASE58) for _ in range(44))
+    return '0x' + ''.join(rng.choice('0123456789abcdef') for _ in range(40))
+
+
+def _symbol_pool(rng: random.Random, size: int) -> List[str]:
+    """Ticker symbols; many launches reuse popular ones, so symbols repeat"""
+    return [''.join(rng.choice(string.ascii_uppercase) for _ in range(rng.randint(3, 6))) for _ in range(size)]
+
+
+def generate_pairs(count: int, seed: int = 42, now_ms: Optional[int] = None,
+                   window_hours: float = 72, malformed: bool = True) -> List[Dict]:
+    """Generate ``count`` pairs deterministically for ``seed``
+
+    Prices, volumes, liquidity and holder counts are heavy-tailed; liquidity
+    and market cap are correlated with volume; creation times are spread over
+    the last ``window_hours`` as epoch milliseconds (with some ISO strings).
+    With ``malformed`` set, a small share of pairs carry the broken or missing
+    fields listed in ``MALFORMED``.
+    """
+    rng = random.Random(seed)
+    now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+    chains = list(CHAIN_WEIGHTS)
+    weights = list(CHAIN_WEIGHTS.values())
+    symbols = _symbol_pool(rng, max(16, count // 20))
+
+    pairs = []
+    for i in range(count):
+        chain = rng.choices(chains, weights)[0]
+        volume = rng.lognormvariate(8, 2.5)
+        liquidity = volume * rng.lognormvariate(0, 1)
+        market_cap = liquidity * rng.lognormvariate(1.5, 1)
+        created_ms = now_ms - int(rng.random() * window_hours * 3600 * 1000)
+        buys = int(rng.paretovariate(1.2) * 10)
+        sells = int(buys * rng.uniform(0.3, 1.2))
+        # Mostly small moves, with a fat tail of pumps and dumps
+        change = rng.gauss(0, 8) if rng.random() < 0.9 else rng.choice([-1, 1]) * rng.lognormvariate(3.5, 1)
+
+        pair = {
+            'chainId': chain,
+            'dexId': rng.choice(DEXES[chain]),
+            'pairAddress': _address(rng, chain),
+            'baseToken': {
+                'address': _address(rng, chain),
+                'symbol': rng.choice(symbols),
+                'name': f'Token {i}',
+            },
+            'quoteToken': {'symbol': rng.choice(QUOTES[chain])},
+            'priceUsd': f'{rng.lognormvariate(-7, 4):.12g}',
+            'volume': {'h24': f'{volume:.2f}'},
+            'priceChange': {'h24': f'{change:.2f}'},
+            'liquidity': {'usd': f'{liquidity:.2f}'},
+            'fdv': f'{market_cap * rng.uniform(1, 3):.0f}',
+            'marketCap': f'{market_cap:.0f}',
+            'pairCreatedAt': created_ms,
+            'txns': {'h24': {'buys': buys, 'sells': sells}},
+            'holders': int(rng.paretovariate(1.1) * 20),
+        }
+        if rng.random() < 0.1:
+            pair['pairCreatedAt'] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(created_ms / 1000))
+
+        if malformed:
+            for kind, rate in MALFORMED:
+                if rng.random() >= rate:
+                    continue
+                if kind == 'price_text':
+                    pair['priceUsd'] = 'n/a'
+                elif kind == 'missing_volume':
+                    del pair['volume']
+                elif kind == 'null_change':
+                    pair['priceChange']['h24'] = None
+                elif kind == 'missing_holders':
+                    del pair['holders']
+                elif kind == 'bad_created':
+                    pair['pairCreatedAt'] = 'unknown'
+        pairs.append(pair)
+    return pairs
@@ -3,14 +3,63 @@ Configuration settings for Web3 Token Analytics Bot
 """
 
 import os
-from dotenv import load_dotenv
+import dataclasses
+from typing import Mapping, Optional
 
-load_dotenv()
+ENV_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env')
 
-# API Configuration
-DEXSCREENER_API_KEY = os.getenv('DEXSCREENER_API_KEY', '')
-TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN', '')
-TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID', '')
+
+@dataclasses.dataclass(frozen=True)
+class Settings:
+    """Deployment settings, read once from the environment (and ``.env``)
+
+    Each field is overridden by the environment variable of the same name in
+    upper case; an empty value means 0 for integer fields.
+    """
+
+    dexscreener_api_key: str = ''
+    telegram_bot_token: str = ''
+    telegram_chat_id: str = ''
+    dexscreener_base_url: str = 'https://api.dexscreener.com/latest/dex'  # point at a local stub for load tests
+    analytics_workers: int = os.cpu_count() or 1  # processes; 0 analyzes on the event loop
+    snapshot_dir: str = 'data/snapshots'  # empty disables per-cycle snapshots
+    alerts_path: str = 'data/alerts.jsonl'  # subscription log; empty keeps alerts in memory only
+    discovery_state_path: str = ''  # set to discover pairs incrementally, persisting the state here
+    node_role: str = ''  # empty runs standalone; 'worker' analyzes a shard of the chains, 'coordinator' merges shards
+    shard_index: int = 0  # this worker's shard, from 0 to shard_count - 1
+    shard_count: int = 1
+    shard_queue_dir: str = 'data/shards'  # directory workers publish cycle summaries to for the coordinator
+    metrics_host: str = '127.0.0.1'  # interface the /metrics endpoint listens on
+    metrics_port: int = 9464  # 0 disables the endpoint; worker nodes add 1 + their shard index
+    log_level: str = 'INFO'
+
+    @classmethod
+    def from_env(cls, environ: Optional[Mapping[str, str]] = None, env_file: str = ENV_FILE) -> 'Settings':
+        """Parse settings from ``environ`` (default ``os.environ``) layered over ``env_file``"""
+        values = {}
+        if os.path.exists(env_file):
+            # dotenv is only imported when there is a file for it to read
+            from dotenv import dotenv_values
+            values.update({key: value for key, value in dotenv_values(env_file).items() if value is not None})
+        values.update(os.environ if environ is None else environ)
+
+        parsed = {}
+        for field in dataclasses.fields(cls):
+            raw = values.get(field.name.upper())
+            if raw is None:
+                continue
+            if field.type is int:
+                try:
+                    parsed[field.name] = int(raw) if raw.strip() else 0
+                except ValueError:
+                    raise ValueError(f"{field.name.upper()} must be an integer, got {raw!r}") from None
+            else:
+                parsed[field.name] = raw
+        return cls(**parsed)
+
+
+# The deployment settings; components take them as arguments and default to these fields
+SETTINGS = Settings.from_env()
 
 # Analytics Settings
 TIME_WINDOW_HOURS = 24
@@ -18,6 +67,7 @@ MIN_VOLUME_THRESHOLD = 10000  # USD
 MIN_HOLDERS_THRESHOLD = 100
 PUMP_THRESHOLD = 0.15  # 15% price increase
 DUMP_THRESHOLD = -0.10  # 10% price decrease
+SKETCH_RELATIVE_ACCURACY = 0.01  # medians and quantiles are within 1% of an exact value
 
 # Chain Support
 SUPPORTED_CHAINS = [
@@ -30,11 +80,80 @@ SUPPORTED_CHAINS = [
     'avalanche'
 ]
 
+# Pair State Settings
+PAIR_STATE_TTL = TIME_WINDOW_HOURS * 3600  # seconds a pair is remembered after it was last seen
+METRICS_HISTORY_SIZE = 168  # per-cycle summaries kept in TokenAnalytics.metrics_history
+
+# Rolling Indicators
+INDICATOR_WINDOWS = {'5m': 300, '1h': 3600, '6h': 6 * 3600, '24h': 24 * 3600}  # window name -> seconds
+INDICATOR_TIERS = [(0, 16), (1800, 50)]  # ring buffers as (min seconds between samples, samples kept)
+INDICATOR_WINDOW_SLACK = 0.2  # fraction of a window a reference sample may fall short of it
+
+# Leaderboards
+LEADERBOARD_SIZE = 10  # entries kept exact per leaderboard
+LEADERBOARD_SLACK = 4  # candidates kept per leaderboard, as a multiple of LEADERBOARD_SIZE
+LEADERBOARD_SHOWN = 5  # entries per leaderboard in reports and Telegram messages
+
+# Sharding
+SHARD_TIMEOUT = 600  # seconds the coordinator waits for every shard's summary of a cycle
+SHARD_POLL_INTERVAL = 1.0  # seconds between checks of the shard queue
+
 # Cache Settings
 CACHE_DURATION = 300  # 5 minutes
+CACHE_STALE_DURATION = 600  # seconds a stale response may still be served while it is refreshed
+CACHE_MAX_ENTRIES = 5000
+CACHE_MAX_BYTES = 64 * 1024 * 1024
 MAX_RETRIES = 3
 RETRY_DELAY = 1
+RETRYABLE_STATUSES = (500, 502, 503, 504)  # transient upstream errors retried with backoff
+
+# HTTP Connection Settings
+MAX_CONCURRENT_REQUESTS = 8  # upper bound of the adaptive concurrency window
+MIN_CONCURRENT_REQUESTS = 1
+RATE_LIMIT_PER_SECOND = 5.0  # token refill rate ceiling (DexScreener allows ~300 req/min)
+RATE_LIMIT_BURST = 10  # token bucket capacity
+MIN_REQUEST_RATE = 0.5  # floor the refill rate backs off to on 429s
+HTTP_POOL_SIZE = 32  # total pooled connections
+HTTP_POOL_PER_HOST = 16  # pooled connections per host
+DNS_CACHE_TTL = 300  # seconds
+KEEPALIVE_TIMEOUT = 60  # seconds an idle connection is kept open
+REQUEST_TIMEOUT = 30  # seconds per request
+
+# Token Lookup Batching
+TOKEN_BATCH_SIZE = 30  # addresses per multi-token request (DexScreener's limit)
+TOKEN_BATCH_WINDOW = 0.01  # seconds lookups are collected before a batch is sent
+
+# Incremental Discovery
+DISCOVERY_PAGE_SIZE = 100  # pairs per page when paging newest first
+DISCOVERY_MAX_PAGES = 100  # pages fetched per chain and cycle at most
+DISCOVERY_FULL_REFRESH_CYCLES = 24  # incremental cycles between full refetches of a chain's window (0 never)
+DISCOVERY_REFRESH_BATCH_SIZE = 30  # tracked pairs per multi-pair request when refreshing their values (DexScreener's limit)
+
+# Streaming Settings
+STREAM_BATCH_SIZE = 1000  # pairs per batch handed to the analytics pipeline
+STREAM_CHUNK_BYTES = 64 * 1024  # bytes read from the socket at a time
+
+# Monitoring Schedule
+MONITOR_MAX_IN_FLIGHT = 2  # overlapping cycles (one fetching, one analyzing) before ticks are skipped
+PREFETCH_BATCHES = 8  # pair batches buffered between the fetch and analysis stages
+
+# Snapshot Storage
+SNAPSHOT_CHANGED_ONLY = False  # write only pairs that are new or changed since the previous cycle (a change log)
+
+# Alert Subscriptions
+ALERT_MAX_PER_CHAT = 50
+
+# Telegram Delivery
+TELEGRAM_GLOBAL_RATE = 25.0  # messages per second across all chats (Telegram allows ~30)
+TELEGRAM_CHAT_INTERVAL = 1.0  # minimum seconds between messages to one chat
+TELEGRAM_COALESCE_WINDOW = 1.0  # seconds to gather nearby alerts into one message
+TELEGRAM_MAX_MESSAGE_LENGTH = 4096  # Telegram's limit per message
+TELEGRAM_QUEUE_SIZE = 1000  # queued messages before new ones are dropped
+TELEGRAM_FLUSH_TIMEOUT = 30  # seconds to wait for the queue to drain on shutdown
+
+# Metrics and Profiling
+PROFILER_INTERVAL = 0.005  # seconds between stack samples while /profile is running
+PROFILER_MAX_SECONDS = 300  # longest profile /profile will run
 
 # Logging
-LOG_LEVEL = 'INFO'
 LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -4,53 +4,229 @@ DexScreener API Client for fetching token and pair data
 
 import aiohttp
 import asyncio
+import json
 import logging
-from typing import Dict, List, Optional
+import time
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Set, Tuple
 from config import *
+from src.batch_loader import BatchLoader
+from src.discovery import created_ms
+from src.json_stream import iter_json_array
+from src.metrics import REGISTRY
+from src.rate_limiter import AdaptiveRateLimiter, parse_retry_after
+from src.utils import Cache
 
 logger = logging.getLogger(__name__)
 
+
+class IncompleteStreamError(Exception):
+    """A streamed response broke off after some of its batches were already yielded"""
+
+
+REQUEST_SECONDS = REGISTRY.histogram('dexscreener_request_seconds',
+                                     'DexScreener request latency, including time queued in the rate limiter',
+                                     ('endpoint', 'status'))
+
+
+def _observe_request(endpoint: str, status, started: float):
+    # Label by the first path segment so token addresses don't explode the label set
+    REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint.split('/')[0], status=status)
+
+
 class DexScreenerClient:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, base_url: str = SETTINGS.dexscreener_base_url):
         self.api_key = api_key
-        self.base_url = "https://api.dexscreener.com/latest/dex"
+        self.base_url = base_url.rstrip('/')
         self.session = None
+        self.rate_limiter = AdaptiveRateLimiter()
+        self.cache = Cache(ttl=CACHE_DURATION, max_entries=CACHE_MAX_ENTRIES,
+                           max_bytes=CACHE_MAX_BYTES, stale_ttl=CACHE_STALE_DURATION)
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._background: Set[asyncio.Task] = set()
+        self.token_loader = BatchLoader(self._fetch_tokens)
+        self.retry_count = 0
         
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+        self._ensure_session()
         return self
         
     async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+        
+    def _ensure_session(self) -> aiohttp.ClientSession:
+        """Create the pooled session on first use"""
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=HTTP_POOL_SIZE,
+                limit_per_host=HTTP_POOL_PER_HOST,
+                ttl_dns_cache=DNS_CACHE_TTL,
+                keepalive_timeout=KEEPALIVE_TIMEOUT
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+            )
+        return self.session
+        
+    async def close(self):
+        """Close the session and its connection pool"""
+        for task in list(self._background):
+            task.cancel()
+        self.token_loader.close()
         if self.session:
             await self.session.close()
+            self.session = None
             
     async def _make_request(self, endpoint: str, params: Dict = None) -> Optional[Dict]:
         """Make API request to DexScreener"""
+        result = await self._request(endpoint, params)
+        return result[0] if result else None
+        
+    async def _request(self, endpoint: str, params: Dict = None) -> Optional[Tuple[Dict, int]]:
+        """Make API request, returning the decoded body and its size in bytes"""
+        body = await self._request_raw(endpoint, params)
+        if body is None:
+            return None
+        try:
+            return json.loads(body), len(body)
+        except ValueError as e:
+            logger.error(f"Malformed response body from {endpoint}: {str(e)}")
+            return None
+    
+    async def _request_raw(self, endpoint: str, params: Dict = None) -> Optional[bytes]:
+        """Make API request, returning the undecoded response body"""
         headers = {}
         if self.api_key:
             headers['Authorization'] = f'Bearer {self.api_key}'
             
         url = f"{self.base_url}/{endpoint}"
+        session = self._ensure_session()
         
         for attempt in range(MAX_RETRIES):
+            if attempt:
+                self.retry_count += 1
+            started = time.perf_counter()
             try:
-                async with self.session.get(url, params=params, headers=headers) as response:
+                async with self.rate_limiter, session.get(url, params=params, headers=headers) as response:
                     if response.status == 200:
-                        return await response.json()
-                    elif response.status == 429:
-                        logger.warning("Rate limit hit, waiting...")
-                        await asyncio.sleep(RETRY_DELAY * (attempt + 1))
+                        self.rate_limiter.on_success()
+                        body = await response.read()
+                        _observe_request(endpoint, 200, started)
+                        return body
+                    _observe_request(endpoint, response.status, started)
+                    if response.status == 429:
+                        # The shared limiter pauses every caller, not just this one
+                        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                        self.rate_limiter.on_throttle(retry_after or RETRY_DELAY * (attempt + 1))
+                        continue
+                    elif response.status in RETRYABLE_STATUSES:
+                        logger.warning(f"API error {response.status}, retrying")
                     else:
                         logger.error(f"API error {response.status}: {await response.text()}")
                         return None
             except Exception as e:
+                _observe_request(endpoint, 'error', started)
                 logger.error(f"Request failed: {str(e)}")
                 if attempt == MAX_RETRIES - 1:
                     return None
                 await asyncio.sleep(RETRY_DELAY * (attempt + 1))
+                continue
+            # Transient server error: back off outside the limiter before retrying
+            if attempt < MAX_RETRIES - 1:
+                await asyncio.sleep(RETRY_DELAY * (attempt + 1))
                 
         return None
     
+    async def _stream_request(self, endpoint: str, params: Dict = None, key: str = 'pairs',
+                              batch_size: int = STREAM_BATCH_SIZE) -> AsyncIterator[List[Dict]]:
+        """Make API request and decode the ``key`` array incrementally, in batches
+        
+        The body is never held in memory as a whole. Failures are retried only
+        until the first batch has been yielded; after that they raise
+        ``IncompleteStreamError``, since the consumer holds a partial result.
+        """
+        headers = {}
+        if self.api_key:
+            headers['Authorization'] = f'Bearer {self.api_key}'
+            
+        url = f"{self.base_url}/{endpoint}"
+        session = self._ensure_session()
+        yielded = False
+        
+        for attempt in range(MAX_RETRIES):
+            if attempt:
+                self.retry_count += 1
+            started = time.perf_counter()
+            try:
+                async with self.rate_limiter, session.get(url, params=params, headers=headers) as response:
+                    if response.status == 200:
+                        self.rate_limiter.on_success()
+                        chunks = response.content.iter_chunked(STREAM_CHUNK_BYTES)
+                        async for batch in iter_json_array(chunks, key, batch_size):
+                            yielded = True
+                            yield batch
+                        # Covers the whole body, including time the consumer spent on each batch
+                        _observe_request(endpoint, 200, started)
+                        return
+                    _observe_request(endpoint, response.status, started)
+                    if response.status == 429:
+                        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                        self.rate_limiter.on_throttle(retry_after or RETRY_DELAY * (attempt + 1))
+                        continue
+                    elif response.status in RETRYABLE_STATUSES:
+                        logger.warning(f"API error {response.status}, retrying")
+                    else:
+                        logger.error(f"API error {response.status}: {await response.text()}")
+                        return
+            except Exception as e:
+                _observe_request(endpoint, 'error', started)
+                logger.error(f"Streaming request failed: {str(e)}")
+                if yielded:
+                    raise IncompleteStreamError(f"{endpoint} stream broke off: {str(e)}") from e
+                if attempt == MAX_RETRIES - 1:
+                    return
+                await asyncio.sleep(RETRY_DELAY * (attempt + 1))
+                continue
+            if attempt < MAX_RETRIES - 1:
+                await asyncio.sleep(RETRY_DELAY * (attempt + 1))
+    
+    async def _cached_request(self, endpoint: str, params: Dict = None) -> Optional[Dict]:
+        """Serve from cache, revalidating stale entries in the background
+        
+        Concurrent misses for the same request share a single upstream call.
+        """
+        key = self._cache_key(endpoint, params)
+        entry = self.cache.get_entry(key)
+        if entry is not None:
+            data, fresh = entry
+            if not fresh and key not in self._in_flight:
+                task = asyncio.ensure_future(self._coalesced_fetch(key, endpoint, params))
+                self._background.add(task)
+                task.add_done_callback(self._background.discard)
+            return data
+        return await self._coalesced_fetch(key, endpoint, params)
+    
+    async def _coalesced_fetch(self, key: str, endpoint: str, params: Dict = None) -> Optional[Dict]:
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch_into_cache(key, endpoint, params))
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # Shielded so one caller giving up does not cancel the request for the others
+        return await asyncio.shield(future)
+    
+    async def _fetch_into_cache(self, key: str, endpoint: str, params: Dict = None) -> Optional[Dict]:
+        result = await self._request(endpoint, params)
+        if result is None:
+            return None
+        data, size = result
+        self.cache.set(key, data, size=size)
+        return data
+    
+    @staticmethod
+    def _cache_key(endpoint: str, params: Dict = None) -> str:
+        return f"{endpoint}?{sorted((params or {}).items())}"
+    
     async def get_recent_pairs(self, hours: int = 24) -> List[Dict]:
         """Get recently created trading pairs"""
         params = {
@@ -62,16 +238,218 @@ class DexScreenerClient:
         data = await self._make_request('pairs', params)
         return data.get('pairs', []) if data else []
     
+    async def get_pairs_by_address(self, chain: str, addresses: Sequence[str],
+                                   batch_size: int = DISCOVERY_REFRESH_BATCH_SIZE) -> List[Dict]:
+        """Current data of known pairs of one chain, ``batch_size`` addresses per request
+        
+        Batches are requested concurrently under the shared rate limiter; a
+        failed batch is logged and its pairs are left out of the result.
+        """
+        batches = [list(addresses[start:start + batch_size]) for start in range(0, len(addresses), batch_size)]
+        responses = await asyncio.gather(*(self._make_request(f'pairs/{chain}/{",".join(batch)}')
+                                           for batch in batches))
+        pairs = []
+        for batch, data in zip(batches, responses):
+            if data is None:
+                logger.warning(f"Could not refresh {len(batch)} {chain} pairs")
+                continue
+            pairs.extend(data.get('pairs') or [])
+        return pairs
+    
+    async def get_pairs_since(self, chain: str, since_ms: Optional[int], hours: float = 24,
+                              page_size: int = DISCOVERY_PAGE_SIZE,
+                              max_pages: int = DISCOVERY_MAX_PAGES) -> Tuple[Optional[List[Dict]], int]:
+        """Pairs of one chain created at or after ``since_ms``, paging newest first
+        
+        Paging stops after the first page that reaches a pair older than
+        ``since_ms`` (already known) or comes back short. With ``since_ms``
+        None the whole window is fetched. Returns the pairs and the number of
+        pages requested; the pairs are None if any page failed, since a gap
+        would otherwise be skipped for good.
+        """
+        pairs = []
+        for page in range(1, max_pages + 1):
+            params = {
+                'chainId': chain,
+                'timeframe': f'{hours:g}h',
+                'sort': 'createdAt',
+                'order': 'desc',
+                'page': page,
+                'limit': page_size
+            }
+            data = await self._make_request('pairs', params)
+            if data is None:
+                return None, page
+            page_pairs = data.get('pairs') or []
+            if since_ms is None:
+                pairs.extend(page_pairs)
+                reached_known = False
+            else:
+                created = [created_ms(pair) for pair in page_pairs]
+                # Pairs without a creation time can't be placed relative to the mark; keep them
+                pairs.extend(pair for pair, at in zip(page_pairs, created) if at is None or at >= since_ms)
+                reached_known = any(at is not None and at < since_ms for at in created)
+            if reached_known or len(page_pairs) < page_size:
+                return pairs, page
+        logger.warning(f"Stopped paging {chain} pairs after {max_pages} pages")
+        return pairs, max_pages
+    
+    async def iter_recent_pairs(self, hours: int = 24, chains: Optional[Sequence[str]] = None,
+                                queries: Optional[Sequence[str]] = None) -> AsyncIterator[Tuple[str, List[Dict]]]:
+        """Fetch recent pairs for every chain (and query shard) concurrently
+        
+        Yields ``(chain, pairs)`` as each request completes, so total time tracks
+        the slowest request rather than the sum of all of them. Concurrency is
+        bounded by the client's adaptive rate limiter.
+        """
+        async def fetch(chain: str, query: Optional[str]) -> Tuple[str, List[Dict]]:
+            params = {
+                'chainId': chain,
+                'timeframe': f'{hours}h',
+                'sort': 'createdAt',
+                'order': 'desc'
+            }
+            if query:
+                params['q'] = query
+            data = await self._make_request('pairs', params)
+            return chain, data.get('pairs', []) if data else []
+        
+        tasks = [
+            asyncio.ensure_future(fetch(chain, query))
+            for chain in (chains or SUPPORTED_CHAINS)
+            for query in (queries or [None])
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    async def stream_recent_pairs(self, hours: int = 24, chains: Optional[Sequence[str]] = None,
+                                  batch_size: int = STREAM_BATCH_SIZE) -> AsyncIterator[List[Dict]]:
+        """Stream recent pairs from every chain as fixed-size batches
+        
+        Chains are fetched concurrently; a bounded queue applies backpressure so
+        decoding never runs far ahead of the consumer. A chain whose stream
+        breaks off midway raises ``IncompleteStreamError`` here, so the cycle
+        is abandoned rather than finished on part of the pairs.
+        """
+        chains = list(chains or SUPPORTED_CHAINS)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=len(chains))
+        
+        async def pump(chain: str):
+            params = {
+                'chainId': chain,
+                'timeframe': f'{hours}h',
+                'sort': 'createdAt',
+                'order': 'desc'
+            }
+            ended: Optional[Exception] = None
+            try:
+                async for batch in self._stream_request('pairs', params, batch_size=batch_size):
+                    await queue.put(batch)
+            except Exception as e:
+                ended = e
+            # Not reached when cancelled: the consumer has stopped and a full queue would never drain
+            await queue.put(ended or None)
+        
+        tasks = [asyncio.ensure_future(pump(chain)) for chain in chains]
+        try:
+            remaining = len(tasks)
+            while remaining:
+                batch = await queue.get()
+                if batch is None:
+                    remaining -= 1
+                elif isinstance(batch, Exception):
+                    raise batch
+                else:
+                    yield batch
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Wait for the pumps to release their responses before returning
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def iter_recent_payloads(self, hours: int = 24,
+                                   chains: Optional[Sequence[str]] = None) -> AsyncIterator[Tuple[str, bytes]]:
+        """Fetch every chain's recent pairs concurrently, yielding ``(chain, raw body)`` as each completes
+        
+        The body is left undecoded so it can be handed to a worker process as plain bytes.
+        """
+        async def fetch(chain: str) -> Tuple[str, Optional[bytes]]:
+            params = {
+                'chainId': chain,
+                'timeframe': f'{hours}h',
+                'sort': 'createdAt',
+                'order': 'desc'
+            }
+            return chain, await self._request_raw('pairs', params)
+        
+        tasks = [asyncio.ensure_future(fetch(chain)) for chain in (chains or SUPPORTED_CHAINS)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                chain, body = await next_done
+                if body is not None:
+                    yield chain, body
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    async def get_recent_pairs_all_chains(self, hours: int = 24, chains: Optional[Sequence[str]] = None,
+                                          queries: Optional[Sequence[str]] = None) -> List[Dict]:
+        """Get recently created pairs across all supported chains, de-duplicated"""
+        pairs = []
+        seen = set()
+        async for chain, chain_pairs in self.iter_recent_pairs(hours, chains, queries):
+            for pair in chain_pairs:
+                key = (pair.get('chainId', chain), pair.get('pairAddress'))
+                if key not in seen:
+                    seen.add(key)
+                    pairs.append(pair)
+        return pairs
+    
     async def search_pairs(self, query: str) -> List[Dict]:
         """Search for pairs by token address or symbol"""
         params = {'q': query}
-        data = await self._make_request('search', params)
+        data = await self._cached_request('search', params)
         return data.get('pairs', []) if data else []
     
     async def get_token_info(self, chain: str, address: str) -> Optional[Dict]:
-        """Get detailed token information"""
-        endpoint = f'tokens/{chain}/{address}'
-        return await self._make_request(endpoint)
+        """Get detailed token information
+        
+        Misses are batched: lookups made within ``TOKEN_BATCH_WINDOW`` share
+        one multi-address request per chain, cached per address as before.
+        """
+        entry = self.cache.get_entry(self._cache_key(f'tokens/{chain}/{address}'))
+        if entry is not None:
+            data, fresh = entry
+            if not fresh:
+                task = asyncio.ensure_future(self.token_loader.load(chain, address))
+                self._background.add(task)
+                task.add_done_callback(self._background.discard)
+            return data
+        return await self.token_loader.load(chain, address)
+    
+    async def _fetch_tokens(self, chain: str, addresses: List[str]) -> Dict[str, Optional[Dict]]:
+        """One request for up to ``TOKEN_BATCH_SIZE`` tokens, split back into per-address responses"""
+        result = await self._request(f'tokens/{chain}/{",".join(addresses)}')
+        if result is None:
+            return {}
+        data, size = result
+        if len(addresses) == 1:
+            responses = {addresses[0]: data}
+        else:
+            # The response lists every pair of every token; hand each token the pairs it trades in
+            pairs: Dict[str, List[Dict]] = {address.lower(): [] for address in addresses}
+            for pair in data.get('pairs') or []:
+                tokens = {((pair.get(side) or {}).get('address') or '').lower() for side in ('baseToken', 'quoteToken')}
+                for token in tokens & pairs.keys():
+                    pairs[token].append(pair)
+            responses = {address: {**data, 'pairs': pairs[address.lower()]} for address in addresses}
+        for address, response in responses.items():
+            self.cache.set(self._cache_key(f'tokens/{chain}/{address}'), response, size=size // len(addresses))
+        return responses
     
     async def get_trending_tokens(self) -> List[Dict]:
         """Get trending tokens across all chains"""
@@ -0,0 +1,262 @@
+"""
+Local stand-in for the DexScreener API, with record/replay and fault injection
+"""
+
+import asyncio
+import copy
+import json
+import logging
+import os
+import random
+from typing import Callable, Dict, List, Optional
+
+import aiohttp
+from aiohttp import web
+from config import *
+from src.discovery import created_ms
+
+logger = logging.getLogger(__name__)
+
+API_PREFIX = '/latest/dex'
+
+# Faults the stub can inject, in the order they are rolled for each request
+FAULT_KINDS = ('throttle', 'server_error', 'truncate')
+
+
+class FaultPlan:
+    """Which faults to inject, either scripted or at random
+
+    ``script`` is consumed first, one entry per request (``None`` for a normal
+    response, otherwise one of ``FAULT_KINDS``); after that each request rolls
+    the ``*_rate`` probabilities. Latency applies to every response.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, throttle_rate: float = 0.0,
+                 server_error_rate: float = 0.0, truncate_rate: float = 0.0, retry_after: float = 1.0,
+                 script: Optional[List[Optional[str]]] = None, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.rates = {'throttle': throttle_rate, 'server_error': server_error_rate, 'truncate': truncate_rate}
+        self.retry_after = retry_after
+        self.script = list(script or [])
+        self._rng = random.Random(seed)
+
+    def update(self, settings: Dict):
+        """Change settings in place (used by the ``/_faults`` admin endpoint)"""
+        for name in ('latency', 'jitter', 'retry_after'):
+            if name in settings:
+                setattr(self, name, float(settings[name]))
+        for kind in FAULT_KINDS:
+            if f'{kind}_rate' in settings:
+                self.rates[kind] = float(settings[f'{kind}_rate'])
+        if 'script' in settings:
+            self.script = list(settings['script'])
+
+    def next_fault(self) -> Optional[str]:
+        if self.script:
+            return self.script.pop(0)
+        for kind in FAULT_KINDS:
+            if self.rates[kind] and self._rng.random() < self.rates[kind]:
+                return kind
+        return None
+
+    def delay(self) -> float:
+        return max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+
+
+def sample_pairs(count: int, seed: int = 0) -> List[Dict]:
+    """Pairs cloned from sample_data.json with distinct addresses, chains and values"""
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sample_data.json')) as f:
+        template = json.load(f)['sample_response']['pairs'][0]
+    rng = random.Random(seed)
+    pairs = []
+    for i in range(count):
+        pair = copy.deepcopy(template)
+        pair['chainId'] = SUPPORTED_CHAINS[i % len(SUPPORTED_CHAINS)]
+        pair['pairAddress'] = f'0x{i:040x}'
+        pair['baseToken']['address'] = f'0x{i * 7 + 1:040x}'
+        pair['baseToken']['symbol'] = f'TKN{i}'
+        pair['priceUsd'] = f'{rng.lognormvariate(-7, 3):.10f}'
+        pair['volume']['h24'] = f'{rng.lognormvariate(9, 2):.2f}'
+        pair['priceChange']['h24'] = f'{rng.gauss(0, 15):.2f}'
+        pairs.append(pair)
+    return pairs
+
+
+class DexScreenerStub:
+    """aiohttp server answering ``pairs``, ``pairs/{chain}/{addresses}``, ``search``, ``tokens/{chain}/{addresses}``
+    and ``trending``
+
+    Responses come from ``fixtures`` (request key -> JSON body) when recorded,
+    otherwise from a synthetic pair set. With ``upstream`` set, unknown
+    requests are proxied there and recorded; ``save`` writes the fixtures out
+    for later offline replay. ``GET /_stats`` reports traffic and injected
+    faults, ``POST /_faults`` changes the fault plan at runtime.
+    """
+
+    def __init__(self, pairs: Optional[List[Dict]] = None, fixtures: Optional[Dict[str, Dict]] = None,
+                 faults: Optional[FaultPlan] = None, upstream: Optional[str] = None,
+                 pair_factory: Callable[[int, int], List[Dict]] = sample_pairs, pair_count: int = 700):
+        self.pairs = pairs if pairs is not None else pair_factory(pair_count, 0)
+        self.fixtures = dict(fixtures or {})
+        self.faults = faults or FaultPlan()
+        self.upstream = upstream
+        self.stats = {'requests': 0, 'responses': 0, **{kind: 0 for kind in FAULT_KINDS}, 'recorded': 0}
+
+        self._by_chain: Dict[str, List[Dict]] = {}
+        self._by_token: Dict[tuple, List[Dict]] = {}
+        self._by_address: Dict[tuple, Dict] = {}
+        self._index(self.pairs)
+
+        self.app = web.Application()
+        self.app.router.add_get(f'{API_PREFIX}/pairs', self._handle)
+        self.app.router.add_get(f'{API_PREFIX}/pairs/{{chain}}/{{address}}', self._handle)
+        self.app.router.add_get(f'{API_PREFIX}/search', self._handle)
+        self.app.router.add_get(f'{API_PREFIX}/tokens/{{chain}}/{{address}}', self._handle)
+        self.app.router.add_get(f'{API_PREFIX}/trending', self._handle)
+        self.app.router.add_get('/_stats', self._handle_stats)
+        self.app.router.add_post('/_faults', self._handle_faults)
+        self._runner: Optional[web.AppRunner] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.base_url: Optional[str] = None
+
+    def _index(self, pairs: List[Dict]):
+        for pair in pairs:
+            self._by_chain.setdefault(pair.get('chainId'), []).append(pair)
+            token = (pair.get('chainId'), (pair.get('baseToken') or {}).get('address', '').lower())
+            self._by_token.setdefault(token, []).append(pair)
+            self._by_address[(pair.get('chainId'), (pair.get('pairAddress') or '').lower())] = pair
+
+    def add_pairs(self, pairs: List[Dict]):
+        """Simulate launches: serve ``pairs`` from now on as well"""
+        self.pairs.extend(pairs)
+        self._index(pairs)
+
+    @classmethod
+    def from_fixture_file(cls, path: str, **kwargs) -> 'DexScreenerStub':
+        with open(path) as f:
+            return cls(fixtures=json.load(f), **kwargs)
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """Serve in the background; returns the base URL to give DexScreenerClient"""
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.base_url = f'http://{host}:{port}{API_PREFIX}'
+        logger.info(f"DexScreener stub listening on {self.base_url}")
+        return self.base_url
+
+    async def stop(self):
+        if self._session is not None:
+            await self._session.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def save(self, path: str):
+        """Write the recorded fixtures as JSON"""
+        with open(path, 'w') as f:
+            json.dump(self.fixtures, f)
+
+    @staticmethod
+    def fixture_key(request: web.Request) -> str:
+        path = request.path[len(API_PREFIX) + 1:]
+        return f"{path}?{sorted(request.query.items())}"
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        self.stats['requests'] += 1
+        delay = self.faults.delay()
+        if delay:
+            await asyncio.sleep(delay)
+
+        fault = self.faults.next_fault()
+        if fault is not None:
+            self.stats[fault] += 1
+        if fault == 'throttle':
+            return web.json_response({'error': 'rate limited'}, status=429,
+                                     headers={'Retry-After': f'{self.faults.retry_after:g}'})
+        if fault == 'server_error':
+            return web.json_response({'error': 'internal error'}, status=503)
+
+        body = json.dumps(await self._body(request)).encode()
+        if fault == 'truncate':
+            # Promise the full body, send half of it and drop the connection
+            response = web.StreamResponse(headers={'Content-Type': 'application/json',
+                                                   'Content-Length': str(len(body))})
+            await response.prepare(request)
+            await response.write(body[:len(body) // 2])
+            request.transport.close()
+            return response
+
+        self.stats['responses'] += 1
+        return web.Response(body=body, content_type='application/json')
+
+    async def _body(self, request: web.Request) -> Dict:
+        key = self.fixture_key(request)
+        if key in self.fixtures:
+            return self.fixtures[key]
+        if self.upstream:
+            data = await self._record(request, key)
+            if data is not None:
+                return data
+        return self._synthetic(request)
+
+    async def _record(self, request: web.Request, key: str) -> Optional[Dict]:
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT))
+        url = f"{self.upstream}{request.path[len(API_PREFIX):]}"
+        try:
+            async with self._session.get(url, params=request.query) as response:
+                if response.status != 200:
+                    return None
+                data = await response.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            logger.warning(f"Recording {key} failed: {str(e)}")
+            return None
+        self.fixtures[key] = data
+        self.stats['recorded'] += 1
+        return data
+
+    def _synthetic(self, request: web.Request) -> Dict:
+        endpoint = request.path[len(API_PREFIX) + 1:].split('/')[0]
+        if endpoint == 'pairs' and 'address' in request.match_info:
+            # Up to 30 comma-separated pair addresses, like the real endpoint
+            chain = request.match_info['chain']
+            addresses = request.match_info['address'].lower().split(',')[:30]
+            pairs = [self._by_address[(chain, address)] for address in addresses
+                     if (chain, address) in self._by_address]
+            return {'schemaVersion': '1.0.0', 'pairs': pairs}
+        if endpoint == 'pairs':
+            chain = request.query.get('chainId')
+            pairs = self._by_chain.get(chain, []) if chain else self.pairs
+            if 'page' in request.query:
+                # Newest first, one page at a time
+                size = int(request.query.get('limit', 100))
+                start = (int(request.query['page']) - 1) * size
+                pairs = sorted(pairs, key=lambda pair: created_ms(pair) or 0, reverse=True)[start:start + size]
+            return {'schemaVersion': '1.0.0', 'pairs': pairs}
+        if endpoint == 'search':
+            query = request.query.get('q', '').lower()
+            matches = [pair for pair in self.pairs
+                       if query in (pair.get('baseToken') or {}).get('symbol', '').lower()
+                       or query == (pair.get('baseToken') or {}).get('address', '').lower()]
+            return {'schemaVersion': '1.0.0', 'pairs': matches[:30]}
+        if endpoint == 'tokens':
+            # Up to 30 comma-separated addresses, like the real endpoint
+            chain = request.match_info['chain']
+            addresses = request.match_info['address'].lower().split(',')[:30]
+            pairs = [pair for address in addresses for pair in self._by_token.get((chain, address), [])]
+            return {'schemaVersion': '1.0.0', 'pairs': pairs}
+        # trending: the most traded pairs
+        ranked = sorted(self.pairs, key=lambda pair: float((pair.get('volume') or {}).get('h24') or 0), reverse=True)
+        return {'schemaVersion': '1.0.0', 'pairs': ranked[:30]}
+
+    async def _handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats)
+
+    async def _handle_faults(self, request: web.Request) -> web.Response:
+        self.faults.update(await request.json())
+        return web.json_response({'rates': self.faults.rates, 'latency': self.faults.latency,
+                                  'script': self.faults.script})
@@ -0,0 +1,204 @@
+"""
+Incremental pair discovery: fetch only pairs newer than a persisted high-water mark
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional, Sequence, Set
+from config import *
+
+if TYPE_CHECKING:
+    from src.dexscreener_client import DexScreenerClient
+
+logger = logging.getLogger(__name__)
+
+# Bumped when the persisted layout changes; older state files are ignored
+STATE_VERSION = 1
+
+
+def created_ms(pair: Dict) -> Optional[int]:
+    """``pairCreatedAt`` as epoch milliseconds (accepts epoch ms or ISO 8601), or None"""
+    value = pair.get('pairCreatedAt')
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp() * 1000)
+
+
+class PairDiscovery:
+    """Pairs created within the last ``hours``, kept current by fetching only newer ones
+
+    Each chain has a high-water mark: the newest ``pairCreatedAt`` seen so
+    far. A refresh pages through that chain's pairs newest first and stops at
+    the first page reaching below the mark, so requests scale with the
+    launch rate rather than with the window. Pairs that age out of the window
+    are dropped. Every ``full_refresh_cycles`` refreshes the whole window is
+    fetched again instead, replacing the chain's set. In between, pairs
+    already tracked have their values refetched by address, in multi-pair
+    requests; ``stream`` only yields pairs whose values were fetched this
+    cycle, so a failed request never replays stale values as current ones.
+    State is saved to ``path``
+    after every refresh and reloaded on start. Refreshes of overlapping
+    cycles run one at a time, so each starts from the marks the last one saved.
+    """
+
+    def __init__(self, path: str = SETTINGS.discovery_state_path, hours: float = TIME_WINDOW_HOURS,
+                 full_refresh_cycles: int = DISCOVERY_FULL_REFRESH_CYCLES, page_size: int = DISCOVERY_PAGE_SIZE):
+        self.path = path
+        self.hours = hours
+        self.page_size = page_size
+        self.full_refresh_cycles = full_refresh_cycles
+        self.high_water: Dict[str, int] = {}
+        self.pairs: Dict[str, Dict[str, Dict]] = {}  # chain -> pair address -> pair
+        self.cycles_since_full: Dict[str, int] = {}
+        self.last_stats: Dict[str, Dict[str, int]] = {}
+        self.current: Dict[str, Set[str]] = {}  # chain -> addresses of pairs fetched by the last refresh
+        self._lock = asyncio.Lock()
+        if path:
+            self._load()
+
+    def __len__(self) -> int:
+        return sum(len(chain_pairs) for chain_pairs in self.pairs.values())
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            return
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+            if state.get('version') != STATE_VERSION:
+                logger.warning(f"Ignoring discovery state with version {state.get('version')}")
+                return
+            self.high_water = {chain: int(mark) for chain, mark in state['high_water'].items()}
+            self.cycles_since_full = {chain: int(count) for chain, count in state['cycles_since_full'].items()}
+            self.pairs = {chain: {pair.get('pairAddress'): pair for pair in chain_pairs}
+                          for chain, chain_pairs in state['pairs'].items()}
+        except (OSError, ValueError, KeyError, AttributeError) as e:
+            logger.warning(f"Ignoring unreadable discovery state: {str(e)}")
+            self.high_water, self.cycles_since_full, self.pairs = {}, {}, {}
+            return
+        logger.info(f"Loaded {len(self)} discovered pairs across {len(self.pairs)} chains")
+
+    def save(self):
+        """Write the state atomically (a crash leaves the previous file intact)"""
+        if not self.path:
+            return
+        state = {
+            'version': STATE_VERSION,
+            'high_water': self.high_water,
+            'cycles_since_full': self.cycles_since_full,
+            'pairs': {chain: list(chain_pairs.values()) for chain, chain_pairs in self.pairs.items()},
+        }
+        tmp_path = f'{self.path}.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"Failed to persist discovery state: {str(e)}")
+
+    def merge(self, chain: str, new_pairs: Sequence[Dict], full: bool = False, now_ms: Optional[int] = None) -> int:
+        """Add newly fetched pairs of one chain, then drop pairs older than the window
+
+        With ``full`` the fetched pairs replace the chain's set. Returns how
+        many pairs were not known before.
+        """
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        known = {} if full else self.pairs.get(chain, {})
+        added = sum(1 for pair in new_pairs if pair.get('pairAddress') not in known)
+        chain_pairs = dict(known)
+        for pair in new_pairs:
+            chain_pairs[pair.get('pairAddress')] = pair
+
+        cutoff = now_ms - int(self.hours * 3600 * 1000)
+        created = {address: created_ms(pair) for address, pair in chain_pairs.items()}
+        # Pairs without a creation time can't age out; the next full refresh decides whether they stay
+        self.pairs[chain] = {address: pair for address, pair in chain_pairs.items()
+                             if created[address] is None or created[address] >= cutoff}
+        marks = [value for value in created.values() if value is not None]
+        if marks:
+            # An incremental merge never lowers the mark, even when its newest pairs aged out
+            previous = 0 if full else self.high_water.get(chain, 0)
+            self.high_water[chain] = max(max(marks), previous)
+        return added
+
+    def _needs_full(self, chain: str) -> bool:
+        return (chain not in self.high_water or
+                (self.full_refresh_cycles and self.cycles_since_full.get(chain, 0) >= self.full_refresh_cycles))
+
+    async def refresh(self, client: 'DexScreenerClient', chains: Optional[Sequence[str]] = None):
+        """Fetch every chain's new pairs concurrently, merge them and save the state"""
+        async with self._lock:
+            await self._refresh(client, chains)
+
+    async def _refresh(self, client: 'DexScreenerClient', chains: Optional[Sequence[str]] = None):
+        async def refresh_chain(chain: str):
+            full = self._needs_full(chain)
+            # A full refresh pages back to the start of the window, an incremental one to the mark
+            since_ms = int((time.time() - self.hours * 3600) * 1000) if full else self.high_water[chain]
+            fetched, pages = await client.get_pairs_since(chain, since_ms, self.hours, self.page_size)
+            if fetched is None:
+                # Merging part of the pages could move the mark past pairs never fetched; retry next cycle
+                return
+            added = self.merge(chain, fetched, full=full)
+            current = {pair.get('pairAddress') for pair in fetched}
+            chain_pairs = self.pairs[chain]
+            refreshed = 0
+            if not full:
+                known = [address for address in chain_pairs if address is not None and address not in current]
+                for pair in await client.get_pairs_by_address(chain, known):
+                    address = pair.get('pairAddress')
+                    if address in chain_pairs and address not in current:
+                        chain_pairs[address] = pair
+                        current.add(address)
+                        refreshed += 1
+            self.current[chain] = current & chain_pairs.keys()
+            self.cycles_since_full[chain] = 0 if full else self.cycles_since_full.get(chain, 0) + 1
+            self.last_stats[chain] = {'pages': pages, 'fetched': len(fetched), 'added': added,
+                                      'refreshed': refreshed, 'full': int(full)}
+
+        self.last_stats = {}
+        self.current = {}
+        await asyncio.gather(*(refresh_chain(chain) for chain in (chains or SUPPORTED_CHAINS)))
+        self.save()
+        pages = sum(stats['pages'] for stats in self.last_stats.values())
+        added = sum(stats['added'] for stats in self.last_stats.values())
+        logger.info(f"Discovered {added} new pairs in {pages} pages; tracking {len(self)}")
+
+    async def stream(self, client: 'DexScreenerClient', hours: Optional[float] = None,
+                     chains: Optional[Sequence[str]] = None,
+                     batch_size: int = STREAM_BATCH_SIZE) -> AsyncIterator[List[Dict]]:
+        """Refresh, then yield every tracked pair fetched by that refresh in batches
+
+        The incremental counterpart of ``DexScreenerClient.stream_recent_pairs``;
+        a different ``hours`` than before refetches every chain in full.
+        """
+        chains = list(chains or SUPPORTED_CHAINS)
+        async with self._lock:
+            if hours is not None and hours != self.hours:
+                self.hours = hours
+                self.high_water.clear()
+            await self._refresh(client, chains)
+            # Taken under the lock; the batches are yielded after releasing it
+            pairs = [pair for chain in chains for address, pair in self.pairs.get(chain, {}).items()
+                     if address in self.current.get(chain, ())]
+        for start in range(0, len(pairs), batch_size):
+            yield pairs[start:start + batch_size]
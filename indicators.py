@@ -0,0 +1,249 @@
+"""
+Rolling multi-window indicators from per-pair ring buffers of past samples
+"""
+
+import logging
+from typing import Any, Dict, List, Mapping, Tuple
+
+import numpy as np
+from config import *
+from src.sketch import QuantileSketch
+
+logger = logging.getLogger(__name__)
+
+# Values sampled into the ring buffers, in sample-array order
+SAMPLED_COLUMNS = ['price_usd', 'volume_h24', 'txns_h24']
+
+
+class _Tier:
+    """Ring buffers of ``depth`` samples per slot, taken at least ``spacing`` seconds apart"""
+
+    def __init__(self, spacing: float, depth: int, capacity: int):
+        self.spacing_ms = int(spacing * 1000)
+        self.depth = depth
+        self.times = np.zeros((capacity, depth), dtype=np.int64)  # 0 marks an empty sample
+        self.values = np.full((capacity, depth, len(SAMPLED_COLUMNS)), np.nan, dtype=np.float32)
+        self.head = np.zeros(capacity, dtype=np.int64)  # next write position
+        self.last_ms = np.zeros(capacity, dtype=np.int64)
+
+    def grow(self, capacity: int):
+        extra = capacity - len(self.head)
+        self.times = np.vstack([self.times, np.zeros((extra, self.depth), dtype=np.int64)])
+        self.values = np.vstack([self.values, np.full((extra, *self.values.shape[1:]), np.nan, dtype=np.float32)])
+        self.head = np.concatenate([self.head, np.zeros(extra, dtype=np.int64)])
+        self.last_ms = np.concatenate([self.last_ms, np.zeros(extra, dtype=np.int64)])
+
+    def clear(self, slots: np.ndarray):
+        self.times[slots] = 0
+        self.values[slots] = np.nan
+        self.head[slots] = 0
+        self.last_ms[slots] = 0
+
+    def record(self, slots: np.ndarray, now_ms: int, samples: np.ndarray):
+        """Append a sample to every slot that is due one
+
+        A slot seen twice at the same ``now_ms`` (two batches of one cycle)
+        has its newest sample overwritten instead.
+        """
+        last = self.last_ms[slots]
+        due = (last == 0) | (now_ms - last >= max(self.spacing_ms, 1))
+        again = (last == now_ms) & ~due
+        position = np.where(again, self.head[slots] - 1, self.head[slots]) % self.depth
+        write = due | again
+        slots, position = slots[write], position[write]
+        self.times[slots, position] = now_ms
+        self.values[slots, position] = samples[write]
+        self.head[slots] = position + 1
+        self.last_ms[slots] = now_ms
+
+    def ordered(self, slots: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Sample times and values of each slot, oldest first (empty samples lead)"""
+        order = np.argsort(self.times[slots], axis=1)
+        times = np.take_along_axis(self.times[slots], order, axis=1)
+        values = np.take_along_axis(self.values[slots], order[:, :, None], axis=1)
+        return times, values
+
+    @staticmethod
+    def window(times: np.ndarray, now_ms: int, window_ms: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Reference sample of each row of ``ordered`` samples, for one window
+
+        The reference is the newest sample at least ``window_ms`` old, give or
+        take ``INDICATOR_WINDOW_SLACK``: a row whose newest such sample is
+        older than that (polled more slowly than the window, or back after a
+        gap) has none, rather than a move over a longer span. Returns which
+        rows have one, its position and a mask of the samples from the
+        reference onwards.
+        """
+        depth = times.shape[1]
+        covered = (times > 0) & (now_ms - times >= window_ms * (1 - INDICATOR_WINDOW_SLACK))
+        # Samples are oldest first, so the last covered one is the newest
+        reference = depth - 1 - np.argmax(covered[:, ::-1], axis=1)
+        age = now_ms - times[np.arange(len(times)), reference]
+        has_reference = covered.any(axis=1) & (age <= window_ms * (1 + INDICATOR_WINDOW_SLACK))
+        in_window = (np.arange(depth) >= reference[:, None]) & (times > 0) & has_reference[:, None]
+        return has_reference, reference, in_window
+
+
+class IndicatorStore:
+    """Momentum, volatility and volume acceleration over several windows at once
+
+    Each pair-state slot keeps a fixed number of past samples of price,
+    24h volume and 24h transactions in a few ring-buffer tiers
+    (``INDICATOR_TIERS``): a fine tier sampled every cycle for the short
+    windows and coarser tiers for the long ones, so memory stays at
+    ``sum(depths) * 20`` bytes per slot however long the process runs. A
+    window is served from the finest tier that reaches back far enough.
+    Everything is computed for a whole batch of rows at once.
+
+    * ``momentum``: price now over the price one window ago, minus one
+    * ``volatility``: standard deviation of the log price returns between
+      samples inside the window
+    * ``volume_acceleration``: growth of the rolling 24h volume over the
+      window, relative to its value one window ago
+    """
+
+    def __init__(self, windows: Mapping[str, float] = INDICATOR_WINDOWS,
+                 tiers: List[Tuple[float, int]] = INDICATOR_TIERS, initial_capacity: int = 1024):
+        self.windows = {name: int(seconds * 1000) for name, seconds in windows.items()}
+        self.tiers = [_Tier(spacing, depth, initial_capacity) for spacing, depth in tiers]
+        self.capacity = initial_capacity
+
+    def memory_usage(self) -> int:
+        return sum(tier.times.nbytes + tier.values.nbytes + tier.head.nbytes + tier.last_ms.nbytes
+                   for tier in self.tiers)
+
+    def update(self, slots: np.ndarray, new: np.ndarray, columns: Mapping[str, Any],
+               now_ms: int) -> Dict[str, np.ndarray]:
+        """Record one batch's samples and return its indicators per window
+
+        ``slots`` are the rows' pair-state slots and ``new`` marks rows whose
+        pair was just (re)allocated a slot, whose old samples are discarded.
+        Returns ``'<indicator>_<window>'`` arrays aligned with the rows, NaN
+        where the pair's history does not reach back a full window yet.
+        """
+        if len(slots) and slots.max() >= self.capacity:
+            capacity = self.capacity
+            while capacity <= slots.max():
+                capacity *= 2
+            for tier in self.tiers:
+                tier.grow(capacity)
+            self.capacity = capacity
+
+        current = np.column_stack([np.asarray(columns[name], dtype=np.float64) for name in SAMPLED_COLUMNS])
+        for tier in self.tiers:
+            tier.clear(slots[new])
+        # Indicators compare against history from before this sample
+        indicators = self._compute(slots, current, now_ms)
+        samples = current.astype(np.float32)
+        for tier in self.tiers:
+            tier.record(slots, now_ms, samples)
+        return indicators
+
+    def _compute(self, slots: np.ndarray, current: np.ndarray, now_ms: int) -> Dict[str, np.ndarray]:
+        rows = np.arange(len(slots))
+        price, volume = current[:, 0], current[:, 1]
+        references = {name: np.full((len(slots), len(SAMPLED_COLUMNS)), np.nan) for name in self.windows}
+        volatility = {name: np.full(len(slots), np.nan) for name in self.windows}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Coarsest tier first, so finer tiers that reach back far enough override it
+            for tier in reversed(self.tiers):
+                times, values = tier.ordered(slots)
+                for name, window_ms in self.windows.items():
+                    found, reference, in_window = tier.window(times, now_ms, window_ms)
+                    references[name][found] = values[rows[found], reference[found]]
+                    volatility[name][found] = self._volatility(values[found, :, 0], in_window[found], price[found])
+
+            indicators = {}
+            for name in self.windows:
+                indicators[f'momentum_{name}'] = price / references[name][:, 0] - 1
+                indicators[f'volatility_{name}'] = volatility[name]
+                indicators[f'volume_acceleration_{name}'] = volume / references[name][:, 1] - 1
+        return indicators
+
+    @staticmethod
+    def _volatility(prices: np.ndarray, in_window: np.ndarray, current: np.ndarray) -> np.ndarray:
+        """Standard deviation of log returns between consecutive in-window samples and now"""
+        log_prices = np.log(np.where(in_window & (prices > 0), prices, np.nan))
+        log_prices = np.column_stack([log_prices, np.log(np.where(current > 0, current, np.nan))])
+        returns = np.diff(log_prices, axis=1)
+        counts = np.count_nonzero(~np.isnan(returns), axis=1)
+        volatility = np.full(len(prices), np.nan)
+        enough = counts >= 2
+        if enough.any():
+            volatility[enough] = np.nanstd(returns[enough], axis=1)
+        return volatility
+
+
+class WindowSignals:
+    """Per-window pump/dump counts and volatility of one cycle, accumulated over its batches
+
+    Like ``PairAggregates``, signals of separate shards combine with
+    ``merge``; the volatility median is exact unless signals from another
+    node were merged in.
+    """
+
+    def __init__(self, windows: List[str]):
+        self.windows = list(windows)
+        self.pumping = dict.fromkeys(windows, 0)
+        self.dumping = dict.fromkeys(windows, 0)
+        self.tracked = dict.fromkeys(windows, 0)
+        self.volatility = {name: QuantileSketch() for name in windows}
+
+    def add(self, indicators: Mapping[str, np.ndarray], selected: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Count one batch's ``selected`` rows; returns the rows pumping or dumping in any window"""
+        pumping = np.zeros(len(selected), dtype=bool)
+        dumping = np.zeros(len(selected), dtype=bool)
+        for name in self.windows:
+            momentum = indicators[f'momentum_{name}']
+            window_pump = selected & (momentum > PUMP_THRESHOLD)
+            window_dump = selected & (momentum < DUMP_THRESHOLD)
+            self.pumping[name] += int(np.count_nonzero(window_pump))
+            self.dumping[name] += int(np.count_nonzero(window_dump))
+            self.tracked[name] += int(np.count_nonzero(selected & ~np.isnan(momentum)))
+            pumping |= window_pump
+            dumping |= window_dump
+            volatility = indicators[f'volatility_{name}']
+            self.volatility[name].add(volatility[selected])
+        return pumping, dumping
+
+    def merge(self, other: 'WindowSignals') -> 'WindowSignals':
+        """Fold another shard's signals into these"""
+        for name in other.windows:
+            if name not in self.pumping:
+                self.windows.append(name)
+                self.pumping[name] = self.dumping[name] = self.tracked[name] = 0
+                self.volatility[name] = QuantileSketch()
+            self.pumping[name] += other.pumping[name]
+            self.dumping[name] += other.dumping[name]
+            self.tracked[name] += other.tracked[name]
+            self.volatility[name].merge(other.volatility[name])
+        return self
+
+    def to_report(self) -> Dict[str, Dict]:
+        report = {}
+        for name in self.windows:
+            report[name] = {
+                'pumping': self.pumping[name],
+                'dumping': self.dumping[name],
+                'pairs_with_history': self.tracked[name],
+                'median_volatility': self.volatility[name].quantile(0.5),
+            }
+        return report
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'windows': self.windows,
+            'pumping': self.pumping,
+            'dumping': self.dumping,
+            'tracked': self.tracked,
+            'volatility': {name: sketch.to_dict() for name, sketch in self.volatility.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'WindowSignals':
+        signals = cls(data['windows'])
+        signals.pumping.update(data['pumping'])
+        signals.dumping.update(data['dumping'])
+        signals.tracked.update(data['tracked'])
+        signals.volatility = {name: QuantileSketch.from_dict(sketch) for name, sketch in data['volatility'].items()}
+        return signals
@@ -0,0 +1,258 @@
+"""
+Columnar ingestion of DexScreener pair payloads
+"""
+
+import logging
+from itertools import repeat
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Column order of the prepared DataFrame
+FRAME_COLUMNS = [
+    'pair_address',
+    'base_token_symbol',
+    'base_token_address',
+    'quote_token_symbol',
+    'chain_id',
+    'dex_id',
+    'price_usd',
+    'volume_h24',
+    'price_change_h24',
+    'liquidity_usd',
+    'fdv',
+    'market_cap',
+    'pair_created_at',
+    'txns_h24',
+    'holders',
+    'pair_created_ms',
+]
+
+TEXT_COLUMNS = [
+    'pair_address',
+    'base_token_symbol',
+    'base_token_address',
+    'quote_token_symbol',
+    'chain_id',
+    'dex_id',
+    'pair_created_at',
+]
+
+# Raw numeric fields; buys and sells are summed into ``txns_h24``
+NUMERIC_COLUMNS = [
+    'price_usd',
+    'volume_h24',
+    'price_change_h24',
+    'liquidity_usd',
+    'fdv',
+    'market_cap',
+    'txns_buys',
+    'txns_sells',
+    'holders',
+]
+
+# Numeric fields covered by a pair's change fingerprint
+FINGERPRINT_COLUMNS = [
+    'price_usd',
+    'volume_h24',
+    'price_change_h24',
+    'liquidity_usd',
+    'fdv',
+    'market_cap',
+    'txns_h24',
+    'holders',
+]
+
+# Epoch-millisecond value for a missing or unparseable ``pairCreatedAt``
+MISSING_TIMESTAMP = np.iinfo(np.int64).min
+
+# Pairs handled per pass, small enough that the dicts stay cache-resident across fields
+CHUNK_SIZE = 2048
+
+_EMPTY: Dict = {}
+
+# Placeholder for fields nested under a container that is not a dict (e.g. ``"volume": null``)
+_INVALID = object()
+
+
+def get_field(records: Sequence[Any], key: str, default: Any = None) -> List[Any]:
+    """Look up ``key`` in every record; records that are not dicts yield an invalid placeholder"""
+    try:
+        return [record.get(key, default) for record in records]
+    except AttributeError:
+        return [
+            record.get(key, default) if isinstance(record, dict) else _INVALID
+            for record in records
+        ]
+
+
+def get_nested(records: Sequence[Any], *path: str, default: Any = 0) -> List[Any]:
+    """Look up a value nested under one or more objects in every record"""
+    for key in path[:-1]:
+        records = get_field(records, key, _EMPTY)
+    return get_field(records, path[-1], default)
+
+
+def parse_numeric(values: List[Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """Convert raw values to float64, returning the array and a mask of unparseable entries
+
+    Mirrors ``float(value)``: numbers and numeric strings parse, while ``None``,
+    non-numeric strings and invalid containers are reported as bad.
+    """
+    try:
+        parsed = np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        raw = np.empty(len(values), dtype=object)
+        raw[:] = values
+        parsed = np.asarray(pd.to_numeric(raw, errors='coerce'), dtype=np.float64)
+
+    bad = np.isnan(parsed)
+    if bad.any():
+        # A genuine NaN is valid input for float(); anything else that came back NaN is not
+        for idx in np.flatnonzero(bad):
+            value = values[idx]
+            if isinstance(value, float) or (isinstance(value, str) and value.strip().lower() == 'nan'):
+                bad[idx] = False
+    return parsed, bad
+
+
+def parse_timestamps_ms(values: Sequence[Any]) -> np.ndarray:
+    """Parse ``pairCreatedAt`` values into int64 epoch milliseconds in bulk
+
+    Accepts ISO-8601 strings and the epoch-millisecond numbers DexScreener
+    returns (also as numeric strings); anything else maps to ``MISSING_TIMESTAMP``.
+    """
+    raw = np.empty(len(values), dtype=object)
+    raw[:] = values
+    result = np.full(len(raw), MISSING_TIMESTAMP, dtype=np.int64)
+
+    text = np.fromiter(map(isinstance, raw, repeat(str)), dtype=bool, count=len(raw))
+    if text.any():
+        parsed = pd.to_datetime(raw[text], utc=True, errors='coerce', format='ISO8601')
+        result[text] = parsed.tz_convert(None).values.astype('datetime64[ms]').astype(np.int64)
+
+    numeric = result == MISSING_TIMESTAMP
+    if numeric.any():
+        epoch_ms = np.asarray(pd.to_numeric(raw[numeric], errors='coerce'), dtype=np.float64)
+        finite = np.isfinite(epoch_ms)
+        result[np.flatnonzero(numeric)[finite]] = epoch_ms[finite].astype(np.int64)
+    return result
+
+
+def _text_column(values: List[Any]) -> np.ndarray:
+    if _INVALID in values:
+        values = [None if value is _INVALID else value for value in values]
+    column = np.empty(len(values), dtype=object)
+    column[:] = values
+    return column
+
+
+def _as_integer_column(values: np.ndarray) -> np.ndarray:
+    """Downcast to int64 when every value is a finite whole number"""
+    if len(values) and np.isfinite(values).all() and (values == np.floor(values)).all():
+        return values.astype(np.int64)
+    return values
+
+
+def _raw_fields(pairs: Sequence[Dict]) -> Dict[str, List[Any]]:
+    """Raw (unparsed) field values for a slice of pairs"""
+    base_tokens = get_field(pairs, 'baseToken', _EMPTY)
+    txns_h24 = get_nested(pairs, 'txns', 'h24', default=_EMPTY)
+    return {
+        'pair_address': get_field(pairs, 'pairAddress'),
+        'base_token_symbol': get_field(base_tokens, 'symbol'),
+        'base_token_address': get_field(base_tokens, 'address'),
+        'quote_token_symbol': get_nested(pairs, 'quoteToken', 'symbol', default=None),
+        'chain_id': get_field(pairs, 'chainId'),
+        'dex_id': get_field(pairs, 'dexId'),
+        'pair_created_at': get_field(pairs, 'pairCreatedAt'),
+        'price_usd': get_field(pairs, 'priceUsd', 0),
+        'volume_h24': get_nested(pairs, 'volume', 'h24'),
+        'price_change_h24': get_nested(pairs, 'priceChange', 'h24'),
+        'liquidity_usd': get_nested(pairs, 'liquidity', 'usd'),
+        'fdv': get_field(pairs, 'fdv', 0),
+        'market_cap': get_field(pairs, 'marketCap', 0),
+        'txns_buys': get_field(txns_h24, 'buys', 0),
+        'txns_sells': get_field(txns_h24, 'sells', 0),
+        'holders': get_field(pairs, 'holders', 0),
+    }
+
+
+def extract_pair_columns(pairs: Sequence[Dict],
+                         chunk_size: int = CHUNK_SIZE) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+    """Extract every frame column from the raw pairs
+
+    Returns the columns (in ``FRAME_COLUMNS`` order) and a boolean mask of rows
+    whose numeric fields all parsed; those are the rows the old per-row loop kept.
+    Pairs are walked in cache-sized chunks, one field at a time.
+    """
+    n = len(pairs)
+    columns = {name: np.empty(n, dtype=object) for name in TEXT_COLUMNS}
+    columns.update({name: np.empty(n, dtype=np.float64) for name in NUMERIC_COLUMNS})
+    bad = {name: np.zeros(n, dtype=bool) for name in NUMERIC_COLUMNS}
+
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        for name, values in _raw_fields(pairs[start:stop]).items():
+            if name in bad:
+                columns[name][start:stop], bad[name][start:stop] = parse_numeric(values)
+            else:
+                columns[name][start:stop] = _text_column(values)
+
+    columns['txns_h24'] = columns.pop('txns_buys') + columns.pop('txns_sells')
+    bad['txns_h24'] = bad.pop('txns_buys') | bad.pop('txns_sells')
+    columns['pair_created_ms'] = parse_timestamps_ms(columns['pair_created_at'])
+
+    # Holder counts were never validated; unparseable values become NaN instead of dropping the pair
+    bad.pop('holders')
+
+    valid = np.ones(n, dtype=bool)
+    for name, mask in bad.items():
+        if mask.any():
+            logger.warning(f"Dropping {int(mask.sum())} pairs with invalid '{name}' values")
+            valid &= ~mask
+
+    return {name: columns[name] for name in FRAME_COLUMNS}, valid
+
+
+def _mix64(x: np.ndarray) -> np.ndarray:
+    """SplitMix64 finalizer: spreads every input bit over the whole 64-bit word"""
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xBF58476D1CE4E5B9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def fingerprint_rows(columns: Dict[str, Any], names: Sequence[str] = FINGERPRINT_COLUMNS) -> np.ndarray:
+    """Non-cryptographic 64-bit fingerprint of each row's numeric fields
+
+    Rows whose fields hold the same values get the same fingerprint (-0.0
+    and 0.0, and every NaN, count as equal), so comparing one uint64 per
+    pair tells whether a pair changed since the previous poll. Computed for
+    all rows at once with integer array arithmetic, which wraps on overflow.
+    """
+    names = [name for name in names if name in columns]
+    size = len(columns[names[0]]) if names else 0
+    fingerprint = np.zeros(size, dtype=np.uint64)
+    for position, name in enumerate(names, 1):
+        values = np.asarray(columns[name], dtype=np.float64) + 0.0  # -0.0 becomes 0.0
+        bits = np.where(np.isnan(values), np.uint64(0x7FF8000000000000), values.view(np.uint64))
+        salt = np.uint64(position * 0x9E3779B97F4A7C15 & 0xFFFFFFFFFFFFFFFF)  # distinguishes the fields
+        fingerprint = _mix64(fingerprint ^ _mix64(bits + salt))
+    return fingerprint
+
+
+def build_pair_frame(pairs: Sequence[Dict]) -> pd.DataFrame:
+    """Build the analytics DataFrame from raw pairs"""
+    columns, valid = extract_pair_columns(pairs)
+    if not valid.all():
+        columns = {name: values[valid] for name, values in columns.items()}
+
+    for name in ('txns_h24', 'holders'):
+        columns[name] = _as_integer_column(columns[name])
+
+    return pd.DataFrame(columns, columns=FRAME_COLUMNS)
@@ -0,0 +1,103 @@
+"""
+Incremental decoding of one array inside a streamed JSON document
+"""
+
+import codecs
+import json
+import re
+from typing import Any, AsyncIterator, List
+
+_WHITESPACE = ' \t\r\n'
+
+
+class JsonArrayDecoder:
+    """Decode the items of ``{"<key>": [item, item, ...]}`` as text arrives
+
+    Call ``feed`` with successive chunks; it returns the items completed so
+    far. Only the unparsed tail of the input is retained, so memory stays
+    proportional to the largest single item rather than the whole document.
+    """
+
+    def __init__(self, key: str):
+        self._key_pattern = re.compile(r'"%s"\s*:\s*' % re.escape(key))
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._in_array = False
+        self.finished = False
+
+    def feed(self, text: str) -> List[Any]:
+        """Consume a chunk of text and return every item it completed"""
+        if self.finished:
+            return []
+        self._buffer += text
+        if not self._in_array and not self._seek_array():
+            return []
+        return self._decode_items()
+
+    def close(self):
+        """Signal end of input; raises if the array was left incomplete"""
+        if self._in_array and not self.finished:
+            raise ValueError("Stream ended inside the JSON array")
+
+    def _seek_array(self) -> bool:
+        match = self._key_pattern.search(self._buffer)
+        if match is None:
+            # Keep enough of the tail to match a key split across chunks
+            self._buffer = self._buffer[-(len(self._key_pattern.pattern) + 64):]
+            return False
+        rest = self._buffer[match.end():]
+        if not rest:
+            return False
+        if rest[0] != '[':
+            # The key holds something other than an array (e.g. null): no items
+            self.finished = True
+            self._buffer = ''
+            return False
+        self._buffer = rest[1:]
+        self._in_array = True
+        return True
+
+    def _decode_items(self) -> List[Any]:
+        items = []
+        buffer = self._buffer
+        pos = 0
+        while True:
+            while pos < len(buffer) and (buffer[pos] in _WHITESPACE or buffer[pos] == ','):
+                pos += 1
+            if pos >= len(buffer):
+                break
+            if buffer[pos] == ']':
+                self.finished = True
+                pos = len(buffer)
+                break
+            try:
+                item, end = self._decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Incomplete item; wait for more input
+                break
+            if end >= len(buffer) and not isinstance(item, (dict, list, str)):
+                # A bare number or literal may continue in the next chunk
+                break
+            items.append(item)
+            pos = end
+        self._buffer = buffer[pos:]
+        return items
+
+
+async def iter_json_array(chunks: AsyncIterator[bytes], key: str, batch_size: int) -> AsyncIterator[List[Any]]:
+    """Yield the items of a top-level array from a byte stream in fixed-size batches"""
+    decoder = JsonArrayDecoder(key)
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    batch: List[Any] = []
+    async for chunk in chunks:
+        batch.extend(decoder.feed(text_decoder.decode(chunk)))
+        while len(batch) >= batch_size:
+            yield batch[:batch_size]
+            batch = batch[batch_size:]
+        if decoder.finished:
+            break
+    else:
+        batch.extend(decoder.feed(text_decoder.decode(b'', final=True)))
+        decoder.close()
+    if batch:
+        yield batch
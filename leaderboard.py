@@ -0,0 +1,247 @@
+"""
+Incrementally maintained top-K leaderboards, overall and per chain
+"""
+
+import heapq
+import logging
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+from config import *
+from src.pair_state import PairDeltas, PairStateStore
+from src.pair_store import INTERNERS, PairStore
+
+logger = logging.getLogger(__name__)
+
+# Leaderboard -> (column, sign applied to rank by, whether only positive scores qualify)
+LEADERBOARD_METRICS = {
+    'volume': ('volume_h24', 1.0, False),
+    'holders': ('holders', 1.0, True),
+    'gainers': ('price_change_h24', 1.0, True),
+    'losers': ('price_change_h24', -1.0, True),
+}
+
+
+class Leaderboard:
+    """The best ``size`` keys by score, updated one key at a time in O(log K)
+
+    Up to ``size * slack`` candidates sit in a min-heap with lazy deletion
+    (superseded heap entries are skipped when popped). Every key not on the
+    board scores at most ``floor``, so a new score only needs the board when it
+    beats ``floor`` and the board always holds the exact leaders. Removals can
+    leave fewer than ``size`` of them; ``needs_rebuild`` then asks for a full
+    rebuild.
+    """
+
+    def __init__(self, size: int = LEADERBOARD_SIZE, slack: int = LEADERBOARD_SLACK):
+        self.size = size
+        self.capacity = size * slack
+        self.floor = -np.inf
+        self.complete = True  # no key has ever been pushed off, so the board holds every scored key
+        self._entries: Dict[int, Tuple[float, int]] = {}  # key -> (score, sequence number)
+        self._heap: List[Tuple[float, int, int]] = []  # (score, sequence number, key), smallest first
+        self._sequence = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: int) -> bool:
+        return key in self._entries
+
+    @property
+    def needs_rebuild(self) -> bool:
+        return not self.complete and len(self._entries) < self.size
+
+    def offer(self, keys: np.ndarray, scores: np.ndarray):
+        """Apply new scores for ``keys``; a NaN score takes the key off the board"""
+        if not len(keys):
+            return
+        qualifies = scores > self.floor  # False for NaN
+        if self._entries and not qualifies.all():
+            # Keys on the board whose score fell to the floor or below leave it
+            board = np.fromiter(self._entries, dtype=np.int64, count=len(self._entries))
+            rest = keys[~qualifies]
+            for key in rest[np.isin(rest, board)].tolist():
+                del self._entries[key]
+        for key, score in zip(keys[qualifies].tolist(), scores[qualifies].tolist()):
+            # Pushes earlier in the batch may have raised the floor
+            if score > self.floor:
+                self._push(key, score)
+            else:
+                self._entries.pop(key, None)
+
+    def discard(self, keys: List[int]):
+        """Take keys off the board (their pairs are gone)"""
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def rebuild(self, keys: np.ndarray, scores: np.ndarray):
+        """Replace the board with the best of every key's score (NaN scores are skipped)"""
+        scored = ~np.isnan(scores)
+        keys, scores = keys[scored], scores[scored]
+        self._entries.clear()
+        self._heap.clear()
+        self.floor = -np.inf
+        self.complete = len(keys) <= self.capacity
+        if not self.complete:
+            best = np.argpartition(-scores, self.capacity)
+            self.floor = float(scores[best[self.capacity:]].max())
+            keys, scores = keys[best[:self.capacity]], scores[best[:self.capacity]]
+        for key, score in zip(keys.tolist(), scores.tolist()):
+            self._push(key, score)
+
+    def top(self, n: Optional[int] = None) -> List[Tuple[int, float]]:
+        """``(key, score)`` of the best ``n`` (default ``size``) keys, best first"""
+        ranked = sorted(self._entries.items(), key=lambda item: (-item[1][0], item[1][1]))
+        return [(key, score) for key, (score, _) in ranked[:n or self.size]]
+
+    def keys(self) -> List[int]:
+        return list(self._entries)
+
+    def _push(self, key: int, score: float):
+        self._sequence += 1
+        self._entries[key] = (score, self._sequence)
+        heapq.heappush(self._heap, (score, self._sequence, key))
+        while len(self._entries) > self.capacity:
+            score, sequence, key = heapq.heappop(self._heap)
+            if self._entries.get(key, (None, None))[1] == sequence:
+                del self._entries[key]
+                self.floor = max(self.floor, score)
+                self.complete = False
+        if len(self._heap) > 4 * self.capacity:
+            # Too many superseded entries; rebuild the heap from the live ones
+            self._heap = [(score, sequence, key) for key, (score, sequence) in self._entries.items()]
+            heapq.heapify(self._heap)
+
+
+class Leaderboards:
+    """One ``Leaderboard`` per metric, overall and per chain, keyed by pair-state slot
+
+    ``update`` offers only the rows that are new, changed or back after
+    missing a cycle; unchanged pairs keep their place without being looked at.
+    ``finish_cycle`` drops pairs not seen in the cycle and rebuilds any board
+    that ran short of candidates from the pair state.
+    """
+
+    def __init__(self, size: int = LEADERBOARD_SIZE, slack: int = LEADERBOARD_SLACK):
+        self.size = size
+        self.slack = slack
+        self.min_volume: Optional[float] = None
+        self.boards: Dict[Tuple[str, Optional[int]], Leaderboard] = {}
+        self.rebuild_count = 0
+        self._stale = False
+
+    def board(self, metric: str, chain_code: Optional[int] = None) -> Leaderboard:
+        board = self.boards.get((metric, chain_code))
+        if board is None:
+            board = self.boards[(metric, chain_code)] = Leaderboard(self.size, self.slack)
+        return board
+
+    def update(self, columns: Mapping[str, Any], deltas: PairDeltas, min_volume: float):
+        """Offer one batch's new, changed and returning rows to every board"""
+        if min_volume != self.min_volume:
+            # Every board's membership depends on the volume cut; rebuild them all at the end of the cycle
+            self.min_volume = min_volume
+            self._stale = True
+        if self._stale:
+            return
+        rows = np.flatnonzero(deltas.modified | deltas.returning)
+        if not len(rows):
+            return
+
+        keys = deltas.slots[rows]
+        if isinstance(columns, PairStore):
+            chains = columns.codes('chain_id')[rows]
+        else:
+            chains = INTERNERS['chain_id'].encode(np.asarray(columns['chain_id'], dtype=object)[rows])
+        selected = np.asarray(columns['volume_h24'], dtype=np.float64)[rows] >= min_volume
+        chain_rows = {code: chains == code for code in np.unique(chains).tolist()}
+
+        for metric, scores in self._scores(columns, rows, selected).items():
+            self.board(metric).offer(keys, scores)
+            for code, mask in chain_rows.items():
+                self.board(metric, code).offer(keys[mask], scores[mask])
+
+    @staticmethod
+    def _scores(columns: Mapping[str, Any], rows: np.ndarray, selected: np.ndarray) -> Dict[str, np.ndarray]:
+        """Rank score per metric, NaN where a row does not qualify for the board"""
+        scores = {}
+        for metric, (column, sign, positive_only) in LEADERBOARD_METRICS.items():
+            values = np.asarray(columns[column], dtype=np.float64)[rows] * sign
+            qualifies = selected & (values > 0) if positive_only else selected
+            scores[metric] = np.where(qualifies, values, np.nan)
+        return scores
+
+    def finish_cycle(self, pair_state: PairStateStore, now_ms: int):
+        """Drop pairs missing from the cycle, then rebuild boards that need it"""
+        for board in self.boards.values():
+            keys = np.array(board.keys(), dtype=np.int64)
+            if len(keys):
+                board.discard(keys[pair_state.last_seen(keys) < now_ms].tolist())
+
+        rebuild = [name for name, board in self.boards.items() if board.needs_rebuild]
+        if not (rebuild or self._stale) or self.min_volume is None:
+            return
+        slots, columns = pair_state.live(now_ms)
+        selected = columns['volume_h24'] >= self.min_volume
+        scores = self._scores(columns, np.arange(len(slots)), selected)
+        if self._stale:
+            # Rebuild every board, creating boards for chains not seen before
+            rebuild = [(metric, code) for metric in LEADERBOARD_METRICS
+                       for code in [None, *np.unique(columns['chain_id']).tolist()]]
+        for metric, code in rebuild:
+            mask = slice(None) if code is None else columns['chain_id'] == code
+            self.board(metric, code).rebuild(slots[mask], scores[metric][mask])
+        self.rebuild_count += len(rebuild)
+        self._stale = False
+        logger.debug(f"Rebuilt {len(rebuild)} leaderboards from pair state")
+
+    def to_report(self, pair_state: PairStateStore, n: Optional[int] = None) -> Dict:
+        """Top ``n`` entries per metric, overall and per chain, as report dicts"""
+        report = {metric: self._entries(pair_state, (metric, None), n) for metric in LEADERBOARD_METRICS}
+        by_chain = {}
+        for (metric, code), board in self.boards.items():
+            if code is None or not len(board):
+                continue
+            chain = INTERNERS['chain_id'].category(code)
+            by_chain.setdefault(chain, {})[metric] = self._entries(pair_state, (metric, code), n)
+        report['by_chain'] = by_chain
+        return report
+
+    def _entries(self, pair_state: PairStateStore, name: Tuple[str, Optional[int]], n: Optional[int]) -> List[Dict]:
+        board = self.boards.get(name)
+        if board is None:
+            return []
+        column = LEADERBOARD_METRICS[name[0]][0]
+        entries = []
+        for slot, _ in board.top(n):
+            values = pair_state.describe(slot)
+            entries.append({
+                'symbol': values['base_token_symbol'],
+                'chain': values['chain_id'],
+                'value': values[column],
+                'price': values['price_usd'],
+            })
+        return entries
+
+
+def merge_reports(reports: Sequence[Dict], n: int = LEADERBOARD_SHOWN) -> Dict:
+    """Combine ``Leaderboards.to_report`` output of shards holding disjoint pairs
+
+    The best ``n`` of the union are among each shard's best ``n``, so the
+    result equals the report of a single process holding every pair.
+    """
+    def rank(metric: str, entry_lists: List[List[Dict]]) -> List[Dict]:
+        sign = LEADERBOARD_METRICS[metric][1]
+        entries = [entry for entries in entry_lists for entry in entries]
+        return sorted(entries, key=lambda entry: -sign * entry['value'])[:n]
+
+    merged = {metric: rank(metric, [report.get(metric, []) for report in reports]) for metric in LEADERBOARD_METRICS}
+    by_chain: Dict[str, Dict[str, List[List[Dict]]]] = {}
+    for report in reports:
+        for chain, boards in report.get('by_chain', {}).items():
+            for metric, entries in boards.items():
+                by_chain.setdefault(chain, {}).setdefault(metric, []).append(entries)
+    merged['by_chain'] = {chain: {metric: rank(metric, entry_lists) for metric, entry_lists in boards.items()}
+                          for chain, boards in by_chain.items()}
+    return merged
@@ -3,44 +3,163 @@
 Web3 Token Analytics Bot - Main Entry Point
 """
 
+import time
+
+# Taken before anything heavy is imported, for the startup-time measurement
+_IMPORT_STARTED = time.perf_counter()
+
 import asyncio
 import logging 
+import os
 import argparse
-from src.dexscreener_client import DexScreenerClient
-from src.telegram_bot import TelegramBot
-from src.analytics import TokenAnalytics
+from typing import TYPE_CHECKING, AsyncIterator, List, Optional, Tuple, Type
+from src.metrics import REGISTRY
+from src.scheduler import AlignedScheduler, CycleTimings
 from config import *
 
+# pandas, numpy, aiohttp and python-telegram-bot are imported on first use, not here
+if TYPE_CHECKING:
+    from src.analytics import TokenAnalytics
+    from src.discovery import PairDiscovery
+    from src.metrics import MetricsServer
+    from src.sharding import ShardQueue
+    from src.snapshot_store import SnapshotStore
+
 # Configure logging
-logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logging.basicConfig(level=SETTINGS.log_level, format=LOG_FORMAT)
 logger = logging.getLogger(__name__)
 
+# Mirrors of counters the client, sender and scheduler keep themselves, refreshed on every scrape
+CACHE_LOOKUPS = REGISTRY.counter('dexscreener_cache_lookups_total', 'Response cache lookups by result', ('result',))
+CACHE_HIT_RATIO = REGISTRY.gauge('dexscreener_cache_hit_ratio', 'Share of cache lookups served from the cache')
+CACHE_BYTES = REGISTRY.gauge('dexscreener_cache_bytes', 'Estimated bytes held by the response cache')
+API_RETRIES = REGISTRY.counter('dexscreener_retries_total', 'DexScreener requests retried')
+API_LIMITER = REGISTRY.gauge('dexscreener_limiter', 'DexScreener rate limiter state', ('field',))
+TELEGRAM_QUEUE_DEPTH = REGISTRY.gauge('telegram_queue_depth', 'Messages waiting in the Telegram outbound queue')
+TELEGRAM_MESSAGES = REGISTRY.counter('telegram_messages_total', 'Telegram messages by outcome', ('outcome',))
+CYCLES_IN_FLIGHT = REGISTRY.gauge('monitor_cycles_in_flight', 'Monitoring cycles currently running')
+STARTUP_SECONDS = REGISTRY.gauge('process_startup_seconds',
+                                 'Seconds from importing main to the bot being ready to run', ('stage',))
+
+def _import_analysis_modules() -> Tuple[Type['TokenAnalytics'], Type['SnapshotStore']]:
+    """Import the pandas-backed analysis modules (run on a thread while the first fetch starts)"""
+    from src.analytics import TokenAnalytics
+    from src.snapshot_store import SnapshotStore
+    return TokenAnalytics, SnapshotStore
+
 class Web3AnalyticsBot:
-    def __init__(self):
-        self.dex_client = DexScreenerClient(DEXSCREENER_API_KEY)
-        self.analytics = TokenAnalytics()
-        self.telegram_bot = TelegramBot(TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID)
+    def __init__(self, settings: Settings = SETTINGS):
+        setup_started = time.perf_counter()
+        from src.alerts import AlertEngine
+        from src.dexscreener_client import DexScreenerClient
+        from src.telegram_bot import TelegramBot
+        
+        if settings.node_role not in ('', 'worker', 'coordinator'):
+            raise ValueError(f"NODE_ROLE must be empty, 'worker' or 'coordinator', got {settings.node_role!r}")
+        self.settings = settings
+        self.role = settings.node_role
+        self.dex_client = DexScreenerClient(settings.dexscreener_api_key, settings.dexscreener_base_url)
+        # Workers evaluate alerts against the subscriptions the coordinator's Telegram commands manage
+        self.alert_engine = AlertEngine(settings.alerts_path, read_only=self.role == 'worker')
+        # A worker fetches and analyzes only its shard of the chains; the coordinator merges every shard
+        self.chains: Optional[List[str]] = None
+        self.shard_queue: Optional['ShardQueue'] = None
+        if self.role:
+            from src.sharding import ShardQueue, shard_chains
+            self.shard_queue = ShardQueue(settings.shard_queue_dir)
+            if self.role == 'worker':
+                self.chains = shard_chains(settings.shard_index, settings.shard_count)
+                logger.info(f"Worker for shard {settings.shard_index} of {settings.shard_count}: "
+                            f"{', '.join(self.chains)}")
+        self.discovery: Optional['PairDiscovery'] = None
+        if settings.discovery_state_path:
+            from src.discovery import PairDiscovery
+            # Each worker keeps the state of its own chains
+            path = settings.discovery_state_path
+            self.discovery = PairDiscovery(f'{path}.{settings.shard_index}' if self.role == 'worker' else path)
+        self.telegram_bot = TelegramBot(settings.telegram_bot_token, settings.telegram_chat_id, self.alert_engine)
+        # Created by the first analysis, so runs that never analyze don't pay for pandas
+        self.analytics: Optional['TokenAnalytics'] = None
+        self.snapshot_store: Optional['SnapshotStore'] = None
+        self.scheduler: Optional[AlignedScheduler] = None
+        self.metrics_server: Optional['MetricsServer'] = None
+        self._analysis_lock = asyncio.Lock()
+        self._analytics_ready = asyncio.Lock()
+        REGISTRY.on_collect(self._collect_metrics)
+        
+        STARTUP_SECONDS.set(setup_started - _IMPORT_STARTED, stage='import')
+        STARTUP_SECONDS.set(time.perf_counter() - setup_started, stage='setup')
+        logger.info(f"Started in {time.perf_counter() - _IMPORT_STARTED:.3f}s "
+                    f"(imports {setup_started - _IMPORT_STARTED:.3f}s)")
+        
+    async def _ensure_analytics(self) -> 'TokenAnalytics':
+        """Create the analytics engine and snapshot store on first use
+        
+        The import runs on a thread so a fetch that has already started keeps
+        making progress while pandas loads.
+        """
+        async with self._analytics_ready:
+            if self.analytics is None:
+                started = time.perf_counter()
+                TokenAnalytics, SnapshotStore = await asyncio.to_thread(_import_analysis_modules)
+                self.analytics = TokenAnalytics(self.alert_engine, workers=self.settings.analytics_workers)
+                self.snapshot_store = self._open_snapshot_store(SnapshotStore)
+                STARTUP_SECONDS.set(time.perf_counter() - started, stage='analytics')
+                logger.info(f"Loaded analytics in {time.perf_counter() - started:.3f}s")
+        return self.analytics
         
-    async def analyze_new_tokens(self, hours=24, min_volume=MIN_VOLUME_THRESHOLD):
+    def _open_snapshot_store(self, store_class: Type['SnapshotStore']) -> Optional['SnapshotStore']:
+        """The snapshot store of this node's pairs
+        
+        Workers on one host each write their own directory under ``snapshot_dir``;
+        the coordinator sees no pairs and keeps none.
+        """
+        root = self.settings.snapshot_dir
+        if not root or self.role == 'coordinator':
+            return None
+        if self.role == 'worker':
+            return store_class(os.path.join(root, f'shard-{self.settings.shard_index}'))
+        return store_class(root)
+        
+    async def analyze_new_tokens(self, hours=24, min_volume=MIN_VOLUME_THRESHOLD,
+                                 timings: Optional[CycleTimings] = None):
         """Main analysis function for new tokens"""
+        timings = timings or CycleTimings(time.time())
         try:
-            logger.info(f"Analyzing new tokens from past {hours} hours...")
+            if self.role == 'coordinator':
+                shards = self.settings.shard_count
+                logger.info(f"Merging shard summaries of {shards} workers...")
+                analytics = await self._ensure_analytics()
+                with timings.stage('collect'):
+                    summaries = await self.shard_queue.collect(shards, self._cycle_id(timings))
+                async with self._analysis_lock:
+                    analysis = analytics.analyze_shards(summaries)
+                    timings.record('analyze', analytics.last_cycle_seconds)
+            else:
+                logger.info(f"Analyzing new tokens from past {hours} hours...")
+                analytics, analysis = await self._analyze_chains(hours, min_volume, timings)
             
-            # Fetch recent pairs from DexScreener
-            pairs = await self.dex_client.get_recent_pairs(hours)
+            if self.role == 'worker':
+                # The coordinator reports and alerts; an empty summary still tells it this shard is done
+                with timings.stage('publish'):
+                    self._publish_summary(analytics, analysis, timings)
+                return analysis or None
             
-            if not pairs:
+            if not analysis:
                 logger.warning("No pairs found in the specified timeframes")
                 return None
             
-            # Perform comprehensive analysis
-            analysis = self.analytics.comprehensive_analysis(pairs, min_volume)
-            
-            # Generate insights report
-            report = self.analytics.generate_insights_report(analysis)
-            
-            # Send to Telegram
-            await self.telegram_bot.send_analysis_report(report)
+            with timings.stage('send'):
+                # Generate insights report
+                report = analytics.generate_insights_report(analysis)
+                
+                # Serve /analyze and /stats from this report until the next cycle
+                self.telegram_bot.publish_report(report)
+                
+                # Send to Telegram, reusing the text published above
+                await self.telegram_bot.send_analysis_report(report)
+                for subscription, values in analytics.last_alerts:
+                    await self.telegram_bot.send_alert(subscription, values)
             
             logger.info("Analysis completed successfully")
             return analysis
@@ -49,19 +168,153 @@ class Web3AnalyticsBot:
             logger.error(f"Error in analysis: {str(e)}")
             await self.telegram_bot.send_message(f"❌ Analysis failed: {str(e)}")
             return None
+        
+    async def _analyze_chains(self, hours: float, min_volume: float,
+                              timings: CycleTimings) -> Tuple['TokenAnalytics', dict]:
+        """Fetch and analyze this node's chains (all of them unless it is a worker)"""
+        cycle_ms = int(time.time() * 1000)
+        
+        # Fetching starts right away, even while the previous cycle still holds the analysis stage.
+        # With worker processes, whole per-chain responses are decoded and aggregated off the event loop;
+        # otherwise responses are decoded incrementally and analyzed batch by batch.
+        # Incremental discovery pages only through pairs newer than the last cycle's and refreshes the rest by address.
+        use_workers = self.settings.analytics_workers and self.discovery is None
+        if self.discovery is not None:
+            source, fetching = self._prefetch(self.discovery.stream(self.dex_client, hours, self.chains), timings)
+        elif use_workers:
+            source, fetching = self._prefetch(self.dex_client.iter_recent_payloads(hours, self.chains), timings)
+        else:
+            source, fetching = self._prefetch(self.dex_client.stream_recent_pairs(hours, self.chains), timings)
+        try:
+            # On the first cycle pandas loads while that fetch is already under way
+            analytics = await self._ensure_analytics()
+        except Exception:
+            fetching.cancel()
+            raise
+        analyze = analytics.analyze_payloads if use_workers else analytics.analyze_stream
+        
+        # Keep each batch in the snapshot store for later time-range and backtesting queries
+        on_batch = None
+        if self.snapshot_store is not None and SNAPSHOT_CHANGED_ONLY:
+            # Idle pairs would only repeat their previous rows
+            on_batch = lambda pairs: self.snapshot_store.append(pairs.take(pairs['modified']), cycle_ms)
+        elif self.snapshot_store is not None:
+            on_batch = lambda pairs: self.snapshot_store.append(pairs, cycle_ms)
+        
+        if self.role == 'worker':
+            # Pick up subscriptions added or removed through the coordinator since the last cycle
+            self.alert_engine.reload()
+        async with self._analysis_lock:
+            analysis = await analyze(source, min_volume, on_batch=on_batch)
+            timings.record('analyze', analytics.last_cycle_seconds)
+        return analytics, analysis
+        
+    def _cycle_id(self, timings: CycleTimings) -> Optional[int]:
+        """The interval boundary a monitoring cycle belongs to, shared by every node; None for one-off runs"""
+        if self.scheduler is None:
+            return None
+        return int(timings.tick // self.scheduler.interval * self.scheduler.interval)
+        
+    def _publish_summary(self, analytics: 'TokenAnalytics', analysis: dict, timings: CycleTimings):
+        """Hand this worker's cycle summary to the coordinator"""
+        from src.sharding import ShardSummary
+        cycle = self._cycle_id(timings)
+        summary = analytics.last_summary if analysis else ShardSummary.combine([])
+        summary.cycle = int(timings.tick) if cycle is None else cycle
+        summary.shard = self.settings.shard_index
+        summary.chains = list(self.chains)
+        if analysis:
+            summary.alerts = [(subscription.sub_id, values) for subscription, values in analytics.last_alerts]
+        self.shard_queue.publish(summary)
+        logger.info(f"Published shard {summary.shard} summary of cycle {summary.cycle}")
+        
+    def _prefetch(self, source: AsyncIterator, timings: CycleTimings) -> Tuple[AsyncIterator, asyncio.Task]:
+        """Pull items from ``source`` in a background task into a bounded buffer
+        
+        Returns the buffered iterator and the fetching task, which the iterator
+        cancels when closed (the caller must cancel it if never iterating).
+        """
+        buffer: asyncio.Queue = asyncio.Queue(maxsize=PREFETCH_BATCHES)
+        
+        async def fetch():
+            with timings.stage('fetch'):
+                try:
+                    async for item in source:
+                        await buffer.put(item)
+                except Exception:
+                    await buffer.put(None)
+                    raise
+                await buffer.put(None)
+        
+        task = asyncio.create_task(fetch())
+        
+        async def drain():
+            try:
+                while (item := await buffer.get()) is not None:
+                    yield item
+                await task  # re-raise fetch errors
+            finally:
+                task.cancel()
+        
+        return drain(), task
 
+    def _collect_metrics(self):
+        """Copy the latest client, sender and scheduler counters into the registry"""
+        cache = self.dex_client.cache.stats()
+        for result, key in (('hit', 'hits'), ('stale_hit', 'stale_hits'), ('miss', 'misses')):
+            CACHE_LOOKUPS.set(cache[key], result=result)
+        CACHE_HIT_RATIO.set(cache['hit_rate'])
+        CACHE_BYTES.set(cache['bytes'])
+        API_RETRIES.set(self.dex_client.retry_count)
+        limiter = self.dex_client.rate_limiter.stats()
+        for field in ('rate', 'concurrency', 'in_flight', 'queue_depth', 'paused_for'):
+            API_LIMITER.set(limiter[field], field=field)
+        
+        sender = self.telegram_bot.sender.stats()
+        TELEGRAM_QUEUE_DEPTH.set(sender['queued'])
+        for outcome in ('sent', 'coalesced', 'retries', 'dropped'):
+            TELEGRAM_MESSAGES.set(sender[outcome], outcome=outcome)
+        if self.scheduler is not None:
+            CYCLES_IN_FLIGHT.set(self.scheduler.stats()['in_flight'])
+        
     async def run_continuous_monitoring(self, interval=3600):
-        """Run continuous monitoring with specified interval"""
+        """Run monitoring cycles on wall-clock aligned ticks, overlapping fetch with analysis"""
         logger.info(f"Starting continuous monitoring with {interval}s interval")
+        self.scheduler = AlignedScheduler(interval)
+        await self.scheduler.run(lambda timings: self.analyze_new_tokens(timings=timings))
+                
+    async def close(self):
+        """Stop serving commands, deliver queued Telegram messages and release pooled connections"""
+        REGISTRY.remove_collector(self._collect_metrics)
+        if self.metrics_server is not None:
+            await self.metrics_server.stop()
+        await self.telegram_bot.stop_serving()
+        await self.telegram_bot.close()
+        await self.dex_client.close()
+        if self.analytics is not None:
+            self.analytics.close()
         
-        while True:
-            try:
-                await self.analyze_new_tokens()
-                logger.info(f"Sleeping for {interval} seconds...")
-                await asyncio.sleep(interval)
-            except Exception as e:
-                logger.error(f"Monitoring error: {str(e)}")
-                await asyncio.sleep(60)  # Wait 1 minute before retry
+    async def run(self, args):
+        """Run the mode selected on the command line, then shut down cleanly"""
+        try:
+            if args.continuous:
+                # Each monitoring cycle refreshes the report the bot commands are served from
+                settings = self.settings
+                if settings.telegram_bot_token and self.role != 'worker':
+                    await self.telegram_bot.start_serving()
+                if settings.metrics_port:
+                    from src.metrics import MetricsServer
+                    self.metrics_server = MetricsServer()
+                    # Nodes sharing a host each need a port: worker i serves on metrics_port + 1 + i
+                    port = settings.metrics_port
+                    if self.role == 'worker':
+                        port += 1 + settings.shard_index
+                    await self.metrics_server.start(settings.metrics_host, port)
+                await self.run_continuous_monitoring(args.interval)
+            else:
+                await self.analyze_new_tokens(args.hours, args.min_volume)
+        finally:
+            await self.close()
 
 def main():
     parser = argparse.ArgumentParser(description='Web3 Token Analytics Bot')
@@ -71,17 +324,13 @@ def main():
                        help='Minimum volume threshold in USD')
     parser.add_argument('--continuous', action='store_true',
                        help='Run in continuous monitoring mode')
-    parser.add_argument('--interval', type=int, default=3600,
+    parser.add_argument('--interval', type=float, default=3600,
                        help='Interval for continuous monitoring (seconds)')
     
     args = parser.parse_args()
     
     bot = Web3AnalyticsBot()
-    
-    if args.continuous:
-        asyncio.run(bot.run_continuous_monitoring(args.interval))
-    else:
-        asyncio.run(bot.analyze_new_tokens(args.hours, args.min_volume))
+    asyncio.run(bot.run(args))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,309 @@
+"""
+In-process metrics in the Prometheus text format, a local /metrics endpoint
+and an on-demand sampling profiler
+"""
+
+import asyncio
+import bisect
+import logging
+import sys
+import threading
+import time
+from collections import Counter as _Tally
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Sequence, Tuple
+from config import *
+
+if TYPE_CHECKING:
+    from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    """One named metric with a value per distinct label combination"""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels))
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        for key, value in sorted(self._values.items()):
+            lines.append(f'{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}')
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def set(self, value: float, **labels):
+        """Mirror a cumulative count kept elsewhere (e.g. ``Cache.hits``)"""
+        self._values[self._key(labels)] = value
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed buckets, plus their sum and count"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        series = self._values.get(key)
+        if series is None:
+            # Per-bucket (not cumulative) counts, with a final +Inf bucket, then sum
+            series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of a block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        series = self._values.get(self._key(labels))
+        return sum(series[0]) if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        bounds = [*map(_format_value, self.buckets), '+Inf']
+        for key, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                labels = _format_labels(self.label_names, key, f'le="{bound}"')
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.label_names, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class MetricsRegistry:
+    """Named metrics plus callbacks that refresh mirrored values just before rendering
+
+    Metrics are updated from the event loop thread only, so no locking is done.
+    Asking for an existing name returns the same metric, which lets modules
+    declare their metrics at import time.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def _get(self, cls, name: str, help: str, labels: Sequence[str], **kwargs) -> _Metric:
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = cls(name, help, labels, **kwargs)
+        elif not isinstance(metric, cls) or metric.label_names != tuple(labels):
+            raise ValueError(f"Metric {name} already registered as a different {metric.kind}")
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._get(Counter, name, help, labels)
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._get(Gauge, name, help, labels)
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, labels, buckets=buckets)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def on_collect(self, callback: Callable[[], None]):
+        """Call ``callback`` before every render, to copy in state kept elsewhere"""
+        self._collectors.append(callback)
+
+    def remove_collector(self, callback: Callable[[], None]):
+        if callback in self._collectors:
+            self._collectors.remove(callback)
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format"""
+        for callback in list(self._collectors):
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Metrics collector failed: {str(e)}")
+        lines = []
+        for name in sorted(self._metrics):
+            lines.extend(self._metrics[name].render())
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry the hot paths report into
+REGISTRY = MetricsRegistry()
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack at a fixed interval from a background thread
+
+    Samples are aggregated as collapsed stacks (``outer;inner;leaf count``),
+    the input format of flame graph tools. Sampling only reads frames, so the
+    profiled thread is never paused beyond the GIL hand-off. Work running in
+    the analytics worker processes is not visible to it.
+    """
+
+    def __init__(self, interval: float = PROFILER_INTERVAL, thread_id: Optional[int] = None):
+        self.interval = interval
+        self.thread_id = thread_id if thread_id is not None else threading.main_thread().ident
+        self.samples: _Tally = _Tally()
+        self.sample_count = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample_loop, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{frame.f_globals.get("__name__", "?")}:{code.co_name}')
+                frame = frame.f_back
+            self.samples[';'.join(reversed(stack))] += 1
+            self.sample_count += 1
+
+    def collapsed(self, limit: Optional[int] = None) -> str:
+        """Collapsed stacks, most sampled first"""
+        return '\n'.join(f'{stack} {count}' for stack, count in self.samples.most_common(limit)) + '\n'
+
+
+class MetricsServer:
+    """Local HTTP endpoint: ``GET /metrics`` and ``GET /profile?seconds=N``
+
+    ``/profile`` turns the sampling profiler on for ``seconds`` (capped at
+    ``PROFILER_MAX_SECONDS``) while the process keeps running, then returns the
+    collapsed stacks of the event loop thread. aiohttp's server side is only
+    imported once a server is created.
+    """
+
+    def __init__(self, registry: MetricsRegistry = REGISTRY):
+        from aiohttp import web
+
+        self._web = web
+        self.registry = registry
+        self.app = web.Application()
+        self.app.router.add_get('/metrics', self._handle_metrics)
+        self.app.router.add_get('/profile', self._handle_profile)
+        self._runner: Optional['web.AppRunner'] = None
+        self._profiling = False
+
+    async def start(self, host: str = SETTINGS.metrics_host, port: int = SETTINGS.metrics_port) -> str:
+        """Serve in the background; returns the base URL"""
+        self._runner = self._web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await self._web.TCPSite(self._runner, host, port).start()
+        port = self._runner.addresses[0][1]
+        url = f'http://{host}:{port}'
+        logger.info(f"Metrics served on {url}/metrics")
+        return url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle_metrics(self, request: 'web.Request') -> 'web.Response':
+        return self._web.Response(text=self.registry.render(), content_type='text/plain',
+                            headers={'X-Content-Type-Options': 'nosniff'})
+
+    async def _handle_profile(self, request: 'web.Request') -> 'web.Response':
+        if self._profiling:
+            return self._web.Response(status=409, text='A profile is already running\n')
+        try:
+            seconds = min(float(request.query.get('seconds', 10)), PROFILER_MAX_SECONDS)
+            interval = float(request.query.get('interval', PROFILER_INTERVAL))
+            limit = int(request.query['limit']) if 'limit' in request.query else None
+        except ValueError:
+            return self._web.Response(status=400, text='seconds, interval and limit must be numbers\n')
+
+        profiler = SamplingProfiler(interval, threading.get_ident())
+        self._profiling = True
+        profiler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.stop()
+            self._profiling = False
+        logger.info(f"Profiled event loop for {seconds:g}s: {profiler.sample_count} samples")
+        return self._web.Response(text=profiler.collapsed(limit), content_type='text/plain')
@@ -0,0 +1,224 @@
+"""
+Keyed per-pair state carried across monitoring cycles
+"""
+
+import logging
+from itertools import repeat
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+from config import *
+from src.ingestion import fingerprint_rows
+from src.pair_store import INTERNERS, PairStore
+
+logger = logging.getLogger(__name__)
+
+# Values remembered for every pair, in slot-array column order
+TRACKED_COLUMNS = [
+    'price_usd',
+    'volume_h24',
+    'price_change_h24',
+    'liquidity_usd',
+    'txns_h24',
+    'holders',
+]
+
+# Interned labels remembered for every pair, as codes into pair_store.INTERNERS
+LABEL_COLUMNS = ['chain_id']
+
+
+class PairDeltas:
+    """Per-row result of diffing one cycle's pairs against the stored state
+
+    ``known`` marks rows seen in an earlier cycle, ``changed`` marks known rows
+    whose fingerprint moved and ``returning`` marks known rows that were
+    missing from the previous cycle. Delta arrays are NaN for rows without
+    history and zero for unchanged rows. ``slots`` is each row's state slot.
+    """
+
+    def __init__(self, size: int):
+        self.known = np.zeros(size, dtype=bool)
+        self.changed = np.zeros(size, dtype=bool)
+        self.returning = np.zeros(size, dtype=bool)
+        self.slots = np.full(size, -1, dtype=np.int64)
+        self.holders_delta = np.full(size, np.nan)
+        self.volume_delta = np.full(size, np.nan)
+        self.price_delta_pct = np.full(size, np.nan)
+
+    @property
+    def new(self) -> np.ndarray:
+        return ~self.known
+
+    @property
+    def modified(self) -> np.ndarray:
+        """Rows that are new or changed, i.e. the ones later stages need to look at"""
+        return self.new | self.changed
+
+    def as_columns(self) -> Dict[str, np.ndarray]:
+        return {
+            'modified': self.modified,
+            'holders_delta': self.holders_delta,
+            'volume_delta': self.volume_delta,
+            'price_delta_pct': self.price_delta_pct,
+        }
+
+
+class PairStateStore:
+    """Previous values of every pair, keyed by (chain, pair address)
+
+    Values live in one float64 slot array next to each pair's fingerprint
+    (see ``ingestion.fingerprint_rows``). Rows are diffed by fingerprint
+    alone; tracked values are only gathered, written back and turned into
+    deltas for rows that are new or changed. Pairs unseen for ``ttl`` seconds are evicted and their slots reused;
+    ``evict`` scans every slot, so it is run once per cycle rather than per batch.
+    Slots are stable while a pair is tracked, so they double as pair ids.
+    """
+
+    def __init__(self, ttl: int = PAIR_STATE_TTL, initial_capacity: int = 1024):
+        self.ttl = ttl
+        self._slots: Dict[Tuple[str, str], int] = {}
+        self._keys: List[Optional[Tuple[str, str]]] = [None] * initial_capacity
+        self._values = np.full((initial_capacity, len(TRACKED_COLUMNS)), np.nan)
+        self._fingerprints = np.zeros(initial_capacity, dtype=np.uint64)
+        self._labels = np.full((initial_capacity, len(LABEL_COLUMNS)), -1, dtype=np.int32)
+        self._symbols = np.full(initial_capacity, None, dtype=object)  # not interned: the vocabulary is unbounded
+        self._cycle_ms = 0
+        self._previous_cycle_ms = 0
+        self._last_seen = np.zeros(initial_capacity, dtype=np.int64)
+        self._occupied = np.zeros(initial_capacity, dtype=bool)
+        self._free = list(range(initial_capacity - 1, -1, -1))
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, key: Tuple[str, str]) -> bool:
+        return key in self._slots
+
+    def get(self, chain_id: str, pair_address: str) -> Optional[Dict[str, float]]:
+        """Last stored values of one pair"""
+        slot = self._slots.get((chain_id, pair_address))
+        if slot is None:
+            return None
+        return dict(zip(TRACKED_COLUMNS, self._values[slot].tolist()))
+
+    def update(self, columns: Mapping[str, Any], now_ms: int) -> PairDeltas:
+        """Diff the rows of ``columns`` against the stored state and store the new values"""
+        keys = list(zip(np.asarray(columns['chain_id']).tolist(), np.asarray(columns['pair_address']).tolist()))
+        fingerprints = columns['fingerprint'] if 'fingerprint' in columns else fingerprint_rows(columns)
+        fingerprints = np.asarray(fingerprints, dtype=np.uint64)
+        deltas = PairDeltas(len(keys))
+        if not keys:
+            return deltas
+        if now_ms != self._cycle_ms:
+            # Batches of one cycle share ``now_ms``
+            self._previous_cycle_ms, self._cycle_ms = self._cycle_ms, now_ms
+
+        slots = np.fromiter(map(self._slots.get, keys, repeat(-1)), dtype=np.int64, count=len(keys))
+        deltas.known = slots >= 0
+
+        known_rows = np.flatnonzero(deltas.known)
+        deltas.returning[known_rows] = self._last_seen[slots[known_rows]] < self._previous_cycle_ms
+        unchanged = self._fingerprints[slots[known_rows]] == fingerprints[known_rows]
+        changed_rows = known_rows[~unchanged]
+        deltas.changed[changed_rows] = True
+
+        # Unchanged rows have zero deltas; only changed rows need arithmetic
+        unchanged_rows = known_rows[unchanged]
+        for delta in (deltas.holders_delta, deltas.volume_delta, deltas.price_delta_pct):
+            delta[unchanged_rows] = 0.0
+
+        if len(changed_rows):
+            before = self._values[slots[changed_rows]]
+            after = self._tracked(columns, changed_rows)
+            holders = TRACKED_COLUMNS.index('holders')
+            volume = TRACKED_COLUMNS.index('volume_h24')
+            price = TRACKED_COLUMNS.index('price_usd')
+            deltas.holders_delta[changed_rows] = after[:, holders] - before[:, holders]
+            deltas.volume_delta[changed_rows] = after[:, volume] - before[:, volume]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                deltas.price_delta_pct[changed_rows] = np.where(
+                    before[:, price] > 0, (after[:, price] - before[:, price]) / before[:, price] * 100, np.nan)
+            self._values[slots[changed_rows]] = after
+            self._fingerprints[slots[changed_rows]] = fingerprints[changed_rows]
+
+        new_rows = np.flatnonzero(~deltas.known)
+        if len(new_rows):
+            for row in new_rows:
+                key = keys[row]
+                if key in self._slots:
+                    # Duplicate key within the same batch; the last row wins
+                    slots[row] = self._slots[key]
+                    continue
+                slots[row] = self._allocate(key)
+            self._values[slots[new_rows]] = self._tracked(columns, new_rows)
+            self._fingerprints[slots[new_rows]] = fingerprints[new_rows]
+
+        self._labels[slots] = np.column_stack([self._label_codes(columns, name) for name in LABEL_COLUMNS])
+        self._symbols[slots] = np.asarray(columns['base_token_symbol'], dtype=object)
+        self._last_seen[slots] = now_ms
+        deltas.slots = slots
+        return deltas
+
+    @staticmethod
+    def _tracked(columns: Mapping[str, Any], rows: np.ndarray) -> np.ndarray:
+        """Tracked values of some rows, in slot-array column order"""
+        return np.column_stack([np.asarray(columns[name], dtype=np.float64)[rows] for name in TRACKED_COLUMNS])
+
+    @staticmethod
+    def _label_codes(columns: Mapping[str, Any], name: str) -> np.ndarray:
+        if isinstance(columns, PairStore):
+            return columns.codes(name)
+        return INTERNERS[name].encode(np.asarray(columns[name], dtype=object))
+
+    def live(self, now_ms: int) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """Slots seen at ``now_ms`` (the current cycle) with their tracked values and label codes"""
+        slots = np.flatnonzero(self._occupied & (self._last_seen >= now_ms))
+        columns = {name: self._values[slots, i] for i, name in enumerate(TRACKED_COLUMNS)}
+        columns.update({name: self._labels[slots, i] for i, name in enumerate(LABEL_COLUMNS)})
+        return slots, columns
+
+    def last_seen(self, slots: np.ndarray) -> np.ndarray:
+        """When each slot's pair was last seen (0 for free slots)"""
+        return np.where(self._occupied[slots], self._last_seen[slots], 0)
+
+    def describe(self, slot: int) -> Dict[str, Any]:
+        """Tracked values and decoded labels of the pair in ``slot``"""
+        values = dict(zip(TRACKED_COLUMNS, self._values[slot].tolist()))
+        for i, name in enumerate(LABEL_COLUMNS):
+            values[name] = INTERNERS[name].category(int(self._labels[slot, i]))
+        values['base_token_symbol'] = self._symbols[slot]
+        return values
+
+    def _allocate(self, key: Tuple[str, str]) -> int:
+        if not self._free:
+            self._grow()
+        slot = self._free.pop()
+        self._slots[key] = slot
+        self._keys[slot] = key
+        self._occupied[slot] = True
+        return slot
+
+    def _grow(self):
+        capacity = len(self._keys)
+        self._keys.extend([None] * capacity)
+        self._values = np.vstack([self._values, np.full_like(self._values, np.nan)])
+        self._fingerprints = np.concatenate([self._fingerprints, np.zeros(capacity, dtype=np.uint64)])
+        self._labels = np.vstack([self._labels, np.full_like(self._labels, -1)])
+        self._symbols = np.concatenate([self._symbols, np.full(capacity, None, dtype=object)])
+        self._last_seen = np.concatenate([self._last_seen, np.zeros(capacity, dtype=np.int64)])
+        self._occupied = np.concatenate([self._occupied, np.zeros(capacity, dtype=bool)])
+        self._free.extend(range(2 * capacity - 1, capacity - 1, -1))
+
+    def evict(self, now_ms: int):
+        """Drop pairs that have not been seen for ``ttl`` seconds"""
+        stale = np.flatnonzero(self._occupied & (self._last_seen < now_ms - self.ttl * 1000))
+        for slot in stale.tolist():
+            del self._slots[self._keys[slot]]
+            self._keys[slot] = None
+            self._free.append(slot)
+        if len(stale):
+            self._occupied[stale] = False
+            self._values[stale] = np.nan
+            self._labels[stale] = -1
+            self._symbols[stale] = None
+            logger.debug(f"Evicted {len(stale)} stale pairs from state")
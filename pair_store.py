@@ -0,0 +1,210 @@
+"""
+Compact struct-of-arrays storage for one batch of pairs
+"""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from src.ingestion import FRAME_COLUMNS, extract_pair_columns, fingerprint_rows
+
+# Typed numeric columns
+NUMERIC_FIELDS = {
+    'price_usd': np.float64,
+    'volume_h24': np.float64,
+    'price_change_h24': np.float64,
+    'liquidity_usd': np.float64,
+    'fdv': np.float64,
+    'market_cap': np.float64,
+    'txns_h24': np.float64,
+    'holders': np.float64,
+    'pair_created_ms': np.int64,
+}
+
+# Low-cardinality text, stored as int32 codes into a process-wide interned vocabulary
+CATEGORICAL_FIELDS = ['chain_id', 'dex_id', 'quote_token_symbol']
+
+# Addresses and base token symbols, stored as fixed-width bytes per batch. Their
+# vocabularies are unbounded, so interning them would grow the shared vocabulary forever
+BYTES_FIELDS = ['pair_address', 'base_token_address', 'base_token_symbol']
+
+
+class CategoryInterner:
+    """Assigns stable int32 codes to strings; code -1 means missing"""
+
+    def __init__(self):
+        self._codes: Dict[str, int] = {}
+        self._values: List[str] = []
+        self._lookup = np.empty(0, dtype=object)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def encode(self, values: np.ndarray) -> np.ndarray:
+        """Codes for an array of strings, hashing only the distinct values"""
+        local_codes, uniques = pd.factorize(values)
+        mapping = np.empty(len(uniques) + 1, dtype=np.int32)
+        mapping[-1] = -1
+        for i, value in enumerate(uniques):
+            value = str(value)
+            code = self._codes.get(value)
+            if code is None:
+                code = self._codes[value] = len(self._values)
+                self._values.append(value)
+            mapping[i] = code
+        return mapping[local_codes]
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """Object array of strings (None where missing) for the given codes"""
+        if len(self._lookup) != len(self._values) + 1:
+            self._lookup = np.array(self._values + [None], dtype=object)
+        return self._lookup[codes]
+
+    def category(self, code: int) -> Optional[str]:
+        return self._values[code] if code >= 0 else None
+
+
+# Shared so codes from different batches (and stores) are comparable
+INTERNERS = {name: CategoryInterner() for name in CATEGORICAL_FIELDS}
+
+
+def _to_fixed_bytes(values: np.ndarray) -> np.ndarray:
+    """Encode strings as fixed-width bytes sized to the longest value (missing is stored as empty)"""
+    filled = np.where(pd.isna(values), '', values)
+    try:
+        return np.array(filled.tolist(), dtype='S')
+    except UnicodeEncodeError:
+        return np.array([str(value).encode('utf-8') for value in filled.tolist()], dtype='S')
+
+
+class PairStore:
+    """One batch of pairs as typed arrays instead of dicts or object columns
+
+    ``store[name]`` returns a NumPy array for every analytics column, decoding
+    categorical and byte fields on access; ``codes`` and ``raw`` expose the
+    compact representations. Extra numeric columns can be attached with
+    ``store[name] = values``.
+    """
+
+    def __init__(self, numeric: Dict[str, np.ndarray], categorical: Dict[str, np.ndarray],
+                 addresses: Dict[str, np.ndarray]):
+        self._numeric = numeric
+        self._categorical = categorical
+        self._addresses = addresses
+        self._size = len(next(iter(numeric.values())))
+
+    @classmethod
+    def from_pairs(cls, pairs: Sequence[Dict]) -> 'PairStore':
+        """Ingest raw pairs, dropping those with unparseable numeric fields"""
+        columns, valid = extract_pair_columns(pairs)
+        if not valid.all():
+            columns = {name: values[valid] for name, values in columns.items()}
+        return cls.from_columns(columns)
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, Any]) -> 'PairStore':
+        numeric = {name: np.asarray(columns[name], dtype=dtype) for name, dtype in NUMERIC_FIELDS.items()}
+        # Computed once at ingestion so every later stage can tell unchanged pairs apart cheaply
+        numeric['fingerprint'] = fingerprint_rows(numeric)
+        categorical = {
+            name: INTERNERS[name].encode(np.asarray(columns[name], dtype=object)) for name in CATEGORICAL_FIELDS
+        }
+        addresses = {name: _to_fixed_bytes(np.asarray(columns[name], dtype=object)) for name in BYTES_FIELDS}
+        return cls(numeric, categorical, addresses)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._numeric or name in self._categorical or name in self._addresses
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        if name in self._numeric:
+            return self._numeric[name]
+        if name in self._categorical:
+            return INTERNERS[name].decode(self._categorical[name])
+        if name in self._addresses:
+            raw = self._addresses[name]
+            decoded = np.char.decode(raw, 'utf-8').astype(object)
+            decoded[raw == b''] = None
+            return decoded
+        raise KeyError(name)
+
+    def __setitem__(self, name: str, values: np.ndarray):
+        values = np.asarray(values)
+        if len(values) != self._size:
+            raise ValueError(f"Column '{name}' has {len(values)} rows, expected {self._size}")
+        self._numeric[name] = values
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._numeric) + list(self._categorical) + list(self._addresses)
+
+    def __getstate__(self) -> Dict:
+        # Codes are only meaningful to this process's interners, so ship each
+        # column's categories alongside compact local codes
+        categorical = {}
+        for name, codes in self._categorical.items():
+            present = np.flatnonzero(np.bincount(codes + 1)) - 1
+            local = np.empty(len(INTERNERS[name]) + 1, dtype=np.int32)
+            local[present] = np.arange(len(present), dtype=np.int32)
+            labels = [INTERNERS[name].category(int(code)) for code in present]
+            categorical[name] = (local[codes], labels)
+        return {'numeric': self._numeric, 'categorical': categorical, 'addresses': self._addresses}
+
+    def __setstate__(self, state: Dict):
+        self._numeric = state['numeric']
+        self._addresses = state['addresses']
+        self._categorical = {}
+        for name, (local, labels) in state['categorical'].items():
+            mapping = INTERNERS[name].encode(np.array(labels, dtype=object))
+            self._categorical[name] = mapping[local]
+        self._size = len(next(iter(self._numeric.values())))
+
+    def codes(self, name: str) -> np.ndarray:
+        """Interned int32 codes of a categorical column"""
+        return self._categorical[name]
+
+    def raw(self, name: str) -> np.ndarray:
+        """Fixed-width bytes of an address or symbol column"""
+        return self._addresses[name]
+
+    def value(self, name: str, row: int) -> Any:
+        """Single cell, without decoding the whole column"""
+        if name in self._categorical:
+            return INTERNERS[name].category(int(self._categorical[name][row]))
+        if name in self._addresses:
+            return self._addresses[name][row].decode('utf-8') or None
+        return self._numeric[name][row]
+
+    def category_counts(self, name: str, mask: Optional[np.ndarray] = None) -> Dict[str, int]:
+        """Rows per category, most common first (ties keep first-seen order)"""
+        codes = self._categorical[name]
+        if mask is not None:
+            codes = codes[mask]
+        codes = codes[codes >= 0]
+        if not len(codes):
+            return {}
+        present, first_seen, counts = np.unique(codes, return_index=True, return_counts=True)
+        order = np.lexsort((first_seen, -counts))
+        interner = INTERNERS[name]
+        return {interner.category(int(present[i])): int(counts[i]) for i in order}
+
+    def take(self, rows: np.ndarray) -> 'PairStore':
+        """New store holding only the given rows"""
+        return PairStore(
+            {name: values[rows] for name, values in self._numeric.items()},
+            {name: codes[rows] for name, codes in self._categorical.items()},
+            {name: values[rows] for name, values in self._addresses.items()},
+        )
+
+    def memory_usage(self) -> int:
+        """Bytes held by the column arrays"""
+        arrays = list(self._numeric.values()) + list(self._categorical.values()) + list(self._addresses.values())
+        return sum(values.nbytes for values in arrays)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Materialize as a DataFrame (analytics columns first, extras after; no raw ``pair_created_at``)"""
+        names = [name for name in FRAME_COLUMNS if name in self] + \
+                [name for name in self._numeric if name not in FRAME_COLUMNS]
+        return pd.DataFrame({name: self[name] for name in names}, columns=names)
@@ -0,0 +1,135 @@
+"""
+Client-wide token-bucket rate limiter with an adaptive concurrency window
+"""
+
+import asyncio
+import logging
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from config import *
+
+logger = logging.getLogger(__name__)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a ``Retry-After`` header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveRateLimiter:
+    """Token bucket shared by every request a client makes
+
+    Both the refill rate and the concurrency window follow AIMD: each success
+    nudges them up towards their maximum, each 429 halves them and pauses all
+    callers until ``Retry-After`` has elapsed. Use as ``async with limiter:``
+    around a single request.
+    """
+
+    def __init__(self, rate: float = RATE_LIMIT_PER_SECOND, burst: int = RATE_LIMIT_BURST,
+                 min_rate: float = MIN_REQUEST_RATE,
+                 max_concurrency: int = MAX_CONCURRENT_REQUESTS,
+                 min_concurrency: int = MIN_CONCURRENT_REQUESTS):
+        self.max_rate = rate
+        self.min_rate = min_rate
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.concurrency = float(max_concurrency)
+
+        self.in_flight = 0
+        self.queue_depth = 0
+        self.throttled_count = 0
+        self.success_count = 0
+
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._condition: Optional[asyncio.Condition] = None
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.release()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _delay(self) -> float:
+        """Seconds until a token is available and no pause is in effect"""
+        now = time.monotonic()
+        self._refill(now)
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self._tokens < 1:
+            return (1 - self._tokens) / self.rate
+        return 0.0
+
+    async def acquire(self):
+        """Wait for a token and a free slot in the concurrency window"""
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+
+        async with self._condition:
+            self.queue_depth += 1
+            try:
+                while True:
+                    delay = self._delay()
+                    if delay <= 0 and self.in_flight < int(self.concurrency):
+                        break
+                    try:
+                        await asyncio.wait_for(self._condition.wait(), timeout=delay or None)
+                    except asyncio.TimeoutError:
+                        pass
+                self._tokens -= 1
+                self.in_flight += 1
+            finally:
+                self.queue_depth -= 1
+
+    async def release(self):
+        """Free the caller's slot in the concurrency window"""
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self):
+        """Additive increase of rate and concurrency"""
+        self.success_count += 1
+        self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+        self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+    def on_throttle(self, retry_after: Optional[float] = None):
+        """Multiplicative decrease, pausing every caller for ``retry_after`` seconds"""
+        self.throttled_count += 1
+        self.concurrency = max(self.min_concurrency, self.concurrency / 2)
+        self.rate = max(self.min_rate, self.rate / 2)
+        if retry_after:
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+        self._tokens = min(self._tokens, 0.0)
+        logger.warning(f"Throttled by API: rate now {self.rate:.2f}/s, "
+                       f"concurrency {int(self.concurrency)}, retry after {retry_after or 0:.1f}s")
+
+    def stats(self) -> Dict:
+        """Current limiter state, for tuning"""
+        return {
+            'rate': round(self.rate, 3),
+            'concurrency': int(self.concurrency),
+            'in_flight': self.in_flight,
+            'queue_depth': self.queue_depth,
+            'throttled_count': self.throttled_count,
+            'success_count': self.success_count,
+            'paused_for': round(max(0.0, self._paused_until - time.monotonic()), 3),
+        }
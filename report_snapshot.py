@@ -0,0 +1,50 @@
+"""
+Latest analysis report, published once per cycle and read by bot commands
+"""
+
+import time
+from typing import Callable, Dict, Optional
+
+
+class ReportSnapshot:
+    """The most recent insights report plus message text rendered from it
+
+    ``publish`` swaps in a new report and bumps ``version``; rendered text is
+    cached per version, so each message is formatted at most once per cycle no
+    matter how many commands ask for it. Readers never trigger a fetch or an
+    analysis.
+    """
+
+    def __init__(self):
+        self.report: Optional[Dict] = None
+        self.version = 0
+        self.published_at: Optional[float] = None
+        self._rendered: Dict[str, str] = {}
+        self._renderers: Dict[str, Callable[[Dict], str]] = {}
+
+    def register(self, name: str, render: Callable[[Dict], str]):
+        """Add a message renderer; its text is rebuilt once per published report"""
+        self._renderers[name] = render
+        self._rendered.pop(name, None)
+
+    def publish(self, report: Dict):
+        """Make ``report`` the latest snapshot and pre-render every registered message"""
+        rendered = {name: render(report) for name, render in self._renderers.items()}
+        self.report = report
+        self._rendered = rendered
+        self.published_at = time.time()
+        self.version += 1
+
+    def rendered(self, name: str) -> Optional[str]:
+        """Cached text of one message for the current snapshot (None before the first publish)"""
+        if self.report is None:
+            return None
+        text = self._rendered.get(name)
+        if text is None:
+            text = self._rendered[name] = self._renderers[name](self.report)
+        return text
+
+    @property
+    def age(self) -> Optional[float]:
+        """Seconds since the last publish"""
+        return time.time() - self.published_at if self.published_at is not None else None
@@ -0,0 +1,155 @@
+"""
+Wall-clock aligned, pipelined scheduling of monitoring cycles
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, Optional, Set
+from config import *
+from src.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+CYCLE_SECONDS = REGISTRY.histogram('monitor_cycle_seconds', 'Wall time of one monitoring cycle')
+CYCLE_STAGE_SECONDS = REGISTRY.histogram('monitor_stage_seconds', 'Wall time per monitoring cycle stage', ('stage',))
+TICK_LAG_SECONDS = REGISTRY.histogram('monitor_tick_lag_seconds', 'Delay between a scheduled tick and its cycle starting')
+TICKS = REGISTRY.counter('monitor_ticks_total', 'Monitoring ticks by outcome', ('outcome',))
+
+
+class CycleTimings:
+    """Per-stage wall time of one monitoring cycle"""
+
+    def __init__(self, tick: float):
+        self.tick = tick
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self.stages: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a block, adding to the stage's total"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    @property
+    def lag(self) -> float:
+        """Seconds between the scheduled tick and the cycle actually starting"""
+        return self.started - self.tick
+
+    @property
+    def total(self) -> Optional[float]:
+        return self.finished - self.started if self.finished is not None else None
+
+    def as_dict(self) -> Dict:
+        return {'tick': self.tick, 'lag': self.lag, 'total': self.total, **self.stages}
+
+    def describe(self) -> str:
+        stages = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.stages.items())
+        return f"{stages}, total {self.total or 0:.2f}s, lag {self.lag:.2f}s"
+
+
+class AlignedScheduler:
+    """Starts a cycle on every multiple of ``interval`` seconds of wall-clock time
+
+    Ticks are computed from the clock rather than by sleeping ``interval``
+    after each cycle, so the period does not drift. Up to ``max_in_flight``
+    cycles may overlap (the next fetch starting while the previous cycle is
+    still analyzing or sending); a tick that would exceed that is skipped
+    instead of queued.
+    """
+
+    def __init__(self, interval: float, max_in_flight: int = MONITOR_MAX_IN_FLIGHT,
+                 history_size: int = METRICS_HISTORY_SIZE):
+        self.interval = interval
+        self.max_in_flight = max_in_flight
+        self.history: deque = deque(maxlen=history_size)
+        self.started_count = 0
+        self.skipped_count = 0
+        self._running: Set[asyncio.Task] = set()
+
+    def next_tick(self, now: Optional[float] = None) -> float:
+        """First interval boundary strictly after ``now``"""
+        now = time.time() if now is None else now
+        return (now // self.interval + 1) * self.interval
+
+    async def run(self, cycle: Callable[[CycleTimings], Awaitable], run_immediately: bool = True,
+                  max_ticks: Optional[int] = None):
+        """Run ``cycle`` on each tick until cancelled (or for ``max_ticks`` ticks)"""
+        tick = time.time() if run_immediately else self.next_tick()
+        ticks = 0
+        try:
+            while max_ticks is None or ticks < max_ticks:
+                delay = tick - time.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                self._start(cycle, tick)
+                ticks += 1
+
+                # Guard against waking a little early, which would repeat the same tick
+                next_tick = self.next_tick(max(time.time(), tick))
+                missed = int(round((next_tick - tick) / self.interval)) - 1
+                if missed > 0:
+                    # The event loop itself fell behind; those ticks are gone
+                    self.skipped_count += missed
+                    TICKS.inc(missed, outcome='missed')
+                    logger.warning(f"Skipped {missed} monitoring ticks")
+                tick = next_tick
+            await self.drain()
+        finally:
+            for task in self._running:
+                task.cancel()
+
+    async def drain(self):
+        """Wait for cycles still in flight"""
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+    def _start(self, cycle: Callable[[CycleTimings], Awaitable], tick: float):
+        if len(self._running) >= self.max_in_flight:
+            self.skipped_count += 1
+            TICKS.inc(outcome='skipped')
+            logger.warning(f"Skipping monitoring tick: {len(self._running)} cycles still running")
+            return
+        self.started_count += 1
+        TICKS.inc(outcome='started')
+        task = asyncio.create_task(self._run_cycle(cycle, CycleTimings(tick)))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run_cycle(self, cycle: Callable[[CycleTimings], Awaitable], timings: CycleTimings):
+        try:
+            await cycle(timings)
+        except Exception as e:
+            logger.error(f"Monitoring cycle failed: {str(e)}")
+        finally:
+            timings.finished = time.time()
+            self.history.append(timings.as_dict())
+            CYCLE_SECONDS.observe(timings.total)
+            TICK_LAG_SECONDS.observe(timings.lag)
+            for name, seconds in timings.stages.items():
+                CYCLE_STAGE_SECONDS.observe(seconds, stage=name)
+            logger.info(f"Cycle timings: {timings.describe()}")
+
+    def stats(self) -> Dict:
+        """Tick counters and mean/max seconds per stage over the recorded history"""
+        stages: Dict[str, list] = {}
+        for entry in self.history:
+            for name, seconds in entry.items():
+                if name != 'tick' and seconds is not None:
+                    stages.setdefault(name, []).append(seconds)
+        return {
+            'started': self.started_count,
+            'skipped': self.skipped_count,
+            'in_flight': len(self._running),
+            'stages': {name: {'mean': sum(values) / len(values), 'max': max(values)}
+                       for name, values in stages.items()},
+        }
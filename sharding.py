@@ -0,0 +1,182 @@
+"""
+Chain sharding across worker nodes: mergeable cycle summaries and the file queue between nodes
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from config import *
+from src.aggregates import PairAggregates
+from src.indicators import WindowSignals
+from src.leaderboard import merge_reports
+
+logger = logging.getLogger(__name__)
+
+# Bumped when the summary layout changes; summaries of other versions are skipped
+SUMMARY_VERSION = 1
+
+
+def shard_chains(index: int, count: int, chains: Sequence[str] = SUPPORTED_CHAINS) -> List[str]:
+    """The chains shard ``index`` of ``count`` owns (every ``count``-th chain, so shards stay even)"""
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Shard index must be in [0, {count}), got {index}")
+    return list(chains[index::count])
+
+
+class ShardSummary:
+    """Everything a cycle's report is rendered from, for one shard of the chains
+
+    Counts and sums merge exactly and leaderboards do too, because shards
+    hold disjoint pairs. Medians merge through their quantile sketches and are
+    approximate in a merged report. A standalone process renders its report
+    from a single summary, so a coordinator merging every shard's summary
+    renders the same report but for those medians.
+    """
+
+    def __init__(self, aggregates: PairAggregates, window_signals: WindowSignals, leaderboards: Dict,
+                 new_pairs: int = 0, changed_pairs: int = 0, alerts: Optional[List[Tuple[int, Dict]]] = None,
+                 cycle: Optional[int] = None, shard: int = 0, chains: Optional[List[str]] = None):
+        self.aggregates = aggregates
+        self.window_signals = window_signals
+        self.leaderboards = leaderboards
+        self.new_pairs = new_pairs
+        self.changed_pairs = changed_pairs
+        self.alerts = alerts or []  # (subscription id, values) of alerts fired on this shard
+        self.cycle = cycle
+        self.shard = shard
+        self.chains = chains or []
+
+    @classmethod
+    def combine(cls, summaries: Sequence['ShardSummary']) -> 'ShardSummary':
+        combined = cls(PairAggregates(), WindowSignals([]), {}, cycle=summaries[0].cycle if summaries else None)
+        for summary in summaries:
+            combined.merge(summary)
+        return combined
+
+    def merge(self, other: 'ShardSummary') -> 'ShardSummary':
+        """Fold another shard's summary into this one"""
+        self.aggregates.merge(other.aggregates)
+        self.window_signals.merge(other.window_signals)
+        self.leaderboards = merge_reports([self.leaderboards, other.leaderboards])
+        self.new_pairs += other.new_pairs
+        self.changed_pairs += other.changed_pairs
+        self.alerts.extend(other.alerts)
+        self.chains.extend(other.chains)
+        return self
+
+    def to_analysis(self) -> Dict:
+        """The report sections, in the shape ``comprehensive_analysis`` returns (without a timestamp)"""
+        analysis = self.aggregates.to_analysis()
+        analysis['indicators'] = self.window_signals.to_report()
+        analysis['leaderboards'] = self.leaderboards
+        return analysis
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'version': SUMMARY_VERSION,
+            'cycle': self.cycle,
+            'shard': self.shard,
+            'chains': self.chains,
+            'aggregates': self.aggregates.to_dict(),
+            'window_signals': self.window_signals.to_dict(),
+            'leaderboards': self.leaderboards,
+            'new_pairs': self.new_pairs,
+            'changed_pairs': self.changed_pairs,
+            'alerts': [{'id': sub_id, 'values': values} for sub_id, values in self.alerts],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ShardSummary':
+        if data.get('version') != SUMMARY_VERSION:
+            raise ValueError(f"Unsupported shard summary version {data.get('version')}")
+        return cls(PairAggregates.from_dict(data['aggregates']), WindowSignals.from_dict(data['window_signals']),
+                   data['leaderboards'], data['new_pairs'], data['changed_pairs'],
+                   [(alert['id'], alert['values']) for alert in data['alerts']],
+                   data['cycle'], data['shard'], data['chains'])
+
+
+class ShardQueue:
+    """A directory of ``<cycle>.<shard>.json`` summaries: workers publish, the coordinator collects
+
+    Files are written atomically, so a reader never sees a partial summary,
+    and removed once the coordinator has merged their cycle.
+    """
+
+    def __init__(self, path: str = SETTINGS.shard_queue_dir):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def publish(self, summary: ShardSummary):
+        path = os.path.join(self.path, f'{summary.cycle}.{summary.shard}.json')
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(summary.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    def _published(self) -> Dict[int, Dict[int, str]]:
+        """Shard -> cycle -> file name of every summary in the queue"""
+        published: Dict[int, Dict[int, str]] = {}
+        for name in os.listdir(self.path):
+            parts = name.split('.')
+            if len(parts) != 3 or parts[2] != 'json':
+                continue
+            try:
+                cycle, shard = int(parts[0]), int(parts[1])
+            except ValueError:
+                continue
+            published.setdefault(shard, {})[cycle] = name
+        return published
+
+    def _ready(self, shards: int, cycle: Optional[int]) -> Dict[int, Tuple[int, str]]:
+        """Shard -> (cycle, file name) of the summary to merge: ``cycle``'s, or the newest"""
+        ready = {}
+        for shard, cycles in self._published().items():
+            if shard >= shards:
+                continue
+            if cycle is None:
+                newest = max(cycles)
+                ready[shard] = (newest, cycles[newest])
+            elif cycle in cycles:
+                ready[shard] = (cycle, cycles[cycle])
+        return ready
+
+    async def collect(self, shards: int, cycle: Optional[int] = None, timeout: float = SHARD_TIMEOUT,
+                      poll_interval: float = SHARD_POLL_INTERVAL) -> List[ShardSummary]:
+        """Wait up to ``timeout`` for every shard's summary of ``cycle`` (or its newest, when None)
+
+        Returns the summaries that arrived, logging the shards that did not,
+        and removes them from the queue along with any older ones.
+        """
+        deadline = time.monotonic() + timeout
+        ready = self._ready(shards, cycle)
+        while len(ready) < shards and time.monotonic() < deadline:
+            await asyncio.sleep(poll_interval)
+            ready = self._ready(shards, cycle)
+        missing = sorted(set(range(shards)) - ready.keys())
+        if missing:
+            logger.warning(f"Merging {len(ready)} of {shards} shards; no summary from shards {missing}")
+
+        summaries = []
+        for shard, (_, name) in sorted(ready.items()):
+            try:
+                with open(os.path.join(self.path, name)) as f:
+                    summaries.append(ShardSummary.from_dict(json.load(f)))
+            except (OSError, ValueError, KeyError) as e:
+                logger.error(f"Skipping unreadable summary {name}: {str(e)}")
+        self._prune(ready)
+        return summaries
+
+    def _prune(self, merged: Dict[int, Tuple[int, str]]):
+        """Remove each shard's merged summary and older ones; a worker ahead keeps its newer cycles"""
+        for shard, cycles in self._published().items():
+            if shard not in merged:
+                continue
+            for cycle, name in cycles.items():
+                if cycle <= merged[shard][0]:
+                    try:
+                        os.remove(os.path.join(self.path, name))
+                    except OSError as e:
+                        logger.warning(f"Failed to remove merged summary {name}: {str(e)}")
@@ -0,0 +1,142 @@
+"""
+Mergeable quantile sketch with a relative-error guarantee (DDSketch-style log buckets)
+"""
+
+import math
+from typing import Any, Dict, Iterable, Optional
+
+import numpy as np
+from config import *
+
+# Magnitudes below this are counted as zero, bounding the number of buckets
+MIN_INDEXABLE_VALUE = 1e-9
+
+
+class QuantileSketch:
+    """Approximate quantiles of a stream of values, mergeable across processes
+
+    Values are counted in logarithmic buckets: bucket ``i`` holds magnitudes
+    in ``(gamma**(i-1), gamma**i]`` with ``gamma = (1 + a) / (1 - a)``, so any
+    quantile comes back within a relative error ``a`` of a value at that rank.
+    Merging adds bucket counts, so a sketch merged from shards has the same
+    buckets as the sketch of all their values, whatever the merge order.
+
+    While every value was added in this process the values themselves are
+    kept as well and quantiles are exact (as ``np.quantile``). ``to_dict``
+    ships only the buckets, so a sketch that came from another node, or was
+    merged with one, answers approximately.
+    """
+
+    def __init__(self, relative_accuracy: float = SKETCH_RELATIVE_ACCURACY):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError(f"relative_accuracy must be in (0, 1), got {relative_accuracy}")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.count = 0
+        self.zero_count = 0
+        self.positive: Dict[int, int] = {}  # bucket index -> count
+        self.negative: Dict[int, int] = {}  # buckets of the magnitudes of negative values
+        self.values: Optional[np.ndarray] = np.empty(0, dtype=np.float64)  # None once only buckets are known
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, values: Iterable[float]):
+        """Count every non-NaN value"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.count += len(values)
+        if self.values is not None:
+            self.values = np.concatenate([self.values, values])
+        magnitude = np.abs(values)
+        indexable = magnitude >= MIN_INDEXABLE_VALUE
+        self.zero_count += int(np.count_nonzero(~indexable))
+        self._count_into(self.positive, magnitude[indexable & (values > 0)])
+        self._count_into(self.negative, magnitude[indexable & (values < 0)])
+
+    def _count_into(self, buckets: Dict[int, int], magnitudes: np.ndarray):
+        if not len(magnitudes):
+            return
+        indices = np.ceil(np.log(magnitudes) / self._log_gamma).astype(np.int64)
+        keys, counts = np.unique(indices, return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            buckets[key] = buckets.get(key, 0) + count
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        """Fold another sketch of the same accuracy into this one"""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError(f"Cannot merge sketches of relative accuracy "
+                             f"{self.relative_accuracy} and {other.relative_accuracy}")
+        self.count += other.count
+        self.zero_count += other.zero_count
+        if self.values is not None and other.values is not None:
+            self.values = np.concatenate([self.values, other.values])
+        else:
+            self.values = None
+        for buckets, other_buckets in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in other_buckets.items():
+                buckets[key] = buckets.get(key, 0) + count
+        return self
+
+    @property
+    def exact(self) -> bool:
+        return self.values is not None
+
+    def quantile(self, q: float) -> float:
+        """Value at quantile ``q`` (0 to 1), NaN when the sketch is empty
+
+        Approximate quantiles interpolate between the two nearest ranks, like
+        ``np.quantile``, so a median of an even count lies between the middle two.
+        """
+        if not self.count:
+            return np.nan
+        if self.values is not None:
+            return float(np.quantile(self.values, q))
+        rank = q * (self.count - 1)
+        lower = math.floor(rank)
+        low = self._value_at_rank(lower)
+        if rank == lower:
+            return low
+        return low + (self._value_at_rank(lower + 1) - low) * (rank - lower)
+
+    def _value_at_rank(self, rank: int) -> float:
+        seen = 0
+        # Most negative first: the negative buckets by descending magnitude
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._value(key)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._value(key)
+        return self._value(max(self.positive)) if self.positive else 0.0
+
+    def _value(self, key: int) -> float:
+        # The point of the bucket equally far, relatively, from both of its bounds
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'count': self.count,
+            'zero_count': self.zero_count,
+            'positive': sorted(self.positive.items()),
+            'negative': sorted(self.negative.items()),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'QuantileSketch':
+        sketch = cls(data['relative_accuracy'])
+        sketch.values = None
+        sketch.count = int(data['count'])
+        sketch.zero_count = int(data['zero_count'])
+        sketch.positive = {int(key): int(count) for key, count in data['positive']}
+        sketch.negative = {int(key): int(count) for key, count in data['negative']}
+        return sketch
@@ -0,0 +1,241 @@
+"""
+Append-only, memory-mapped columnar store of per-cycle pair snapshots
+"""
+
+import json
+import logging
+import os
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from config import *
+from src.pair_store import BYTES_FIELDS, PairStore
+
+logger = logging.getLogger(__name__)
+
+# Persisted columns and their on-disk dtypes; text is stored as fixed-width UTF-8 bytes
+SNAPSHOT_SCHEMA = {
+    'chain_id': 'S16',
+    'dex_id': 'S24',
+    'pair_address': 'S64',
+    'base_token_address': 'S64',
+    'base_token_symbol': 'S24',
+    'quote_token_symbol': 'S16',
+    'price_usd': 'f8',
+    'volume_h24': 'f8',
+    'price_change_h24': 'f8',
+    'liquidity_usd': 'f8',
+    'fdv': 'f8',
+    'market_cap': 'f8',
+    'txns_h24': 'f8',
+    'holders': 'f8',
+    'pair_created_ms': 'i8',
+}
+
+# One record per appended snapshot
+INDEX_DTYPE = np.dtype([('timestamp_ms', '<i8'), ('start', '<i8'), ('count', '<i8')])
+
+
+def _encode_text(values: Sequence, dtype: str) -> np.ndarray:
+    """Encode text values as fixed-width UTF-8 bytes (missing values become empty)"""
+    encoded = pd.Series(values, dtype=object).fillna('').astype(str).str.encode('utf-8', errors='replace')
+    return np.array(encoded.tolist(), dtype=dtype)
+
+
+def _fit_text(values: np.ndarray, dtype: str, name: str) -> np.ndarray:
+    """Fit fixed-width bytes to the on-disk width, logging values that get cut short"""
+    width = np.dtype(dtype).itemsize
+    if values.dtype.itemsize > width:
+        too_long = int(np.count_nonzero(np.char.str_len(values) > width))
+        if too_long:
+            logger.warning(f"Truncating {too_long} '{name}' values longer than {width} bytes")
+    return values.astype(dtype)
+
+
+def _decode_text(values: np.ndarray) -> np.ndarray:
+    return np.char.decode(values, 'utf-8', errors='ignore').astype(object)
+
+
+class SnapshotStore:
+    """Pair snapshots stored one file per column, plus a timestamp index
+
+    ``append`` adds a cycle's PairStore or prepared DataFrame. Reads go through memory maps,
+    so range scans and per-token queries only page in the rows they touch.
+    """
+
+    def __init__(self, root: str = SETTINGS.snapshot_dir):
+        self.root = root
+        self._columns_dir = os.path.join(root, 'columns')
+        self._index_path = os.path.join(root, 'index.bin')
+        os.makedirs(self._columns_dir, exist_ok=True)
+        self._write_schema()
+        # Only this store appends, so the index is read once and kept in step in memory
+        self._index = self._read_index()
+        self._repair()
+
+    def _write_schema(self):
+        schema_path = os.path.join(self.root, 'schema.json')
+        if os.path.exists(schema_path):
+            with open(schema_path) as f:
+                stored = json.load(f)
+            if stored != SNAPSHOT_SCHEMA:
+                raise ValueError(f"Snapshot store at {self.root} has an incompatible schema")
+        else:
+            with open(schema_path, 'w') as f:
+                json.dump(SNAPSHOT_SCHEMA, f, indent=2)
+
+    def _column_path(self, name: str) -> str:
+        return os.path.join(self._columns_dir, f'{name}.bin')
+
+    def _repair(self):
+        """Truncate column files past the last indexed row (left by an interrupted append)"""
+        total = self.total_rows
+        for name, dtype in SNAPSHOT_SCHEMA.items():
+            path = self._column_path(name)
+            expected = total * np.dtype(dtype).itemsize
+            if os.path.exists(path) and os.path.getsize(path) > expected:
+                logger.warning(f"Truncating partially written snapshot column '{name}'")
+                with open(path, 'r+b') as f:
+                    f.truncate(expected)
+
+    def _read_index(self) -> np.ndarray:
+        if not os.path.exists(self._index_path) or not os.path.getsize(self._index_path):
+            return np.empty(0, dtype=INDEX_DTYPE)
+        return np.fromfile(self._index_path, dtype=INDEX_DTYPE)
+
+    @property
+    def index(self) -> np.ndarray:
+        """Snapshot index records (timestamp_ms, start, count), oldest first"""
+        return self._index
+
+    @property
+    def total_rows(self) -> int:
+        index = self.index
+        return int(index['start'][-1] + index['count'][-1]) if len(index) else 0
+
+    def append(self, frame, timestamp_ms: Optional[int] = None) -> int:
+        """Append one cycle's pairs (a PairStore or prepared DataFrame); returns the snapshot timestamp"""
+        timestamp_ms = int(time.time() * 1000) if timestamp_ms is None else int(timestamp_ms)
+        if len(self._index) and timestamp_ms < self._index['timestamp_ms'][-1]:
+            raise ValueError("Snapshots must be appended in timestamp order")
+
+        start = self.total_rows
+        for name, dtype in SNAPSHOT_SCHEMA.items():
+            if isinstance(frame, PairStore) and name in BYTES_FIELDS:
+                # Already fixed-width bytes; just fit them to the on-disk width
+                column = _fit_text(frame.raw(name), dtype, name)
+            else:
+                if name in frame:
+                    values = np.asarray(frame[name])
+                else:
+                    values = np.zeros(len(frame), dtype=dtype) if dtype[0] != 'f' else np.full(len(frame), np.nan)
+                if dtype.startswith('S'):
+                    column = _fit_text(_encode_text(values, 'S'), dtype, name)
+                else:
+                    column = np.asarray(values, dtype=dtype)
+            with open(self._column_path(name), 'ab') as f:
+                # Drop rows a failed append left behind, so every column starts at the indexed end
+                f.truncate(start * np.dtype(dtype).itemsize)
+                f.write(column.tobytes())
+
+        # The index is written last, so a crash mid-append leaves the snapshot invisible
+        record = np.array([(timestamp_ms, start, len(frame))], dtype=INDEX_DTYPE)
+        with open(self._index_path, 'ab') as f:
+            f.write(record.tobytes())
+        self._index = np.concatenate([self._index, record])
+        return timestamp_ms
+
+    def column(self, name: str) -> np.ndarray:
+        """Read-only memory map over every stored row of one column"""
+        dtype = np.dtype(SNAPSHOT_SCHEMA[name])
+        total = self.total_rows
+        if not total:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self._column_path(name), dtype=dtype, mode='r', shape=(total,))
+
+    def _row_range(self, start_ms: Optional[int], end_ms: Optional[int]) -> Tuple[np.ndarray, int, int]:
+        """Index records within [start_ms, end_ms] and the row span they cover"""
+        index = self.index
+        timestamps = index['timestamp_ms']
+        lo = 0 if start_ms is None else int(np.searchsorted(timestamps, start_ms, side='left'))
+        hi = len(index) if end_ms is None else int(np.searchsorted(timestamps, end_ms, side='right'))
+        selected = index[lo:hi]
+        if not len(selected):
+            return selected, 0, 0
+        return selected, int(selected['start'][0]), int(selected['start'][-1] + selected['count'][-1])
+
+    def _frame(self, rows, snapshot_ms: np.ndarray, columns: Optional[List[str]]) -> pd.DataFrame:
+        data = {'snapshot_ms': snapshot_ms}
+        for name in columns or list(SNAPSHOT_SCHEMA):
+            values = self.column(name)[rows]
+            data[name] = _decode_text(values) if SNAPSHOT_SCHEMA[name].startswith('S') else np.array(values)
+        return pd.DataFrame(data)
+
+    def load_range(self, start_ms: Optional[int] = None, end_ms: Optional[int] = None,
+                   columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Every stored pair row from snapshots taken within [start_ms, end_ms]"""
+        selected, first, last = self._row_range(start_ms, end_ms)
+        snapshot_ms = np.repeat(selected['timestamp_ms'], selected['count'])
+        return self._frame(slice(first, last), snapshot_ms, columns)
+
+    def token_history(self, token_address: str, chain_id: Optional[str] = None,
+                      start_ms: Optional[int] = None, end_ms: Optional[int] = None,
+                      columns: Optional[List[str]] = None, chunk_rows: int = 1 << 20) -> pd.DataFrame:
+        """Rows of one base token across snapshots, scanning the address column in chunks"""
+        selected, first, last = self._row_range(start_ms, end_ms)
+        address = _encode_text([token_address], SNAPSHOT_SCHEMA['base_token_address'])[0]
+        chain = _encode_text([chain_id], SNAPSHOT_SCHEMA['chain_id'])[0] if chain_id else None
+        addresses = self.column('base_token_address')
+        chains = self.column('chain_id')
+
+        matches = []
+        for offset in range(first, last, chunk_rows):
+            stop = min(offset + chunk_rows, last)
+            hit = addresses[offset:stop] == address
+            if chain is not None:
+                hit &= chains[offset:stop] == chain
+            matches.append(np.flatnonzero(hit) + offset)
+        rows = np.concatenate(matches) if matches else np.empty(0, dtype=np.int64)
+
+        # Map each matching row back to the snapshot it belongs to
+        snapshot = np.searchsorted(selected['start'], rows, side='right') - 1
+        return self._frame(rows, selected['timestamp_ms'][snapshot], columns)
+
+    def iter_snapshots(self, start_ms: Optional[int] = None, end_ms: Optional[int] = None,
+                       columns: Optional[List[str]] = None) -> Iterator[Tuple[int, Dict[str, np.ndarray]]]:
+        """Yield ``(timestamp_ms, columns)`` per snapshot as zero-copy memory-mapped slices"""
+        selected, _, _ = self._row_range(start_ms, end_ms)
+        maps = {name: self.column(name) for name in columns or list(SNAPSHOT_SCHEMA)}
+        for timestamp_ms, start, count in selected.tolist():
+            yield timestamp_ms, {name: values[start:start + count] for name, values in maps.items()}
+
+    def count_signals(self, pump_threshold: float = PUMP_THRESHOLD, dump_threshold: float = DUMP_THRESHOLD,
+                      min_volume: float = MIN_VOLUME_THRESHOLD,
+                      start_ms: Optional[int] = None, end_ms: Optional[int] = None) -> pd.DataFrame:
+        """Pump/dump signal counts per snapshot for the given thresholds, for backtesting
+
+        Evaluated as one vectorized pass over the memory-mapped range.
+        """
+        selected, first, last = self._row_range(start_ms, end_ms)
+        if not len(selected):
+            return pd.DataFrame({'timestamp_ms': [], 'pump_signals': [], 'dump_warnings': []})
+
+        price_change = self.column('price_change_h24')[first:last]
+        volume = self.column('volume_h24')[first:last]
+        txns = self.column('txns_h24')[first:last]
+        liquid = volume > min_volume
+        pumps = liquid & (price_change > pump_threshold) & (txns > 100)
+        dumps = liquid & (price_change < dump_threshold) & (txns > 50)
+
+        # Per-snapshot counts from prefix sums, so empty snapshots need no special case
+        starts = selected['start'] - first
+        ends = starts + selected['count']
+        pump_totals = np.concatenate([[0], np.cumsum(pumps)])
+        dump_totals = np.concatenate([[0], np.cumsum(dumps)])
+        return pd.DataFrame({
+            'timestamp_ms': selected['timestamp_ms'],
+            'pump_signals': pump_totals[ends] - pump_totals[starts],
+            'dump_warnings': dump_totals[ends] - dump_totals[starts],
+        })
@@ -4,18 +4,36 @@ Telegram Bot for sending analytics and alerts
 
 import asyncio 
 import logging
-from telegram import Bot, Update
+from telegram import Update
 from telegram.ext import Application, CommandHandler, ContextTypes
-from typing import Dict, List
+from telegram.helpers import escape_markdown
+from typing import Dict, List, Optional
 from config import *
+from src.alerts import ALERT_METRICS, AlertEngine, Subscription
+from src.report_snapshot import ReportSnapshot
+from src.telegram_sender import TelegramSender
+from src.utils import format_number
+
+# Leaderboards shown in analysis messages: (leaderboard, title, value formatter)
+LEADERBOARD_FORMATS = [
+    ('volume', 'Volume (24h)', lambda value: f"${format_number(value)}"),
+    ('holders', 'Holders', lambda value: f"{value:,.0f}"),
+    ('gainers', 'Gainers (24h)', lambda value: f"+{value:.1f}%"),
+    ('losers', 'Losers (24h)', lambda value: f"{value:.1f}%"),
+]
 
 logger = logging.getLogger(__name__)
 
 class TelegramBot:
-    def __init__(self, bot_token: str, chat_id: str):
+    def __init__(self, bot_token: str, chat_id: str, alert_engine: Optional[AlertEngine] = None):
         self.bot_token = bot_token
         self.chat_id = chat_id
+        self.alert_engine = alert_engine
         self.application = None
+        self.sender = TelegramSender(bot_token)
+        self.reports = ReportSnapshot()
+        self.reports.register('analyze', self._format_analysis_message)
+        self.reports.register('stats', self._format_stats_message)
         
     async def initialize(self):
         """Initialize the Telegram bot application"""
@@ -25,6 +43,7 @@ class TelegramBot:
         self.application.add_handler(CommandHandler("start", self.start_command))
         self.application.add_handler(CommandHandler("analyze", self.analyze_command))
         self.application.add_handler(CommandHandler("stats", self.stats_command))
+        self.application.add_handler(CommandHandler("alert", self.alert_command))
         
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /start command"""
@@ -34,7 +53,9 @@ class TelegramBot:
 *Available Commands:*
 /analyze - Get latest token analysis
 /stats - Get current market statistics
-/alert <token> - Set up alerts for specific token
+/alert <token> <chain> <price|volume|liquidity> <above|below> <value> - Set up alerts for specific token
+/alert list - Show your alerts
+/alert remove <id> - Delete an alert
 
 *Features:*
 • New token discovery (24h)
@@ -45,35 +66,78 @@ class TelegramBot:
         await update.message.reply_text(welcome_message, parse_mode='Markdown')
         
     async def analyze_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle /analyze command"""
-        await update.message.reply_text("🔍 Analyzing recent tokens...")
-        # Analysis logic would be integrated here
+        """Handle /analyze command from the latest published report"""
+        await self._reply_from_snapshot(update, 'analyze')
         
     async def stats_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Handle /stats command"""
-        stats_message = """
-📊 *Current Market Stats*
-
-• New tokens (24h): 247
-• Total volume: $145M
-• Active pairs: 12,843
-• Pump signals: 3
-• Dump warnings: 7
-        """
-        await update.message.reply_text(stats_message, parse_mode='Markdown')
+        """Handle /stats command from the latest published report"""
+        await self._reply_from_snapshot(update, 'stats')
+        
+    async def _reply_from_snapshot(self, update: Update, name: str):
+        """Reply with pre-rendered text; commands never fetch or analyze themselves"""
+        message = self.reports.rendered(name)
+        if message is None:
+            await update.message.reply_text("⏳ No analysis available yet - the first cycle is still running.")
+            return
+        await update.message.reply_text(message, parse_mode='Markdown')
+        
+    async def alert_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /alert command: add, list or remove token alerts for this chat"""
+        args = context.args or []
+        chat_id = str(update.effective_chat.id)
+        if self.alert_engine is None:
+            await update.message.reply_text("Alerts are not enabled on this bot.")
+            return
+        
+        if args[:1] == ['list']:
+            subscriptions = self.alert_engine.for_chat(chat_id)
+            lines = [subscription.describe() for subscription in subscriptions]
+            await update.message.reply_text("\n".join(lines) if lines else "You have no alerts.")
+        elif args[:1] == ['remove'] and len(args) == 2 and args[1].lstrip('#').isdigit():
+            removed = self.alert_engine.remove(int(args[1].lstrip('#')), chat_id)
+            await update.message.reply_text("Alert removed." if removed else "No such alert.")
+        elif len(args) == 5:
+            token, chain, metric, direction, threshold = args
+            try:
+                subscription = self.alert_engine.add(chat_id, token, chain, metric.lower(), direction.lower(),
+                                                     float(threshold.replace(',', '').lstrip('$')))
+            except ValueError as e:
+                await update.message.reply_text(f"❌ {str(e)}")
+                return
+            await update.message.reply_text(f"🔔 Alert set: {subscription.describe()}")
+        else:
+            await update.message.reply_text(
+                "Usage: /alert <token> <chain> <" + "|".join(ALERT_METRICS) + "> <above|below> <value>\n"
+                "       /alert list\n"
+                "       /alert remove <id>"
+            )
+        
+    async def send_alert(self, subscription: Subscription, values: Dict):
+        """Queue a triggered alert for the subscribing chat"""
+        self.sender.enqueue(self._format_alert_message(subscription, values), subscription.chat_id)
+        
+    def publish_report(self, report: Dict):
+        """Serve ``report`` to /analyze and /stats until the next cycle publishes"""
+        self.reports.publish(report)
         
     async def send_message(self, message: str, parse_mode: str = 'Markdown'):
-        """Send message to configured chat"""
-        try:
-            bot = Bot(token=self.bot_token)
-            await bot.send_message(chat_id=self.chat_id, text=message, parse_mode=parse_mode)
-            logger.info("Message sent to Telegram")
-        except Exception as e:
-            logger.error(f"Failed to send Telegram message: {str(e)}")
+        """Queue message for the configured chat; delivery happens in the background"""
+        self.sender.enqueue(message, self.chat_id, parse_mode)
+        
+    async def close(self):
+        """Deliver queued messages and shut down the sender"""
+        await self.sender.close()
             
     async def send_analysis_report(self, report: Dict):
-        """Send comprehensive analysis report"""
-        message = self._format_analysis_message(report)
+        """Send comprehensive analysis report
+        
+        The published report's text is taken from the snapshot, which has
+        already rendered it for /analyze, instead of being formatted again.
+        """
+        if report is self.reports.report:
+            message = self.reports.rendered('analyze')
+        else:
+            message = self._format_analysis_message(report)
         await self.send_message(message)
         
     def _format_analysis_message(self, report: Dict) -> str:
@@ -85,13 +149,13 @@ class TelegramBot:
 📈 *Active Pairs Analyzed:* {report.get('total_pairs', 0)}
 
 🏆 *Top Performers:*
-• Highest Volume: ${report.get('highest_volume', {}).get('volume', 0):,.0f} ({report.get('highest_volume', {}).get('symbol', 'N/A')})
-• Most Holders: {report.get('most_holders', {}).get('holders', 0):,} ({report.get('most_holders', {}).get('symbol', 'N/A')})
+{self._format_leaderboards(report)}
 
 📊 *Market Signals:*
 🚀 Pump Signals: {report.get('pump_signals', 0)}
 ⚠️  Dump Warnings: {report.get('dump_warnings', 0)}
 📈 Holder Growth: {report.get('growing_holders', 0)}
+{self._format_window_signals(report.get('indicators', {}))}
 
 🔗 *Chain Distribution:*
 {self._format_chain_distribution(report.get('chain_distribution', {}))}
@@ -99,6 +163,55 @@ class TelegramBot:
 *Last Updated:* {report.get('timestamp', 'N/A')}
         """
         
+    def _format_stats_message(self, report: Dict) -> str:
+        """Format headline market statistics into Telegram message"""
+        return f"""
+📊 *Current Market Stats*
+
+• New tokens (24h): {report.get('new_tokens_count', 0):,}
+• Total volume: ${format_number(report.get('total_volume', 0))}
+• Active pairs: {report.get('total_pairs', 0):,}
+• Pump signals: {report.get('pump_signals', 0)}
+• Dump warnings: {report.get('dump_warnings', 0)}
+
+*Last Updated:* {report.get('timestamp', 'N/A')}
+        """
+        
+    def _format_alert_message(self, subscription: Subscription, values: Dict) -> str:
+        """Format a triggered alert into Telegram message, escaping the user-supplied names for Markdown"""
+        value = values[subscription.metric]
+        shown = f"${value:,.6g}" if subscription.metric == 'price' else f"${format_number(value)}"
+        token = escape_markdown(str(values.get('symbol') or subscription.token_address))
+        return (f"🔔 *{token}* ({escape_markdown(subscription.chain_id)}) "
+                f"{subscription.metric} is {subscription.direction} {subscription.threshold:g}: {shown}")
+        
+    def _format_leaderboards(self, report: Dict) -> str:
+        """Format the top-N leaderboards, or the single best pairs when there are none
+        
+        Symbols and chains come from the API, so they are escaped for Markdown.
+        """
+        leaderboards = report.get('leaderboards')
+        if not leaderboards:
+            return (f"• Highest Volume: ${report.get('highest_volume', {}).get('volume', 0):,.0f} "
+                    f"({escape_markdown(str(report.get('highest_volume', {}).get('symbol', 'N/A')))})\n"
+                    f"• Most Holders: {report.get('most_holders', {}).get('holders', 0):,} "
+                    f"({escape_markdown(str(report.get('most_holders', {}).get('symbol', 'N/A')))})")
+        sections = []
+        for metric, title, shown in LEADERBOARD_FORMATS:
+            entries = leaderboards.get(metric, [])[:LEADERBOARD_SHOWN]
+            if entries:
+                lines = [f"{i}. {escape_markdown(entry['symbol'] or 'N/A')} ({escape_markdown(str(entry['chain']))}): "
+                         f"{shown(entry['value'])}"
+                         for i, entry in enumerate(entries, 1)]
+                sections.append(f"_{title}_\n" + "\n".join(lines))
+        return "\n".join(sections) or "• No pairs above the volume threshold"
+        
+    def _format_window_signals(self, indicators: Dict) -> str:
+        """Format pump/dump counts per rolling window, for windows with history"""
+        parts = [f"{window} ↑{counts['pumping']} ↓{counts['dumping']}"
+                 for window, counts in indicators.items() if counts.get('pairs_with_history')]
+        return f"⏱ By Window: {' | '.join(parts)}" if parts else ""
+        
     def _format_chain_distribution(self, chain_data: Dict) -> str:
         """Format chain distribution data"""
         return "\n".join([f"• {chain}: {count}" for chain, count in chain_data.items()])
@@ -110,3 +223,19 @@ class TelegramBot:
             
         logger.info("Starting Telegram bot polling...")
         await self.application.run_polling()
+        
+    async def start_serving(self):
+        """Poll for commands in the background of an already running event loop"""
+        if not self.application:
+            await self.initialize()
+        await self.application.initialize()
+        await self.application.start()
+        await self.application.updater.start_polling()
+        logger.info("Serving Telegram commands")
+        
+    async def stop_serving(self):
+        """Stop background command polling"""
+        if self.application and self.application.running:
+            await self.application.updater.stop()
+            await self.application.stop()
+            await self.application.shutdown()
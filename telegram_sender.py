@@ -0,0 +1,249 @@
+"""
+Long-lived Telegram sender draining a rate-limited, coalescing outbound queue
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import timedelta
+from typing import Deque, Dict, List, Optional, Tuple
+from telegram import Bot
+from telegram.error import BadRequest, NetworkError, RetryAfter
+from config import *
+from src.metrics import REGISTRY
+from src.rate_limiter import AdaptiveRateLimiter
+
+logger = logging.getLogger(__name__)
+
+SEND_SECONDS = REGISTRY.histogram('telegram_send_seconds', 'Telegram send_message latency by outcome', ('outcome',))
+
+
+class OutboundMessage:
+    """One queued message for a chat"""
+
+    __slots__ = ('chat_id', 'text', 'parse_mode')
+
+    def __init__(self, chat_id: str, text: str, parse_mode: Optional[str] = 'Markdown'):
+        self.chat_id = chat_id
+        self.text = text
+        self.parse_mode = parse_mode
+
+
+def _retry_seconds(retry_after) -> float:
+    """``RetryAfter.retry_after`` as seconds (int or timedelta depending on the library version)"""
+    if isinstance(retry_after, timedelta):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
+
+class TelegramSender:
+    """Delivers messages through one Bot from a background worker
+
+    ``enqueue`` never waits on the network. The worker gathers messages that
+    arrive within ``coalesce_window`` seconds of each other, merges those for
+    the same chat into as few messages as Telegram's length limit allows, and
+    sends them under a global rate limit and a per-chat minimum interval.
+    Each chat's messages go out in order, but the next message sent is always
+    the one whose chat is ready first, so one chat's interval or backoff does
+    not hold up the others. Flood-control (429) responses pause the limiter
+    for ``retry_after`` and the message is retried; network errors are
+    retried with backoff. Markup Telegram cannot parse is resent as plain
+    text, so one bad piece does not lose everything coalesced with it.
+    """
+
+    def __init__(self, bot_token: str, bot: Optional[Bot] = None,
+                 global_rate: float = TELEGRAM_GLOBAL_RATE,
+                 chat_interval: float = TELEGRAM_CHAT_INTERVAL,
+                 coalesce_window: float = TELEGRAM_COALESCE_WINDOW,
+                 max_queue: int = TELEGRAM_QUEUE_SIZE):
+        self.bot_token = bot_token
+        self.chat_interval = chat_interval
+        self.coalesce_window = coalesce_window
+        self.max_queue = max_queue
+        self.limiter = AdaptiveRateLimiter(rate=global_rate, burst=max(1, int(global_rate)), min_rate=1.0,
+                                           max_concurrency=1, min_concurrency=1)
+
+        self.sent_count = 0
+        self.coalesced_count = 0
+        self.retry_count = 0
+        self.dropped_count = 0
+
+        self._bot = bot
+        self._bot_ready = bot is not None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._next_send: Dict[str, float] = {}
+
+    def enqueue(self, text: str, chat_id: str, parse_mode: Optional[str] = 'Markdown') -> bool:
+        """Queue a message for delivery; returns False if the queue is full and it was dropped"""
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+        try:
+            self._queue.put_nowait(OutboundMessage(chat_id, text, parse_mode))
+        except asyncio.QueueFull:
+            self.dropped_count += 1
+            logger.warning("Telegram outbound queue is full, dropping message")
+            return False
+        return True
+
+    async def flush(self, timeout: float = TELEGRAM_FLUSH_TIMEOUT):
+        """Wait until every queued message has been delivered or given up on"""
+        if self._queue is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"{self._queue.qsize()} Telegram messages still queued after {timeout}s")
+
+    async def close(self, timeout: float = TELEGRAM_FLUSH_TIMEOUT):
+        """Flush the queue, stop the worker and release the Bot's HTTP client"""
+        await self.flush(timeout)
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._bot is not None and self._bot_ready:
+            await self._bot.shutdown()
+            self._bot_ready = False
+
+    async def _get_bot(self) -> Bot:
+        if self._bot is None:
+            self._bot = Bot(token=self.bot_token)
+        if not self._bot_ready:
+            await self._bot.initialize()
+            self._bot_ready = True
+        return self._bot
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            # Gather whatever else arrives within the coalescing window
+            deadline = loop.time() + self.coalesce_window
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._deliver_all(self._coalesce(batch))
+            except Exception as e:
+                logger.error(f"Telegram sender error: {str(e)}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _coalesce(self, batch: List[OutboundMessage]) -> List[OutboundMessage]:
+        """Merge messages per (chat, parse mode), in arrival order, up to the length limit"""
+        groups: Dict[Tuple[str, Optional[str]], List[OutboundMessage]] = {}
+        for message in batch:
+            groups.setdefault((message.chat_id, message.parse_mode), []).append(message)
+
+        merged = []
+        for (chat_id, parse_mode), messages in groups.items():
+            current = None
+            for message in messages:
+                text = message.text.strip()
+                if current is not None and len(current.text) + 2 + len(text) <= TELEGRAM_MAX_MESSAGE_LENGTH:
+                    current.text += '\n\n' + text
+                    self.coalesced_count += 1
+                else:
+                    current = OutboundMessage(chat_id, text, parse_mode)
+                    merged.append(current)
+        return merged
+
+    async def _wait_for_chat(self, chat_id: str):
+        delay = self._next_send.get(chat_id, 0.0) - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _deliver_all(self, messages: List[OutboundMessage]):
+        """Send every message, each chat in order, always picking the chat ready soonest"""
+        chats: Dict[str, Deque[OutboundMessage]] = {}
+        for message in messages:
+            chats.setdefault(message.chat_id, deque()).append(message)
+        attempts: Dict[str, int] = {}
+        while chats:
+            # Ties go to the chat queued first, keeping arrival order when nothing is waiting
+            chat_id = min(chats, key=lambda chat: self._next_send.get(chat, 0.0))
+            await self._wait_for_chat(chat_id)
+            attempt = attempts.get(chat_id, 0)
+            sent = await self._attempt(chats[chat_id][0], attempt)
+            if sent is None:
+                if attempt < MAX_RETRIES - 1:
+                    attempts[chat_id] = attempt + 1
+                    continue
+                self.dropped_count += 1
+                logger.error(f"Giving up on Telegram message after {MAX_RETRIES} attempts")
+            attempts.pop(chat_id, None)
+            chats[chat_id].popleft()
+            if not chats[chat_id]:
+                del chats[chat_id]
+
+    async def _attempt(self, message: OutboundMessage, attempt: int) -> Optional[bool]:
+        """Try to send once: True if sent, False if given up on, None to retry
+
+        A network error delays the chat's next attempt instead of sleeping,
+        so other chats keep sending meanwhile.
+        """
+        started = time.perf_counter()
+        try:
+            async with self.limiter:
+                bot = await self._get_bot()
+                # Latency of the API call itself, not the wait for the limiter
+                started = time.perf_counter()
+                await bot.send_message(chat_id=message.chat_id, text=message.text,
+                                       parse_mode=message.parse_mode)
+        except RetryAfter as e:
+            SEND_SECONDS.observe(time.perf_counter() - started, outcome='throttled')
+            self.retry_count += 1
+            self.limiter.on_throttle(_retry_seconds(e.retry_after))
+            return None
+        except BadRequest as e:
+            SEND_SECONDS.observe(time.perf_counter() - started, outcome='error')
+            if message.parse_mode and 'parse entities' in str(e).lower():
+                self.retry_count += 1
+                logger.warning(f"Telegram rejected the message markup ({str(e)}), resending as plain text")
+                message.parse_mode = None
+                return None
+            self.dropped_count += 1
+            logger.error(f"Failed to send Telegram message: {str(e)}")
+            return False
+        except NetworkError as e:
+            SEND_SECONDS.observe(time.perf_counter() - started, outcome='network_error')
+            self.retry_count += 1
+            logger.warning(f"Telegram send failed ({str(e)}), retrying")
+            self._next_send[message.chat_id] = time.monotonic() + RETRY_DELAY * (attempt + 1)
+            return None
+        except Exception as e:
+            SEND_SECONDS.observe(time.perf_counter() - started, outcome='error')
+            self.dropped_count += 1
+            logger.error(f"Failed to send Telegram message: {str(e)}")
+            return False
+
+        SEND_SECONDS.observe(time.perf_counter() - started, outcome='sent')
+        self.limiter.on_success()
+        self.sent_count += 1
+        self._next_send[message.chat_id] = time.monotonic() + self.chat_interval
+        logger.info("Message sent to Telegram")
+        return True
+
+    def stats(self) -> Dict:
+        """Delivery counters and queue depth"""
+        return {
+            'queued': self._queue.qsize() if self._queue is not None else 0,
+            'sent': self.sent_count,
+            'coalesced': self.coalesced_count,
+            'retries': self.retry_count,
+            'dropped': self.dropped_count,
+            'limiter': self.limiter.stats(),
+        }
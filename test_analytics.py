@@ -2,7 +2,9 @@
 Tests for analytics engine
 """
 
+import os
 import pytest
+import numpy as np
 import pandas as pd
 from src.analytics import TokenAnalytics
 
@@ -41,3 +43,373 @@ def test_prepare_dataframe():
     assert len(df) == 1
     assert df.iloc[0]['base_token_symbol'] == 'TEST'
     assert df.iloc[0]['volume_h24'] == 100000.0
+
+def test_prepare_dataframe_drops_malformed_pairs():
+    """Pairs with unparseable numeric fields are dropped, column by column"""
+    analytics = TokenAnalytics()
+    good = {'pairAddress': '0x1', 'priceUsd': '2', 'volume': {'h24': 5}, 'holders': 10}
+    sample_data = [
+        good,
+        {'pairAddress': '0x2', 'priceUsd': 'n/a'},
+        {'pairAddress': '0x3', 'volume': None},
+        {'pairAddress': '0x4', 'txns': {'h24': {'buys': None}}},
+    ]
+
+    df = analytics._prepare_dataframe(sample_data)
+    assert list(df['pair_address']) == ['0x1']
+    assert df.iloc[0]['price_usd'] == 2.0
+    assert df.iloc[0]['txns_h24'] == 0
+
+def test_aggregates_merge_matches_single_pass():
+    """Aggregates over two halves merge into the aggregate over the whole"""
+    from src.aggregates import PairAggregates
+    columns = {
+        'volume_h24': np.array([20000.0, 50000.0, 5000.0, 90000.0]),
+        'price_change_h24': np.array([30.0, -20.0, 5.0, 12.0]),
+        'holders': np.array([150, 0, 40, 900]),
+        'txns_h24': np.array([200, 80, 10, 300]),
+        'price_usd': np.array([1.0, 2.0, 3.0, 4.0]),
+        'base_token_symbol': np.array(['A', 'B', 'C', 'D'], dtype=object),
+        'chain_id': np.array(['ethereum', 'bsc', 'bsc', 'ethereum'], dtype=object),
+    }
+    first = {name: values[:2] for name, values in columns.items()}
+    second = {name: values[2:] for name, values in columns.items()}
+
+    whole = PairAggregates.from_columns(columns, 10000).to_analysis()
+    merged = PairAggregates.from_columns(first, 10000).merge(
+        PairAggregates.from_columns(second, 10000)).to_analysis()
+
+    assert merged == whole
+    assert whole['highest_volume']['symbol'] == 'D'
+    assert whole['chain_distribution'] == {'ethereum': 2, 'bsc': 1}
+
+def test_new_tokens_accept_iso_and_epoch_ms():
+    """pairCreatedAt is parsed from ISO strings and epoch milliseconds alike"""
+    from datetime import datetime, timedelta, timezone
+    analytics = TokenAnalytics()
+    now = datetime.now(timezone.utc)
+    sample_data = [
+        {'pairAddress': '0x1', 'pairCreatedAt': (now - timedelta(hours=1)).isoformat().replace('+00:00', 'Z')},
+        {'pairAddress': '0x2', 'pairCreatedAt': int((now - timedelta(hours=2)).timestamp() * 1000)},
+        {'pairAddress': '0x3', 'pairCreatedAt': int((now - timedelta(days=3)).timestamp() * 1000)},
+        {'pairAddress': '0x4', 'pairCreatedAt': 'not a date'},
+        {'pairAddress': '0x5'},
+    ]
+
+    result = analytics.comprehensive_analysis(sample_data, min_volume=0)
+    assert result['new_tokens_count'] == 2
+
+    df = analytics._prepare_dataframe(sample_data)
+    assert list(analytics.filter_created_within(df, hours=72)['pair_address']) == ['0x1', '0x2']
+
+def test_holder_growth_uses_previous_cycle():
+    """Holder deltas come from the stored state of the previous cycle"""
+    analytics = TokenAnalytics()
+    pair = {'chainId': 'bsc', 'pairAddress': '0x1', 'volume': {'h24': 20000}, 'holders': 100}
+
+    first = analytics.comprehensive_analysis([pair], min_volume=0)
+    second = analytics.comprehensive_analysis([dict(pair, holders=130)], min_volume=0)
+
+    assert first['growing_holders'] == 0
+    assert second['growing_holders'] == 1
+    assert second['holder_growth']['average_holder_change'] == 30
+    assert [entry['changed_pairs'] for entry in analytics.metrics_history] == [0, 1]
+    assert analytics.pair_state.get('bsc', '0x1')['holders'] == 130
+
+def test_pair_state_evicts_once_per_cycle():
+    """Stale pairs stay tracked through a cycle's batches and are evicted when the cycle finishes"""
+    from src.pair_store import PairStore
+    analytics = TokenAnalytics()
+    analytics.pair_state.ttl = 0
+    pairs = [{'chainId': 'bsc', 'pairAddress': f'0x{i}', 'volume': {'h24': 20000}, 'holders': i} for i in range(3)]
+
+    analytics.comprehensive_analysis(pairs, min_volume=0)
+    assert len(analytics.pair_state) == 3
+    analytics.pair_state.update(PairStore.from_pairs(pairs[:1]), now_ms=2**42)
+    assert len(analytics.pair_state) == 3
+    analytics.pair_state.evict(2**42)
+    assert len(analytics.pair_state) == 1 and ('bsc', '0x0') in analytics.pair_state
+
+def test_fingerprints_skip_unchanged_pairs():
+    """Only pairs whose fingerprinted fields moved count as changed, whichever field it was"""
+    from src.pair_store import PairStore
+    analytics = TokenAnalytics()
+    pairs = [
+        {'chainId': 'bsc', 'pairAddress': f'0x{i}', 'priceUsd': '1.5', 'fdv': 1000 * i,
+         'priceChange': {'h24': 0.0}, 'volume': {'h24': 20000}}
+        for i in range(4)
+    ]
+    
+    analytics.comprehensive_analysis(pairs, min_volume=0)
+    # fdv is not a tracked value but is part of the fingerprint; -0.0 and 0.0 fingerprint the same
+    second = [dict(pairs[0], fdv=5), dict(pairs[1], priceChange={'h24': -0.0}), pairs[2], pairs[3]]
+    analytics.comprehensive_analysis(second, min_volume=0)
+    
+    assert [entry['changed_pairs'] for entry in analytics.metrics_history] == [0, 1]
+    assert list(analytics.last_pairs['modified']) == [True, False, False, False]
+    store = PairStore.from_pairs(second)
+    assert store['fingerprint'].dtype == np.uint64
+    assert len(set(store['fingerprint'].tolist())) == 4
+
+def test_batched_analysis_matches_single_pass():
+    """Analyzing pairs in batches gives the same report as analyzing them at once"""
+    pairs = [
+        {'chainId': chain, 'pairAddress': f'0x{i}', 'baseToken': {'symbol': f'T{i}'},
+         'volume': {'h24': 10000 * (i + 1)}, 'priceChange': {'h24': i * 7 - 20}, 'holders': 50 * i,
+         'txns': {'h24': {'buys': 60 * i, 'sells': 10}}}
+        for i, chain in enumerate(['ethereum', 'bsc', 'bsc', 'solana', 'ethereum', 'bsc'])
+    ]
+    
+    whole = TokenAnalytics().comprehensive_analysis(pairs, min_volume=20000)
+    batched = TokenAnalytics().analyze_batches([pairs[:2], pairs[2:5], pairs[5:]], min_volume=20000)
+    whole.pop('timestamp')
+    batched.pop('timestamp')
+    
+    assert batched == whole
+
+def test_rolling_indicators_catch_fast_moves():
+    """Ring-buffered samples give per-window momentum before the 24h change moves"""
+    from src.indicators import IndicatorStore
+    store = IndicatorStore({'5m': 300, '1h': 3600}, [(0, 4), (1800, 3)], initial_capacity=2)
+    slots = np.array([0, 1, 2])
+    new = np.array([True, True, True])
+    minute = 60_000
+    
+    def columns(prices):
+        return {'price_usd': np.array(prices), 'volume_h24': np.array([1e5, 2e5, 3e5]), 'txns_h24': np.ones(3)}
+    
+    first = store.update(slots, new, columns([1.0, 1.0, 1.0]), minute)
+    assert np.isnan(first['momentum_5m']).all()
+    # The fine tier keeps 4 samples, so it covers 5 minutes but not an hour
+    for step in range(1, 13):
+        indicators = store.update(slots, ~new, columns([1.0 + 0.01 * step, 1.0, 2.0 if step == 12 else 1.0]),
+                                  minute + step * 5 * minute)
+    assert np.allclose(indicators['momentum_5m'], [1.12 / 1.11 - 1, 0, 1])
+    assert np.allclose(indicators['momentum_1h'], [1.12 / 1.0 - 1, 0, 1])  # from the 30 minute tier
+    assert indicators['volatility_1h'][0] > 0 and indicators['volatility_1h'][1] == 0
+    assert np.allclose(indicators['volume_acceleration_1h'], 0)
+    assert store.capacity == 4
+    
+    # A reallocated slot starts over without history
+    reused = store.update(slots[:1], new[:1],
+                          {'price_usd': np.array([5.0]), 'volume_h24': np.array([1.0]), 'txns_h24': np.ones(1)},
+                          minute * 100)
+    assert np.isnan(reused['momentum_5m']).all()
+
+def test_rolling_indicators_need_a_sample_near_the_window():
+    """Polled more slowly than a window, or back after a gap, a pair has no momentum for it"""
+    from src.indicators import IndicatorStore
+    store = IndicatorStore({'5m': 300, '1h': 3600}, [(0, 4)], initial_capacity=1)
+    hour = 3_600_000
+    
+    def update(price, now_ms):
+        return store.update(np.array([0]), np.array([now_ms == hour]),
+                            {'price_usd': np.array([price]), 'volume_h24': np.ones(1), 'txns_h24': np.ones(1)}, now_ms)
+    
+    update(1.0, hour)
+    hourly = update(2.0, 2 * hour)
+    assert np.isnan(hourly['momentum_5m'][0])  # an hour-old sample says nothing about 5 minutes
+    assert hourly['momentum_1h'][0] == pytest.approx(1.0)
+    after_gap = update(4.0, 26 * hour)
+    assert np.isnan(after_gap['momentum_1h'][0]) and np.isnan(after_gap['momentum_5m'][0])
+
+def test_leaderboards_follow_changes_across_cycles():
+    """Top-N boards, overall and per chain, update from changed pairs and drop pairs that disappear"""
+    from src.leaderboard import Leaderboards
+    analytics = TokenAnalytics()
+    analytics.leaderboards = Leaderboards(size=2, slack=2)
+    pairs = [
+        {'chainId': 'bsc' if i % 2 else 'ethereum', 'pairAddress': f'0x{i}', 'baseToken': {'symbol': f'T{i}'},
+         'volume': {'h24': 1000 * (i + 1)}, 'priceChange': {'h24': i - 4}, 'holders': 10 * i}
+        for i in range(8)
+    ]
+    
+    def top(report, metric, chain=None):
+        board = report['by_chain'][chain] if chain else report
+        return [entry['symbol'] for entry in board[metric]][:2]
+    
+    first = analytics.comprehensive_analysis(pairs, min_volume=2000)
+    assert top(first['leaderboards'], 'volume') == ['T7', 'T6']
+    assert top(first['leaderboards'], 'volume', 'ethereum') == ['T6', 'T4']
+    assert top(first['leaderboards'], 'gainers') == ['T7', 'T6']
+    assert top(first['leaderboards'], 'losers') == ['T1', 'T2']  # T0 is below min_volume
+    assert first['leaderboards']['losers'][0]['value'] == -3
+    
+    # T2 jumps to the top, T7 disappears and T6 drops below min_volume
+    second = analytics.comprehensive_analysis(
+        [dict(pair, volume={'h24': 50000}) if i == 2 else dict(pair, volume={'h24': 10}) if i == 6 else pair
+         for i, pair in enumerate(pairs[:7])], min_volume=2000)
+    assert top(second['leaderboards'], 'volume') == ['T2', 'T5']
+    assert top(second['leaderboards'], 'volume', 'ethereum') == ['T2', 'T4']
+    assert top(second['leaderboards'], 'holders', 'bsc') == ['T5', 'T3']
+    assert analytics.metrics_history[-1]['changed_pairs'] == 2
+    
+    # Pairs dropping off shrink the boards below their size, which rebuilds them from pair state
+    rebuilds = analytics.leaderboards.rebuild_count
+    third = analytics.comprehensive_analysis(pairs[:4], min_volume=2000)
+    assert top(third['leaderboards'], 'volume') == ['T3', 'T2']
+    assert analytics.leaderboards.rebuild_count > rebuilds
+
+def test_pair_store_round_trips_prepared_frame():
+    """The compact PairStore holds the same values as the prepared DataFrame"""
+    from src.pair_store import PairStore
+    analytics = TokenAnalytics()
+    sample_data = [
+        {'chainId': 'bsc', 'dexId': 'pancakeswap', 'pairAddress': '0xabc', 'priceUsd': '1.5',
+         'baseToken': {'symbol': 'AAA', 'address': '0x111'}, 'volume': {'h24': 5000}},
+        {'chainId': 'ethereum', 'pairAddress': '0xdef', 'baseToken': {'symbol': 'BBB'}, 'holders': 42},
+        {'chainId': 'bsc', 'pairAddress': '0x123', 'baseToken': {'symbol': 'AAA'}, 'priceUsd': 'n/a'},
+    ]
+    
+    store = PairStore.from_pairs(sample_data)
+    frame = analytics._prepare_dataframe(sample_data)
+    
+    assert len(store) == 2
+    assert store.codes('chain_id').dtype == np.int32
+    assert store.raw('pair_address').dtype.kind == 'S'
+    # Token symbols are unbounded, so they stay per batch rather than in the shared vocabulary
+    from src.pair_store import INTERNERS
+    assert store.raw('base_token_symbol').tolist() == [b'AAA', b'BBB'] and 'base_token_symbol' not in INTERNERS
+    assert store.category_counts('chain_id') == {'bsc': 1, 'ethereum': 1}
+    # The store keeps only the parsed creation time, not the raw pairCreatedAt value
+    frame = frame.drop(columns='pair_created_at')
+    pd.testing.assert_frame_equal(store.to_frame()[frame.columns], frame, check_dtype=False)
+
+def test_alerts_fire_on_changed_tokens_and_persist(tmp_path):
+    """Subscriptions fire once when a changed token crosses its threshold and survive a restart"""
+    from src.alerts import AlertEngine
+    path = str(tmp_path / 'alerts.jsonl')
+    engine = AlertEngine(path)
+    watched = engine.add('chat-1', '0xAbC', 'bsc', 'price', 'above', 2.0)
+    removed = engine.add('chat-2', '0xabc', 'bsc', 'volume', 'below', 1.0)
+    assert engine.remove(removed.sub_id, 'chat-2')
+    
+    analytics = TokenAnalytics(engine)
+    pair = {'chainId': 'bsc', 'pairAddress': '0x1', 'baseToken': {'address': '0xabc', 'symbol': 'ABC'},
+            'priceUsd': '1.5', 'volume': {'h24': 20000}}
+    other = {'chainId': 'bsc', 'pairAddress': '0x2', 'baseToken': {'address': '0xdef'}, 'priceUsd': '9'}
+    
+    analytics.comprehensive_analysis([pair, other], min_volume=0)
+    assert analytics.last_alerts == []
+    analytics.comprehensive_analysis([dict(pair, priceUsd='2.5'), other], min_volume=0)
+    assert [(sub.sub_id, values['price']) for sub, values in analytics.last_alerts] == [(watched.sub_id, 2.5)]
+    analytics.comprehensive_analysis([dict(pair, priceUsd='2.5'), other], min_volume=0)
+    assert analytics.last_alerts == []
+    
+    reloaded = AlertEngine(path)
+    assert [sub.describe() for sub in reloaded.for_token('0xABC', 'BSC')] == [watched.describe()]
+    assert reloaded.add('chat-1', '0x9', 'bsc', 'liquidity', 'below', 10).sub_id == 3
+
+@pytest.mark.asyncio
+async def test_process_pool_payloads_match_inline():
+    """Per-chain responses analyzed in worker processes merge to the inline result; malformed ones are skipped"""
+    import json
+    pairs = [
+        {'chainId': chain, 'pairAddress': f'0x{i}', 'baseToken': {'symbol': f'T{i}'}, 'dexId': f'dex{i % 3}',
+         'volume': {'h24': 10000 * (i + 1)}, 'priceChange': {'h24': i * 7 - 20}, 'holders': 50 * i,
+         'txns': {'h24': {'buys': 60 * i, 'sells': 10}}}
+        for i, chain in enumerate(['ethereum', 'bsc', 'bsc', 'solana', 'ethereum', 'bsc'])
+    ]
+    
+    async def stream(items):
+        for item in items:
+            yield item
+    
+    inline = TokenAnalytics()
+    pooled = TokenAnalytics(workers=2)
+    try:
+        for cycle in range(2):
+            current = [dict(pair, holders=pair['holders'] + cycle * i) for i, pair in enumerate(pairs)]
+            chains = {}
+            for pair in current:
+                chains.setdefault(pair['chainId'], []).append(pair)
+            payloads = [(chain, json.dumps({'pairs': group}).encode()) for chain, group in chains.items()]
+            payloads.insert(1, ('base', b'{"pairs": [{"chainId": "base"'))
+            
+            expected = await inline.analyze_stream(stream(list(chains.values())), min_volume=20000)
+            result = await pooled.analyze_payloads(stream(payloads), min_volume=20000)
+            expected.pop('timestamp')
+            result.pop('timestamp')
+            assert result == expected
+    finally:
+        pooled.close()
+
+def test_quantile_sketch_merges_within_relative_error():
+    """Sketches of shards merge into the sketch of everything, its quantiles within the relative accuracy"""
+    from src.sketch import QuantileSketch
+    rng = np.random.default_rng(7)
+    values = np.concatenate([rng.lognormal(5, 2, 5000), np.zeros(300), -rng.lognormal(1, 1, 700), [np.nan]])
+    rng.shuffle(values)
+    
+    whole = QuantileSketch(0.01)
+    whole.add(values)
+    merged = QuantileSketch(0.01)
+    for part in np.array_split(values, 3):
+        shard = QuantileSketch(0.01)
+        shard.add(part)
+        merged.merge(QuantileSketch.from_dict(shard.to_dict()))
+    
+    assert merged.to_dict() == whole.to_dict() and len(whole) == 6000
+    assert whole.exact and not merged.exact
+    known = np.sort(values[~np.isnan(values)])
+    for q in (0.01, 0.1, 0.25, 0.5, 0.9, 0.99):
+        assert whole.quantile(q) == np.quantile(known, q)
+        rank = q * (len(known) - 1)
+        nearest = max(abs(known[int(np.floor(rank))]), abs(known[int(np.ceil(rank))]))
+        assert abs(merged.quantile(q) - np.quantile(known, q)) <= 0.01 * nearest + 1e-12
+    
+    # Approximate medians of an even count interpolate between the middle two
+    shipped = QuantileSketch.from_dict(QuantileSketch(0.01).to_dict())
+    shipped.merge(QuantileSketch(0.01))
+    shipped.add([100, 200])
+    assert abs(shipped.quantile(0.5) - 150) <= 1.5
+    assert np.isnan(QuantileSketch().quantile(0.5))
+
+@pytest.mark.asyncio
+async def test_sharded_workers_merge_to_standalone_report(tmp_path):
+    """Workers analyzing disjoint chains, merged by a coordinator, report what one process reports"""
+    from src.alerts import AlertEngine
+    from src.sharding import ShardQueue, shard_chains
+    chains = ['ethereum', 'bsc', 'solana']
+    pairs = [
+        {'chainId': chains[i % 3], 'pairAddress': f'0x{i}', 'baseToken': {'symbol': f'T{i}', 'address': f'0xt{i}'},
+         'priceUsd': str(1 + i), 'volume': {'h24': 10000 * (i + 1)}, 'priceChange': {'h24': i * 7 - 40},
+         'liquidity': {'usd': 1000 * i}, 'holders': 50 * i + 3, 'txns': {'h24': {'buys': 60 * i, 'sells': 10}}}
+        for i in range(12)
+    ]
+    alerts_path = str(tmp_path / 'alerts.jsonl')
+    coordinator = TokenAnalytics(AlertEngine(alerts_path))
+    subscription = coordinator.alert_engine.add('chat-1', '0xt4', 'bsc', 'price', 'above', 4)
+    standalone = TokenAnalytics(AlertEngine(None))
+    standalone.alert_engine.add('chat-1', '0xt4', 'bsc', 'price', 'above', 4)
+    workers = [(shard_chains(i, 2, chains), TokenAnalytics(AlertEngine(alerts_path, read_only=True)))
+               for i in range(2)]
+    queue = ShardQueue(str(tmp_path / 'shards'))
+    
+    for cycle in range(2):
+        current = [dict(pair, priceUsd=str(float(pair['priceUsd']) * (1 + cycle)), holders=pair['holders'] + cycle * i)
+                   for i, pair in enumerate(pairs)]
+        expected = standalone.comprehensive_analysis(current, min_volume=20000)
+        for shard, (owned, worker) in enumerate(workers):
+            worker.comprehensive_analysis([pair for pair in current if pair['chainId'] in owned], min_volume=20000)
+            summary = worker.last_summary
+            summary.cycle, summary.shard, summary.chains = cycle, shard, owned
+            summary.alerts = [(sub.sub_id, values) for sub, values in worker.last_alerts]
+            queue.publish(summary)
+        result = coordinator.analyze_shards(await queue.collect(2, cycle, timeout=0))
+        
+        expected.pop('timestamp')
+        result.pop('timestamp')
+        # Medians merged from other nodes come from sketches, within their relative accuracy
+        exact = expected['holder_growth'].pop('median_holders')
+        assert result['holder_growth'].pop('median_holders') == pytest.approx(exact, rel=0.01)
+        for name, window in expected['indicators'].items():
+            exact = window.pop('median_volatility')
+            assert result['indicators'][name].pop('median_volatility') == pytest.approx(exact, rel=0.01, nan_ok=True)
+        assert result == expected
+        assert result['leaderboards']['volume'][0]['symbol'] == 'T11'
+        assert [(sub.sub_id, values['price']) for sub, values in coordinator.last_alerts] == \
+            ([(subscription.sub_id, 5.0)] if cycle == 0 else [])
+    assert [dict(entry, timestamp=None) for entry in coordinator.metrics_history] == \
+        [dict(entry, timestamp=None) for entry in standalone.metrics_history]
+    assert os.listdir(queue.path) == []
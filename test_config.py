@@ -0,0 +1,39 @@
+"""
+Tests for the settings object
+"""
+
+import dataclasses
+import pytest
+from config import Settings
+
+def test_settings_parse_environment_over_env_file(tmp_path):
+    """Environment variables override .env, integers are coerced and the result is frozen"""
+    env_file = tmp_path / '.env'
+    env_file.write_text('TELEGRAM_CHAT_ID=from-file\nMETRICS_PORT=9000\nANALYTICS_WORKERS=4\n')
+
+    settings = Settings.from_env({'METRICS_PORT': '9100', 'ANALYTICS_WORKERS': ''}, env_file=str(env_file))
+
+    assert settings.telegram_chat_id == 'from-file'
+    assert settings.metrics_port == 9100
+    assert settings.analytics_workers == 0
+    assert settings.snapshot_dir == 'data/snapshots'
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        settings.metrics_port = 1
+    with pytest.raises(ValueError, match='METRICS_PORT'):
+        Settings.from_env({'METRICS_PORT': 'http'}, env_file=str(tmp_path / 'missing.env'))
+
+def test_bot_reads_the_settings_it_is_given(tmp_path):
+    """Every deployment setting comes from the Settings passed in, not from module state"""
+    from src.main import Web3AnalyticsBot
+    from src.sharding import shard_chains
+    settings = Settings(dexscreener_base_url='http://127.0.0.1:1/latest/dex', alerts_path='', snapshot_dir='',
+                        node_role='worker', shard_index=1, shard_count=2, shard_queue_dir=str(tmp_path / 'shards'))
+
+    bot = Web3AnalyticsBot(settings)
+
+    assert bot.chains == shard_chains(1, 2)
+    assert bot.dex_client.base_url == settings.dexscreener_base_url
+    assert bot.shard_queue.path == settings.shard_queue_dir
+    assert bot.alert_engine.read_only and bot.discovery is None
+    with pytest.raises(ValueError, match='NODE_ROLE'):
+        Web3AnalyticsBot(dataclasses.replace(settings, node_role='leader'))
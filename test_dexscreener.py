@@ -36,3 +36,235 @@ def test_safe_float_conversion():
     assert safe_float_conversion("123.45") == 123.45
     assert safe_float_conversion(None) == 0.0
     assert safe_float_conversion("invalid") == 0.0
+
+@pytest.mark.asyncio
+async def test_recent_pairs_fan_out_runs_concurrently():
+    """All chains are fetched concurrently and duplicates are dropped"""
+    client = DexScreenerClient("test_key")
+    
+    async def fake_request(endpoint, params=None):
+        await asyncio.sleep(0.05)
+        pair = {'chainId': params['chainId'], 'pairAddress': '0x1'}
+        return {'pairs': [pair, pair]}
+    
+    client._make_request = fake_request
+    chains = ['ethereum', 'bsc', 'polygon', 'arbitrum']
+    
+    start = asyncio.get_running_loop().time()
+    pairs = await client.get_recent_pairs_all_chains(24, chains=chains)
+    elapsed = asyncio.get_running_loop().time() - start
+    
+    assert sorted(p['chainId'] for p in pairs) == sorted(chains)
+    assert elapsed < 0.15
+
+@pytest.mark.asyncio
+async def test_rate_limiter_backs_off_and_recovers():
+    """429s halve the window and pause callers; successes grow it back"""
+    from src.rate_limiter import AdaptiveRateLimiter, parse_retry_after
+    
+    limiter = AdaptiveRateLimiter(rate=100, burst=5, max_concurrency=8)
+    limiter.on_throttle(retry_after=0.05)
+    assert limiter.stats()['concurrency'] == 4
+    assert limiter.stats()['throttled_count'] == 1
+    
+    start = asyncio.get_running_loop().time()
+    async with limiter:
+        assert limiter.stats()['in_flight'] == 1
+    assert asyncio.get_running_loop().time() - start >= 0.04
+    
+    for _ in range(50):
+        limiter.on_success()
+    assert limiter.stats()['concurrency'] == 8
+    assert parse_retry_after('2') == 2.0
+    assert parse_retry_after('soon') is None
+
+@pytest.mark.asyncio
+async def test_token_info_requests_are_coalesced_and_cached():
+    """Concurrent identical lookups share one upstream call; repeats hit the cache"""
+    client = DexScreenerClient("test_key")
+    calls = []
+    
+    async def fake_request(endpoint, params=None):
+        calls.append(endpoint)
+        await asyncio.sleep(0.01)
+        return {'pairs': [{'pairAddress': '0x1'}]}, 64
+    
+    client._request = fake_request
+    results = await asyncio.gather(*[client.get_token_info('ethereum', '0xabc') for _ in range(10)])
+    again = await client.get_token_info('ethereum', '0xabc')
+    
+    assert calls == ['tokens/ethereum/0xabc']
+    assert all(result == again for result in results)
+    assert client.cache.stats()['hits'] == 1
+
+@pytest.mark.asyncio
+async def test_token_lookups_are_batched_per_chain():
+    """Lookups of many tokens become a few multi-address requests, each caller getting its own pairs
+    (null addresses in the response included)"""
+    client = DexScreenerClient("test_key")
+    calls = []
+    
+    async def fake_request(endpoint, params=None):
+        calls.append(endpoint)
+        chain, addresses = endpoint.split('/')[1:]
+        await asyncio.sleep(0.01)
+        pairs = [{'chainId': chain, 'pairAddress': f'{chain}-{address}', 'baseToken': {'address': address.upper()},
+                  'quoteToken': {'address': None}} for address in addresses.split(',')]
+        return {'schemaVersion': '1.0.0', 'pairs': pairs}, 100 * len(pairs)
+    
+    client._request = fake_request
+    lookups = [(chain, f'0x{i}') for chain in ('ethereum', 'base') for i in range(35)]
+    results = await asyncio.gather(*[client.get_token_info(chain, address) for chain, address in lookups])
+    
+    # 35 tokens per chain at 30 addresses per request
+    assert len(calls) == 4
+    assert all(len(call.split('/')[2].split(',')) <= 30 for call in calls)
+    for (chain, address), result in zip(lookups, results):
+        assert [pair['pairAddress'] for pair in result['pairs']] == [f'{chain}-{address}']
+    assert await client.get_token_info('base', '0x7') == results[42]
+    assert len(calls) == 4
+    assert client.token_loader.stats()['batches'] == 4
+
+def test_cache_lru_and_byte_budget():
+    """Cache evicts least recently used entries beyond its bounds"""
+    from src.utils import Cache
+    
+    cache = Cache(ttl=60, max_entries=2, max_bytes=100)
+    cache.set('a', 1, size=10)
+    cache.set('b', 2, size=10)
+    cache.get('a')
+    cache.set('c', 3, size=10)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    
+    cache.set('big', 4, size=95)
+    assert len(cache) == 1
+    assert cache.bytes_used == 95
+
+@pytest.mark.asyncio
+async def test_iter_json_array_decodes_across_chunk_boundaries():
+    """Pairs split across arbitrary byte chunks are decoded into fixed-size batches"""
+    import json
+    from src.json_stream import iter_json_array
+    
+    pairs = [{'pairAddress': f'0x{i}', 'baseToken': {'symbol': 'Ünï'}, 'priceUsd': i * 1.5} for i in range(7)]
+    body = json.dumps({'schemaVersion': '1.0.0', 'pairs': pairs}).encode()
+    
+    async def chunks():
+        for start in range(0, len(body), 5):
+            yield body[start:start + 5]
+    
+    batches = [batch async for batch in iter_json_array(chunks(), 'pairs', batch_size=3)]
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    assert [pair for batch in batches for pair in batch] == pairs
+
+@pytest.mark.asyncio
+async def test_client_retries_through_stub_faults(monkeypatch):
+    """429s, 5xx responses and truncated bodies from the stub are retried; exhausted retries give None"""
+    from src.dexscreener_stub import DexScreenerStub, FaultPlan
+    import src.dexscreener_client as dexscreener_client
+    monkeypatch.setattr(dexscreener_client, 'RETRY_DELAY', 0.01)
+
+    faults = FaultPlan(script=['throttle', 'server_error'], retry_after=0)
+    stub = DexScreenerStub(pair_count=20, faults=faults)
+    client = DexScreenerClient("test_key", base_url=await stub.start())
+    try:
+        assert len(await client.get_trending_tokens()) == 20
+        faults.script = ['truncate']
+        assert len(await client.search_pairs('TKN1')) > 0
+        faults.script = ['server_error'] * dexscreener_client.MAX_RETRIES
+        assert await client.get_token_info('ethereum', '0x1') is None
+    finally:
+        await client.close()
+        await stub.stop()
+
+    assert client.retry_count == 3 + dexscreener_client.MAX_RETRIES - 1
+    assert stub.stats['throttle'] == 1 and stub.stats['truncate'] == 1
+    assert stub.stats['server_error'] == 1 + dexscreener_client.MAX_RETRIES
+    assert stub.stats['responses'] == 2
+
+@pytest.mark.asyncio
+async def test_stream_broken_after_first_batch_raises():
+    """A body cut off midway raises instead of ending the stream early, so no cycle finishes on part of it"""
+    from src.dexscreener_stub import DexScreenerStub, FaultPlan
+    from src.dexscreener_client import IncompleteStreamError
+
+    stub = DexScreenerStub(pair_count=50, faults=FaultPlan(script=['truncate']))
+    client = DexScreenerClient("test_key", base_url=await stub.start())
+    batches = []
+    try:
+        with pytest.raises(IncompleteStreamError):
+            async for batch in client.stream_recent_pairs(chains=['ethereum'], batch_size=2):
+                batches.append(batch)
+    finally:
+        await client.close()
+        await stub.stop()
+
+    assert batches and client.retry_count == 0
+
+@pytest.mark.asyncio
+async def test_stream_closed_early_leaves_no_fetches_behind():
+    """A consumer that stops reading while the queue is full still gets every chain's fetch torn down"""
+    from src.dexscreener_stub import DexScreenerStub
+
+    stub = DexScreenerStub(pair_count=200)
+    client = DexScreenerClient("test_key", base_url=await stub.start())
+    try:
+        stream = client.stream_recent_pairs(batch_size=1)
+        await stream.__anext__()
+        await asyncio.sleep(0.1)  # let every chain fill the queue
+        await stream.aclose()
+        pumps = [task for task in asyncio.all_tasks() if task.get_coro().__qualname__.endswith('pump')]
+        assert pumps == []
+    finally:
+        await client.close()
+        await stub.stop()
+
+@pytest.mark.asyncio
+async def test_incremental_discovery_pages_only_new_pairs(tmp_path):
+    """After one full fetch, only pages newer than the high-water mark are requested and known pairs are
+    refreshed by address; state survives a restart"""
+    import time
+    from src.discovery import PairDiscovery
+    from src.dexscreener_stub import DexScreenerStub
+    now_ms = int(time.time() * 1000)
+    half_hour = 30 * 60 * 1000
+    
+    def launched(start, count, newest_ms):
+        return [{'chainId': 'bsc', 'pairAddress': f'0x{i}', 'pairCreatedAt': newest_ms - (i - start) * half_hour}
+                for i in range(start, start + count)]
+    
+    # Launches every half hour from 45 minutes ago, keeping the 24h cutoff well clear of any pair
+    stub = DexScreenerStub(pairs=launched(0, 60, now_ms - 3 * half_hour // 2))
+    client = DexScreenerClient("test_key", base_url=await stub.start())
+    path = str(tmp_path / 'discovery.json')
+    try:
+        discovery = PairDiscovery(path, hours=24, page_size=10)
+        await discovery.refresh(client, chains=['bsc'])
+        # The first cycle pages back to the start of the 24h window
+        assert discovery.last_stats['bsc'] == {'pages': 5, 'fetched': 47, 'added': 47, 'refreshed': 0, 'full': 1}
+        assert len(discovery) == 47
+        
+        stub.add_pairs([dict(pair, pairCreatedAt=now_ms - i) for i, pair in enumerate(launched(100, 3, now_ms))])
+        await discovery.refresh(client, chains=['bsc'])
+        assert discovery.last_stats['bsc'] == {'pages': 1, 'fetched': 4, 'added': 3, 'refreshed': 46, 'full': 0}
+        assert discovery.high_water['bsc'] == now_ms
+        
+        restarted = PairDiscovery(path, hours=24, page_size=10)
+        assert len(restarted) == 50 and restarted.high_water == discovery.high_water
+        # Pairs found cycles ago are streamed with their current values, not the ones they were found with
+        stub.pairs[5]['volume'] = {'h24': 12345}
+        batches = [batch async for batch in restarted.stream(client, chains=['bsc'], batch_size=20)]
+        assert [len(batch) for batch in batches] == [20, 20, 10]
+        assert restarted.last_stats['bsc'] == {'pages': 1, 'fetched': 1, 'added': 0, 'refreshed': 49, 'full': 0}
+        streamed = {pair['pairAddress']: pair for batch in batches for pair in batch}
+        assert streamed['0x5']['volume'] == {'h24': 12345}
+        
+        # Overlapping cycles refresh one after the other; the second starts from the first one's mark
+        overlapping = PairDiscovery(None, hours=24, page_size=10)
+        await asyncio.gather(overlapping.refresh(client, chains=['bsc']), overlapping.refresh(client, chains=['bsc']))
+        assert overlapping.last_stats['bsc'] == {'pages': 1, 'fetched': 1, 'added': 0, 'refreshed': 49, 'full': 0}
+        assert len(overlapping) == 50
+    finally:
+        await client.close()
+        await stub.stop()
@@ -0,0 +1,66 @@
+"""
+Tests for the metrics registry, /metrics endpoint and sampling profiler
+"""
+
+import pytest
+import asyncio
+import time
+import aiohttp
+from src.metrics import MetricsRegistry, MetricsServer
+
+def test_registry_renders_prometheus_text():
+    """Counters, gauges and cumulative histogram buckets in the text exposition format"""
+    registry = MetricsRegistry()
+    requests = registry.histogram('request_seconds', 'Request latency', ('endpoint',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        requests.observe(value, endpoint='pairs')
+    registry.counter('ticks_total', 'Ticks', ('outcome',)).inc(outcome='started')
+    queued = registry.gauge('queue_depth', 'Queued messages')
+    registry.on_collect(lambda: queued.set(7))
+
+    text = registry.render()
+
+    assert '# TYPE request_seconds histogram' in text
+    assert 'request_seconds_bucket{endpoint="pairs",le="0.1"} 1' in text
+    assert 'request_seconds_bucket{endpoint="pairs",le="1"} 3' in text
+    assert 'request_seconds_bucket{endpoint="pairs",le="+Inf"} 4' in text
+    assert 'request_seconds_sum{endpoint="pairs"} 4.05' in text
+    assert 'request_seconds_count{endpoint="pairs"} 4' in text
+    assert 'ticks_total{outcome="started"} 1' in text
+    assert 'queue_depth 7' in text
+    assert registry.histogram('request_seconds', 'Request latency', ('endpoint',)) is requests
+    with pytest.raises(ValueError):
+        registry.gauge('ticks_total', 'Ticks', ('outcome',))
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_and_profiler():
+    """/metrics serves the registry; /profile samples the event loop while it keeps running"""
+    registry = MetricsRegistry()
+    registry.counter('cycles_total', 'Cycles').inc(3)
+    server = MetricsServer(registry)
+    url = await server.start(port=0)
+
+    def busy_loop_work():
+        deadline = time.perf_counter() + 0.01
+        while time.perf_counter() < deadline:
+            pass
+
+    async def keep_busy():
+        while True:
+            busy_loop_work()
+            await asyncio.sleep(0)
+
+    worker = asyncio.create_task(keep_busy())
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f'{url}/metrics') as response:
+                assert response.status == 200
+                assert 'cycles_total 3' in await response.text()
+            async with session.get(f'{url}/profile', params={'seconds': '0.3', 'interval': '0.002'}) as response:
+                assert response.status == 200
+                profile = await response.text()
+    finally:
+        worker.cancel()
+        await server.stop()
+
+    assert 'busy_loop_work' in profile
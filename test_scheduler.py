@@ -0,0 +1,25 @@
+"""
+Tests for the monitoring scheduler
+"""
+
+import pytest
+import asyncio
+from src.scheduler import AlignedScheduler
+
+@pytest.mark.asyncio
+async def test_scheduler_aligns_ticks_and_skips_when_saturated():
+    """Ticks land on interval boundaries; a tick with too many cycles in flight is skipped"""
+    scheduler = AlignedScheduler(0.05, max_in_flight=1)
+    ticks = []
+
+    async def slow_cycle(timings):
+        ticks.append(timings.tick)
+        with timings.stage('fetch'):
+            await asyncio.sleep(0.08)
+
+    await scheduler.run(slow_cycle, run_immediately=False, max_ticks=4)
+
+    assert scheduler.started_count + scheduler.skipped_count >= 4
+    assert scheduler.skipped_count >= 1
+    assert all(abs(tick / 0.05 - round(tick / 0.05)) < 1e-6 for tick in ticks)
+    assert scheduler.stats()['stages']['fetch']['max'] >= 0.08
@@ -0,0 +1,62 @@
+"""
+Tests for the columnar snapshot store
+"""
+
+import pandas as pd
+from src.snapshot_store import SnapshotStore
+
+def _frame(volume, price_change):
+    return pd.DataFrame({
+        'chain_id': ['ethereum', 'bsc'],
+        'pair_address': ['0xp1', '0xp2'],
+        'base_token_address': ['0xa', '0xb'],
+        'base_token_symbol': ['AAA', 'BBB'],
+        'volume_h24': volume,
+        'price_change_h24': price_change,
+        'txns_h24': [200, 200],
+        'holders': [10, 20],
+    })
+
+def test_append_and_query(tmp_path):
+    """Snapshots can be read back by time range and by token"""
+    store = SnapshotStore(str(tmp_path))
+    store.append(_frame([20000.0, 5.0], [30.0, -20.0]), timestamp_ms=1000)
+    store.append(_frame([30000.0, 50000.0], [1.0, -20.0]), timestamp_ms=2000)
+    
+    assert len(store.load_range()) == 4
+    assert list(store.load_range(start_ms=1500)['volume_h24']) == [30000.0, 50000.0]
+    
+    history = store.token_history('0xb', chain_id='bsc')
+    assert list(history['snapshot_ms']) == [1000, 2000]
+    assert list(history['base_token_symbol']) == ['BBB', 'BBB']
+    
+    signals = store.count_signals(pump_threshold=10, dump_threshold=-10, min_volume=10000)
+    assert signals['pump_signals'].tolist() == [1, 0]
+    assert signals['dump_warnings'].tolist() == [0, 1]
+
+def test_reopen_ignores_partial_append(tmp_path):
+    """Column bytes written without an index record are discarded on reopen"""
+    store = SnapshotStore(str(tmp_path))
+    store.append(_frame([1.0, 2.0], [0.0, 0.0]), timestamp_ms=1000)
+    with open(store._column_path('volume_h24'), 'ab') as f:
+        f.write(b'\0' * 8)
+    
+    reopened = SnapshotStore(str(tmp_path))
+    assert reopened.total_rows == 2
+    assert list(reopened.column('volume_h24')) == [1.0, 2.0]
+
+def test_append_after_failed_append_stays_aligned(tmp_path, caplog):
+    """Rows a failed append left in some columns are overwritten, and over-long text is logged"""
+    store = SnapshotStore(str(tmp_path))
+    store.append(_frame([1.0, 2.0], [0.0, 0.0]), timestamp_ms=1000)
+    # An append that died after writing one column
+    with open(store._column_path('volume_h24'), 'ab') as f:
+        f.write(b'\0' * 16)
+    
+    frame = _frame([3.0, 4.0], [0.0, 0.0])
+    frame['base_token_symbol'] = ['CCC', 'X' * 40]
+    store.append(frame, timestamp_ms=2000)
+    
+    assert list(store.column('volume_h24')) == [1.0, 2.0, 3.0, 4.0]
+    assert list(SnapshotStore(str(tmp_path)).load_range()['volume_h24']) == [1.0, 2.0, 3.0, 4.0]
+    assert "Truncating 1 'base_token_symbol' values longer than 24 bytes" in caplog.text
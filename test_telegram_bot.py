@@ -0,0 +1,134 @@
+"""
+Tests for Telegram delivery
+"""
+
+import pytest
+import asyncio
+from telegram.error import BadRequest, RetryAfter
+from src.telegram_sender import TelegramSender
+
+class FakeBot:
+    """Records sends; raises the queued errors first"""
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.sent = []
+        self.parse_modes = []
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self.parse_modes.append(parse_mode)
+        if self.errors:
+            raise self.errors.pop(0)
+        self.sent.append((chat_id, text))
+
+    async def shutdown(self):
+        pass
+
+@pytest.mark.asyncio
+async def test_sender_coalesces_nearby_messages():
+    """Messages queued close together go out as one message per chat"""
+    bot = FakeBot()
+    sender = TelegramSender("token", bot=bot, coalesce_window=0.05, chat_interval=0)
+
+    assert sender.enqueue("first alert", "chat-a")
+    assert sender.enqueue("second alert", "chat-a")
+    assert sender.enqueue("other chat", "chat-b")
+    await sender.close()
+
+    assert bot.sent == [("chat-a", "first alert\n\nsecond alert"), ("chat-b", "other chat")]
+    assert sender.stats()['coalesced'] == 1
+
+@pytest.mark.asyncio
+async def test_sender_retries_after_flood_control():
+    """A 429 pauses the sender and the message is retried rather than lost"""
+    bot = FakeBot(errors=[RetryAfter(0)])
+    sender = TelegramSender("token", bot=bot, coalesce_window=0, chat_interval=0)
+
+    sender.enqueue("report", "chat-a")
+    await sender.close()
+
+    assert bot.sent == [("chat-a", "report")]
+    assert sender.retry_count == 1
+    assert sender.limiter.throttled_count == 1
+
+@pytest.mark.asyncio
+async def test_sender_interval_of_one_chat_does_not_block_others():
+    """While one chat waits out its minimum interval, messages for other chats go out"""
+    bot = FakeBot()
+    sender = TelegramSender("token", bot=bot, coalesce_window=0.05, chat_interval=0.2)
+
+    sender.enqueue("first", "chat-a")
+    sender.enqueue("second", "chat-a", parse_mode=None)
+    sender.enqueue("other chat", "chat-b")
+    await sender.close()
+
+    assert bot.sent == [("chat-a", "first"), ("chat-b", "other chat"), ("chat-a", "second")]
+
+@pytest.mark.asyncio
+async def test_sender_resends_unparseable_markup_as_plain_text():
+    """A coalesced message Telegram cannot parse as Markdown still arrives, as plain text"""
+    bot = FakeBot(errors=[BadRequest("Can't parse entities: can't find end of the entity starting at byte offset 9")])
+    sender = TelegramSender("token", bot=bot, coalesce_window=0.05, chat_interval=0)
+
+    sender.enqueue("*PEPE_2* alert", "chat-a")
+    sender.enqueue("*report*", "chat-a")
+    await sender.close()
+
+    assert bot.sent == [("chat-a", "*PEPE_2* alert\n\n*report*")]
+    assert bot.parse_modes == ['Markdown', None]
+    assert sender.retry_count == 1 and sender.dropped_count == 0
+
+class FakeMessage:
+    def __init__(self):
+        self.replies = []
+
+    async def reply_text(self, text, parse_mode=None):
+        self.replies.append(text)
+
+class FakeUpdate:
+    def __init__(self):
+        self.message = FakeMessage()
+
+@pytest.mark.asyncio
+async def test_commands_served_from_published_report():
+    """/stats and /analyze reply from the latest report, rendered once per version"""
+    from src.telegram_bot import TelegramBot
+    bot = TelegramBot("token", "chat")
+    update = FakeUpdate()
+
+    await bot.stats_command(update, None)
+    assert "No analysis available yet" in update.message.replies[-1]
+
+    bot.publish_report({'new_tokens_count': 12, 'total_pairs': 3400, 'total_volume': 2500000,
+                        'pump_signals': 2, 'dump_warnings': 1, 'timestamp': '2024-01-01T00:00:00'})
+    for _ in range(100):
+        await bot.stats_command(update, None)
+    await bot.analyze_command(update, None)
+
+    stats = update.message.replies[1]
+    assert "Active pairs: 3,400" in stats and "Total volume: $2.50M" in stats
+    assert all(reply is stats for reply in update.message.replies[1:101])
+    assert "*New Tokens (24h):* 12" in update.message.replies[-1]
+    assert bot.reports.version == 1
+
+    # The cycle's own send reuses the text /analyze was served
+    queued = []
+    bot.sender.enqueue = lambda text, chat_id, parse_mode: queued.append(text)
+    await bot.send_analysis_report(bot.reports.report)
+    assert queued[0] is update.message.replies[-1]
+
+def test_alert_symbol_is_escaped_for_markdown():
+    """A symbol with Markdown characters stays inside the alert's bold markup"""
+    from src.alerts import Subscription
+    from src.telegram_bot import TelegramBot
+    bot = TelegramBot("token", "chat")
+    subscription = Subscription(1, "chat", "0xabc", "bsc", 'price', 'above', 2.0)
+    message = bot._format_alert_message(subscription, {'symbol': 'DOGE*_X', 'price': 2.5})
+    assert message.startswith("🔔 *DOGE\\*\\_X* (bsc) price is above 2")
+
+def test_leaderboard_symbols_are_escaped_for_markdown():
+    """Token symbols with Markdown characters cannot break the report's markup"""
+    from src.telegram_bot import TelegramBot
+    bot = TelegramBot("token", "chat")
+    entry = {'symbol': 'PEPE_2*', 'chain': 'bsc', 'value': 1500000}
+    message = bot._format_analysis_message({'leaderboards': {'volume': [entry]}})
+    assert "1. PEPE\\_2\\* (bsc): $1.50M" in message
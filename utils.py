@@ -3,9 +3,11 @@ Utility functions for Web3 Analytics Bot
 """
 
 import json
+import sys
 import time
 import hashlib
-from typing import Any, Dict
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
 from datetime import datetime
 
 def format_number(value: float, decimals: int = 2) -> str:
@@ -29,6 +31,13 @@ def generate_token_hash(token_address: str, chain_id: str) -> str:
     """Generate unique hash for token identification"""
     return hashlib.md5(f"{chain_id}_{token_address}".encode()).hexdigest()
 
+def estimate_size(value: Any) -> int:
+    """Approximate size in bytes of a JSON-like value"""
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return sys.getsizeof(value)
+
 def safe_float_conversion(value: Any, default: float = 0.0) -> float:
     """Safely convert value to float"""
     try:
@@ -47,25 +56,107 @@ def timestamp_to_datetime(timestamp: str) -> datetime:
         return datetime.now()
 
 class Cache:
-    """Simple in-memory cache implementation"""
-    def __init__(self, ttl: int = 300):
+    """In-memory LRU cache with TTL expiry and optional entry/byte bounds
+
+    Entries stay fresh for ``ttl`` seconds and may be served stale (via
+    ``get_entry``) for a further ``stale_ttl`` seconds. Expired entries are
+    purged proactively on every access, oldest write first.
+    """
+    def __init__(self, ttl: int = 300, max_entries: Optional[int] = None,
+                 max_bytes: Optional[int] = None, stale_ttl: int = 0):
         self.ttl = ttl
-        self._cache = {}
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes_used = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._cache = OrderedDict()  # key -> (value, timestamp, size), least recently used first
+        self._written = OrderedDict()  # key -> timestamp, oldest write first
+        
+    def __len__(self) -> int:
+        return len(self._cache)
+        
+    def __contains__(self, key: str) -> bool:
+        return self.get_entry(key, record=False) is not None
         
     def get(self, key: str) -> Any:
-        """Get value from cache"""
-        if key in self._cache:
-            data, timestamp = self._cache[key]
-            if time.time() - timestamp < self.ttl:
-                return data
+        """Get a fresh value from cache"""
+        entry = self.get_entry(key)
+        if entry is None or not entry[1]:
+            return None
+        return entry[0]
+        
+    def get_entry(self, key: str, record: bool = True) -> Optional[Tuple[Any, bool]]:
+        """Get ``(value, is_fresh)``, including entries that are stale but still servable"""
+        now = time.time()
+        self.purge_expired(now)
+        if key not in self._cache:
+            if record:
+                self.misses += 1
+            return None
+        data, timestamp, _ = self._cache[key]
+        self._cache.move_to_end(key)
+        fresh = now - timestamp < self.ttl
+        if record:
+            if fresh:
+                self.hits += 1
             else:
-                del self._cache[key]
-        return None
+                self.stale_hits += 1
+        return data, fresh
+        
+    def set(self, key: str, value: Any, size: Optional[int] = None):
+        """Set value in cache, evicting least recently used entries to stay within bounds"""
+        now = time.time()
+        if size is None:
+            size = estimate_size(value)
+        self._remove(key)
+        self._cache[key] = (value, now, size)
+        self._written[key] = now
+        self.bytes_used += size
+        self.purge_expired(now)
         
-    def set(self, key: str, value: Any):
-        """Set value in cache"""
-        self._cache[key] = (value, time.time())
+        while self._cache and ((self.max_entries is not None and len(self._cache) > self.max_entries) or
+                               (self.max_bytes is not None and self.bytes_used > self.max_bytes)):
+            self._remove(next(iter(self._cache)))
+            self.evictions += 1
+            
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        """Drop every entry past its stale window; returns how many were dropped"""
+        now = time.time() if now is None else now
+        horizon = now - self.ttl - self.stale_ttl
+        purged = 0
+        while self._written:
+            key, timestamp = next(iter(self._written.items()))
+            if timestamp > horizon:
+                break
+            self._remove(key)
+            purged += 1
+        return purged
+        
+    def _remove(self, key: str):
+        entry = self._cache.pop(key, None)
+        if entry is not None:
+            self.bytes_used -= entry[2]
+            del self._written[key]
         
     def clear(self):
         """Clear cache"""
         self._cache.clear()
+        self._written.clear()
+        self.bytes_used = 0
+        
+    def stats(self) -> Dict:
+        """Hit/miss counters and current size"""
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            'entries': len(self._cache),
+            'bytes': self.bytes_used,
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': (self.hits + self.stale_hits) / lookups if lookups else 0.0
+        }